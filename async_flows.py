@@ -0,0 +1,315 @@
+"""
+Async Flows Module
+Runs the flows of flow_definitions.py on the asyncio CDP backend. The same
+Flow/Step definitions the step engine runs are interpreted here, each flow in
+its own tab, and any number of them run concurrently in one process:
+
+    python async_flows.py add_supplier add_new_source --concurrency 20 --repeat 5
+    python async_flows.py add_ip --env https://staging-admin.example.com/app-manager
+
+With --isolated every flow gets its own browser context (separate cookies and
+storage) inside the one Chrome, pre-seeded with the cached login; at most
+--max-contexts of them are open at a time.
+
+Prerequisites (add_ip needs a supplier and a server group) come from the
+fixture cache of the environment, or are created once by their producer flow.
+The browser reuses the login session cached by the pytest login
+(.auth/session.json), since the CAPTCHA cannot be solved here.
+"""
+
+from datetime import datetime
+from urllib.parse import urlsplit
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import time
+
+from cdp_async import Browser
+from flow_definitions import FLOWS
+from flow_engine import BASE_URL, FILL_SCRIPT, KEY_PAUSE, SCREENSHOT_POLICIES, TOAST_CLASS, StepEngine, \
+    default_fixtures, plan
+from login_manager import ADMIN_LAYOUT_XPATH, COOKIE_PARAM_FIELDS, admin_host
+
+SESSION_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".auth", "session.json")
+# Same default as StepEngine(settle=...)
+SETTLE = 0.5
+# Selenium Keys names used by press steps, as CDP key names
+KEY_NAMES = {"ENTER": "Enter", "RETURN": "Enter", "ARROW_DOWN": "ArrowDown", "ARROW_UP": "ArrowUp",
+             "SPACE": "Space", "TAB": "Tab", "ESCAPE": "Escape"}
+
+SEED_LOCAL_STORAGE_SCRIPT = """
+if (location.origin === %s) {
+    var items = %s;
+    for (var key in items) {
+        if (localStorage.getItem(key) === null) { localStorage.setItem(key, items[key]); }
+    }
+}
+"""
+
+
+# ===== Utility Functions =====
+def create_report_dir():
+    """Creates a timestamped directory for test reports"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    test_dir = os.path.join(os.getcwd(), "reports", f"Async-Flows_test_run_{timestamp}")
+    os.makedirs(test_dir)
+    return test_dir
+
+
+def origin(base_url):
+    """Scheme and host of an admin base URL, the origin its local storage belongs to"""
+    url = urlsplit(base_url)
+    return f"{url.scheme}://{url.netloc}"
+
+
+def load_session(session_path=SESSION_CACHE):
+    """Reads the cached login once: CDP cookie params and admin local storage"""
+    with open(session_path, encoding="utf-8") as f:
+        session = json.load(f)
+    cookies = [{k: c[k] for k in COOKIE_PARAM_FIELDS if k in c} for c in session["cookies"]]
+    return {"cookies": cookies, "local_storage": session["local_storage"]}
+
+
+async def restore_session(browser, page, session, base_url=BASE_URL):
+    """Loads the cached cookies and local storage into the browser's default context"""
+    admin_url = f"{base_url.rstrip('/')}/"
+    await browser.set_cookies(session["cookies"])
+    await page.goto(admin_url)
+    if admin_host(base_url) in await page.url():
+        await page.evaluate(
+            "(function (items) { for (var key in items) { localStorage.setItem(key, items[key]); } })(%s)"
+            % json.dumps(session["local_storage"]))
+        await page.goto(admin_url)
+    await page.wait_for(ADMIN_LAYOUT_XPATH, timeout=10)
+
+
+async def seed_context(context, page, session, base_url=BASE_URL):
+    """Pre-seeds an isolated context with the cached login without loading any page"""
+    await context.set_cookies(session["cookies"])
+    # Local storage is per origin, so inject it before the admin app's own scripts run
+    await page.add_init_script(SEED_LOCAL_STORAGE_SCRIPT % (json.dumps(origin(base_url)),
+                                                            json.dumps(session["local_storage"])))
+
+
+def random_suffix():
+    """Short random suffix keeping names unique across concurrent flows"""
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+
+
+def generate_values(flow, unique=False):
+    """A flow's generated values; unique=True suffixes names, since copies of a flow start in the same second"""
+    values = {name: generate() for name, generate in flow.values.items()}
+    if unique:
+        values = {name: f"{value}-{random_suffix()}" if name.endswith("_name") else value
+                  for name, value in values.items()}
+    return values
+
+
+# ===== Engine =====
+class AsyncStepEngine:
+    """Interprets Flow/Step definitions on a cdp_async Page, as StepEngine does on a WebDriver"""
+
+    def __init__(self, base_url=BASE_URL, screenshots="key", timeout=10, settle=SETTLE, fixtures=None):
+        self.base_url = base_url.rstrip("/")
+        self.screenshots = screenshots
+        self.timeout = timeout
+        self.settle = settle
+        self.fixtures = fixtures if fixtures is not None else default_fixtures(base_url)
+        # One producer run per missing entity kind, however many flows need it at once
+        self.prerequisite_locks = {}
+
+    async def run(self, page, flow, report_dir, unique=False):
+        """Runs one flow on a page and returns its values; on failure takes the error screenshot and re-raises"""
+        values = generate_values(flow, unique)
+        for kind in flow.requires:
+            producer = StepEngine.producer(kind)
+            values[producer.provides[1]] = await self.prerequisite(page, producer, report_dir)
+        try:
+            await page.goto(f"{self.base_url}/{flow.path.lstrip('/')}")
+            if flow.initial_screenshot:
+                await self.screenshot(page, flow.initial_screenshot, report_dir, key=True)
+            for item in plan(flow):
+                if isinstance(item, list):
+                    await self.fill(page, item, values, report_dir)
+                else:
+                    await self.execute(page, item, values, report_dir)
+            if flow.final_screenshot:
+                await self.screenshot(page, flow.final_screenshot, report_dir, key=True)
+        except Exception:
+            try:
+                await self.screenshot(page, flow.error_screenshot, report_dir, failure=True)
+            except Exception:
+                pass
+            raise
+        if flow.provides:
+            self.fixtures.put(flow.provides[0], values[flow.provides[1]], {"flow": flow.name})
+        return values
+
+    async def prerequisite(self, page, producer, report_dir):
+        """Name of an entity a flow requires: a cached one, or one made by running its producer flow"""
+        kind, value_name = producer.provides
+        async with self.prerequisite_locks.setdefault(kind, asyncio.Lock()):
+            entries = self.fixtures.entries(kind)
+            if entries:
+                print(f"Reusing {kind} {entries[0]['name']}")
+                return entries[0]["name"]
+            print(f"Creating {kind} with {producer.name}")
+            values = await self.run(page, producer, os.path.join(report_dir, producer.name))
+            return values[value_name]
+
+    async def execute(self, page, step, values, report_dir):
+        text = step.value.format(**values) if step.value else ""
+        locator = step.locator.format(**values) if step.locator and "{" in step.locator else step.locator
+        timeout = step.timeout or self.timeout
+
+        if step.action == "verify_toast":
+            await self.verify_toast(page, step, locator, report_dir)
+            return
+        if step.action == "wait":
+            await page.wait_for(locator, timeout)
+        elif step.action == "click":
+            await page.click(locator, timeout)
+        elif step.action == "type":
+            await page.type(locator, text, timeout)
+        elif step.action == "press":
+            await page.focus(locator, timeout)
+            for _ in range(step.repeat):
+                for name in step.value.split("+"):
+                    if name not in KEY_NAMES:
+                        raise Exception(f"Key {name} is not supported by the async backend")
+                    await page.press(KEY_NAMES[name])
+                await asyncio.sleep(KEY_PAUSE)
+        elif step.action == "frame_type":
+            await self.frame_type(page, step, text, timeout)
+        else:
+            raise Exception(f"Unknown step action: {step.action}")
+
+        await asyncio.sleep(self.settle if step.pause is None else step.pause)
+        if step.name:
+            await self.screenshot(page, step.name, report_dir, key=step.key)
+
+    async def fill(self, page, steps, values, report_dir):
+        """Fills a run of inputs with one script evaluation, as StepEngine.fill does"""
+        await page.wait_for(steps[0].locator, steps[0].timeout or self.timeout)
+        fills = [("css" if step.locator.startswith("css:") else "xpath",
+                  step.locator[4:] if step.locator.startswith("css:") else step.locator,
+                  step.value.format(**values)) for step in steps]
+        missing = await page.evaluate("(function () {%s}).apply(null, [%s])" % (FILL_SCRIPT, json.dumps(fills)))
+        if missing:
+            raise Exception(f"Inputs not found: {missing}")
+        await asyncio.sleep(self.settle if steps[-1].pause is None else steps[-1].pause)
+        named = [step for step in steps if step.name]
+        if named:
+            await self.screenshot(page, named[-1].name, report_dir, key=any(step.key for step in named))
+
+    async def frame_type(self, page, step, text, timeout):
+        """Types into the body of an editor iframe, falling back to the editor element itself"""
+        try:
+            await page.type(step.frame, text, timeout, frame=True)
+        except Exception as e:
+            if not step.fallback:
+                raise
+            print(f"WARNING: Failed to enter content in iframe: {str(e)}")
+            await page.type(step.fallback, text, timeout)
+
+    async def verify_toast(self, page, step, locator, report_dir):
+        """Waits for the success message, trying the positional locator and then the toast class"""
+        timeout = step.timeout or 2
+        try:
+            await page.wait_for(locator, timeout)
+            suffix = ""
+        except Exception as e:
+            print(f"Could not catch success message: {str(e)}")
+            await page.wait_for(step.fallback or TOAST_CLASS, timeout)
+            suffix = "_alt"
+        if step.name:
+            await self.screenshot(page, f"{step.name}{suffix}", report_dir, key=True)
+        if step.pause:
+            await asyncio.sleep(step.pause)
+
+    async def screenshot(self, page, step_name, report_dir, key=False, failure=False):
+        if failure or self.screenshots == "all" or (self.screenshots == "key" and key):
+            os.makedirs(report_dir, exist_ok=True)
+            await page.screenshot(os.path.join(report_dir, f"{step_name}.png"))
+
+
+# ===== Runner =====
+async def run_flow(browser, engine, name, index, report_dir, limit, session=None, isolated=False, unique=False):
+    """Runs one flow in its own tab (and, when isolated, its own browser context)"""
+    async with limit:
+        context = await browser.new_context() if isolated else None
+        started = time.time()
+        result = {"flow": name, "index": index, "status": "passed", "error": ""}
+        page = None
+        try:
+            page = await (context.new_page() if context else browser.new_page())
+            if context and session:
+                await seed_context(context, page, session, engine.base_url)
+            await engine.run(page, FLOWS[name], os.path.join(report_dir, f"{name}_{index}"), unique)
+            print(f"[{name} #{index}] passed")
+        except Exception as e:
+            result.update(status="failed", error=str(e))
+            print(f"[{name} #{index}] ERROR: {str(e)}")
+        finally:
+            result["duration"] = time.time() - started
+            if context:
+                await context.close()
+            elif page:
+                await page.close()
+        return result
+
+
+async def run_flows(names, concurrency=10, repeat=1, headless=True, isolated=False, max_contexts=8, login=True,
+                    base_url=BASE_URL, screenshots="key"):
+    """Runs the named flows concurrently in one browser and prints a summary"""
+    report_dir = create_report_dir()
+    session = load_session() if login else None
+    engine = AsyncStepEngine(base_url, screenshots)
+    browser = await Browser.launch(headless=headless, max_contexts=max_contexts)
+    try:
+        if session and not isolated:
+            login_page = await browser.new_page()
+            await restore_session(browser, login_page, session, base_url)
+            await login_page.close()
+
+        limit = asyncio.Semaphore(concurrency)
+        jobs = [run_flow(browser, engine, name, index, report_dir, limit, session, isolated, unique=repeat > 1)
+                for index in range(repeat) for name in names]
+        started = time.time()
+        results = await asyncio.gather(*jobs)
+        elapsed = time.time() - started
+    finally:
+        await browser.close()
+
+    passed = sum(1 for result in results if result["status"] == "passed")
+    mode = f"isolated contexts, max {max_contexts} per browser" if isolated else "shared context"
+    print(f"\n=== {passed}/{len(results)} flows passed in {elapsed:.1f}s (concurrency {concurrency}, {mode}) ===")
+    return results
+
+
+def main():
+    """Runs flows on the async CDP backend"""
+    parser = argparse.ArgumentParser(description="Run admin flows concurrently over CDP")
+    parser.add_argument("flows", nargs="+", choices=list(FLOWS))
+    parser.add_argument("--env", default=BASE_URL, help="admin base URL to run against")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--isolated", action="store_true", help="run each flow in its own browser context")
+    parser.add_argument("--max-contexts", type=int, default=8, help="open contexts allowed per Chrome process")
+    parser.add_argument("--no-login", action="store_true", help="do not seed the cached login session")
+    parser.add_argument("--screenshots", choices=SCREENSHOT_POLICIES, default="key")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_flows(args.flows, args.concurrency, args.repeat, headless=not args.headed,
+                                    isolated=args.isolated, max_contexts=args.max_contexts, login=not args.no_login,
+                                    base_url=args.env, screenshots=args.screenshots))
+    if any(result["status"] == "failed" for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+Async CDP Module
+This module drives Chrome through the Chrome DevTools Protocol from a single
+asyncio event loop. All pages of a browser share one websocket (flattened
+target sessions), so one process can run dozens of concurrent page sessions
+without a thread or an HTTP round trip to chromedriver per command.
+
+The websocket is a websocket-client connection (ws:// and wss://, installed
+with Selenium); one reader thread per browser hands the messages to the event
+loop, and everything else runs on the loop.
+"""
+
+import websocket # type: ignore
+from collections import defaultdict
+import asyncio
+import base64
+import functools
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+CHROME_CANDIDATES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+# Windows virtual key codes for the keys the flows press
+KEY_CODES = {"Enter": 13, "ArrowDown": 40, "ArrowUp": 38, "Space": 32, "Tab": 9, "Escape": 27}
+
+# First element of a step locator: an XPath, or "css:..." / "class:..." as in flow_definitions.py
+FIND_FUNCTION = """
+function find(locator) {
+    if (locator.indexOf('css:') === 0) { return document.querySelector(locator.slice(4)); }
+    if (locator.indexOf('class:') === 0) { return document.getElementsByClassName(locator.slice(6))[0] || null; }
+    return document.evaluate(locator, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+"""
+
+# Resolves once the locator matches (a rendered) element, watching DOM mutations
+# instead of polling; rejects after the timeout.
+WAIT_FOR_SCRIPT = """
+new Promise(function (resolve, reject) {
+    %s
+    var locator = %s, visible = %s;
+    function ready() {
+        var node = find(locator);
+        return !!node && (!visible || node.getClientRects().length > 0);
+    }
+    if (ready()) { resolve(true); return; }
+    var timer = null;
+    var observer = new MutationObserver(function () {
+        if (ready()) { observer.disconnect(); clearTimeout(timer); resolve(true); }
+    });
+    observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+    timer = setTimeout(function () {
+        observer.disconnect();
+        reject(new Error('Timed out waiting for ' + locator));
+    }, %d);
+})
+"""
+
+# Scrolls the element into view and returns the centre point to click
+ELEMENT_CENTER_SCRIPT = """
+(function () {
+    %s
+    var node = find(%s);
+    if (!node) { return null; }
+    node.scrollIntoView({block: 'center'});
+    var rect = node.getBoundingClientRect();
+    return {x: rect.left + rect.width / 2, y: rect.top + rect.height / 2};
+})()
+"""
+
+# Focuses an element, or with frame=true the body of the iframe it is (e.g. a rich text editor)
+FOCUS_SCRIPT = """
+(function () {
+    %s
+    var node = find(%s);
+    if (!node) { return false; }
+    if (%s) {
+        node.contentWindow.focus();
+        node = node.contentDocument.body;
+    }
+    node.focus();
+    return true;
+})()
+"""
+
+
+class CDPError(Exception):
+    pass
+
+
+# ===== Websocket Transport =====
+class WebSocket:
+    """A websocket-client connection whose messages are read on a thread and queued for the event loop"""
+
+    def __init__(self, connection, loop):
+        self.connection = connection
+        self.loop = loop
+        self.messages = asyncio.Queue()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    @classmethod
+    async def connect(cls, url, timeout=30):
+        """Opens a client websocket (ws:// or wss://) to a DevTools endpoint"""
+        loop = asyncio.get_running_loop()
+        # No Origin header: Chrome refuses DevTools connections from origins it was not started with
+        connect = functools.partial(websocket.create_connection, url, timeout=timeout, suppress_origin=True,
+                                    enable_multithread=True)
+        try:
+            connection = await loop.run_in_executor(None, connect)
+        except Exception as e:
+            raise CDPError(f"Websocket handshake with {url} failed: {str(e)}")
+        # The reader thread blocks until the next message, however long the page takes
+        connection.settimeout(None)
+        return cls(connection, loop)
+
+    def _read(self):
+        while True:
+            try:
+                message = self.connection.recv()
+            except Exception as e:
+                message = e
+            try:
+                self.loop.call_soon_threadsafe(self.messages.put_nowait, message)
+            except RuntimeError:
+                return  # the event loop is gone
+            if isinstance(message, Exception):
+                return
+
+    async def send(self, text):
+        """Sends one text message (a short write, so it does not hold up the loop)"""
+        self.connection.send(text)
+
+    async def recv(self):
+        """Returns the next text message; pings are answered by websocket-client"""
+        message = await self.messages.get()
+        if isinstance(message, Exception):
+            raise ConnectionError(f"Websocket closed: {str(message) or type(message).__name__}")
+        if not message:
+            # websocket-client returns an empty message for the browser's close frame
+            raise ConnectionError("Websocket closed by browser")
+        return message
+
+    async def close(self):
+        """Sends a close frame and closes the socket, which also ends the reader thread"""
+        try:
+            await self.loop.run_in_executor(None, functools.partial(self.connection.close, timeout=1))
+        except Exception:
+            pass
+
+
+# ===== Protocol Connection =====
+class CDPConnection:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = defaultdict(list)
+        self._lost = None
+        self._reader = asyncio.ensure_future(self._read_loop())
+
+    async def send(self, method, params=None, session_id=None, timeout=30):
+        """Sends a command (optionally to a target session) and returns its result"""
+        if self._lost:
+            raise CDPError(f"Connection lost: {self._lost}")
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        await self.websocket.send(json.dumps(message))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    def on(self, method, callback, session_id=None):
+        """Registers a callback for an event of the browser or of one target session"""
+        self._listeners[(session_id, method)].append(callback)
+
+    def off(self, method, callback, session_id=None):
+        """Removes a callback registered with on()"""
+        listeners = self._listeners.get((session_id, method), [])
+        if callback in listeners:
+            listeners.remove(callback)
+
+    async def wait_for_event(self, method, session_id=None, timeout=30):
+        """Waits for the next occurrence of an event and returns its params"""
+        future = asyncio.get_running_loop().create_future()
+
+        def resolve(params):
+            if not future.done():
+                future.set_result(params)
+
+        self.on(method, resolve, session_id)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.off(method, resolve, session_id)
+
+    async def close(self):
+        """Stops reading and closes the websocket"""
+        self._reader.cancel()
+        await self.websocket.close()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                message = json.loads(await self.websocket.recv())
+                if "id" in message:
+                    future = self._pending.get(message["id"])
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CDPError(message["error"].get("message", str(message["error"]))))
+                    else:
+                        future.set_result(message.get("result", {}))
+                    continue
+                for callback in list(self._listeners.get((message.get("sessionId"), message.get("method")), [])):
+                    try:
+                        callback(message.get("params", {}))
+                    except Exception as e:
+                        # One broken listener must not stop the replies to every other command
+                        print(f"WARNING: CDP listener for {message.get('method')} failed: {str(e)}")
+        except asyncio.CancelledError:
+            self._lost = "connection closed"
+            raise
+        except Exception as e:
+            self._lost = str(e) or type(e).__name__
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CDPError(f"Connection lost: {self._lost}"))
+
+
+# ===== Browser and Pages =====
+class Browser:
+    def __init__(self, connection, process=None, user_data_dir=None, max_contexts=8):
+        self.connection = connection
+        self.process = process
+        self.user_data_dir = user_data_dir
+        self.max_contexts = max_contexts
+        self._context_slots = asyncio.Semaphore(max_contexts)
+        self._stderr_task = None
+
+    @classmethod
+    async def launch(cls, headless=True, extra_args=None, chrome_path=None, user_data_dir=None, max_contexts=8):
+        """Starts Chrome with remote debugging and connects to its browser endpoint"""
+        chrome = chrome_path or os.environ.get("CHROME_PATH") or next(
+            (path for path in map(shutil.which, CHROME_CANDIDATES) if path), None)
+        if not chrome:
+            raise CDPError("Chrome not found, set CHROME_PATH")
+
+        owns_profile = user_data_dir is None
+        user_data_dir = user_data_dir or tempfile.mkdtemp(prefix="cdp-profile-")
+        args = [chrome, "--remote-debugging-port=0", f"--user-data-dir={user_data_dir}",
+                "--no-first-run", "--no-default-browser-check", "--window-size=1920,1080"]
+        if headless:
+            args.append("--headless=new")
+        args += list(extra_args or []) + ["about:blank"]
+
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        ws_url = await asyncio.wait_for(cls._read_ws_url(process), 30)
+        browser = cls(CDPConnection(await WebSocket.connect(ws_url)), process,
+                      user_data_dir if owns_profile else None, max_contexts)
+        # Chrome blocks once its stderr pipe fills up, so keep draining it
+        browser._stderr_task = asyncio.ensure_future(cls._drain(process.stderr))
+        return browser
+
+    @classmethod
+    async def connect(cls, ws_url, max_contexts=8):
+        """Attaches to an already running Chrome (e.g. one started by chromedriver)"""
+        return cls(CDPConnection(await WebSocket.connect(ws_url)), max_contexts=max_contexts)
+
+    @staticmethod
+    async def _read_ws_url(process):
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                raise CDPError("Chrome exited before opening the DevTools endpoint")
+            text = line.decode(errors="replace").strip()
+            if text.startswith("DevTools listening on "):
+                return text[len("DevTools listening on "):]
+
+    @staticmethod
+    async def _drain(stream):
+        while await stream.readline():
+            pass
+
+    async def new_page(self, browser_context_id=None):
+        """Opens a new tab and attaches a flattened session to it"""
+        params = {"url": "about:blank"}
+        if browser_context_id:
+            params["browserContextId"] = browser_context_id
+        target = await self.connection.send("Target.createTarget", params)
+        attached = await self.connection.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        page = Page(self.connection, target["targetId"], attached["sessionId"])
+        await page.enable()
+        return page
+
+    async def new_context(self):
+        """Creates an isolated browser context, waiting while max_contexts are open"""
+        await self._context_slots.acquire()
+        try:
+            created = await self.connection.send("Target.createBrowserContext", {"disposeOnDetach": True})
+        except Exception:
+            self._context_slots.release()
+            raise
+        return BrowserContext(self, created["browserContextId"])
+
+    async def set_cookies(self, cookies, browser_context_id=None):
+        """Sets cookies for the whole browser, or for one browser context"""
+        params = {"cookies": cookies}
+        if browser_context_id:
+            params["browserContextId"] = browser_context_id
+        await self.connection.send("Storage.setCookies", params)
+
+    async def close(self):
+        """Closes Chrome and removes its temporary profile"""
+        try:
+            await self.connection.send("Browser.close", timeout=5)
+        except Exception:
+            pass
+        await self.connection.close()
+        if self.process:
+            try:
+                await asyncio.wait_for(self.process.wait(), 10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+        if self._stderr_task:
+            self._stderr_task.cancel()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+class BrowserContext:
+    """An incognito-like context with its own cookies, storage and cache inside a shared Chrome"""
+
+    def __init__(self, browser, context_id):
+        self.browser = browser
+        self.context_id = context_id
+        self.closed = False
+
+    async def new_page(self):
+        """Opens a tab inside this context"""
+        return await self.browser.new_page(self.context_id)
+
+    async def set_cookies(self, cookies):
+        """Sets cookies visible only to this context"""
+        await self.browser.set_cookies(cookies, self.context_id)
+
+    async def close(self):
+        """Disposes the context with all its tabs and frees its slot"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.browser.connection.send("Target.disposeBrowserContext", {"browserContextId": self.context_id})
+        finally:
+            self.browser._context_slots.release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class Page:
+    def __init__(self, connection, target_id, session_id):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+
+    async def send(self, method, params=None, timeout=30):
+        """Sends a command to this page's target session"""
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    async def enable(self):
+        """Enables the domains the page helpers rely on"""
+        await asyncio.gather(self.send("Page.enable"), self.send("Runtime.enable"))
+
+    async def goto(self, url, timeout=30):
+        """Navigates and waits for the load event"""
+        loaded = asyncio.ensure_future(self.connection.wait_for_event("Page.loadEventFired", self.session_id, timeout))
+        await self.send("Page.navigate", {"url": url})
+        await loaded
+
+    async def evaluate(self, expression, timeout=30):
+        """Evaluates JavaScript (awaiting promises) and returns the value"""
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression, "returnByValue": True, "awaitPromise": True}, timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            description = details.get("exception", {}).get("description") or details.get("text")
+            raise CDPError(f"Script failed: {description}")
+        return result["result"].get("value")
+
+    async def url(self):
+        """Returns the current location"""
+        return await self.evaluate("location.href")
+
+    async def wait_for(self, locator, timeout=10, visible=True):
+        """Waits for a locator (XPath, css:, class:) to match inside the page, without polling from Python"""
+        script = WAIT_FOR_SCRIPT % (FIND_FUNCTION, json.dumps(locator), "true" if visible else "false",
+                                    int(timeout * 1000))
+        await self.evaluate(script, timeout + 5)
+
+    async def click(self, locator, timeout=10):
+        """Waits for an element and clicks its centre with real mouse events"""
+        await self.wait_for(locator, timeout)
+        point = await self.evaluate(ELEMENT_CENTER_SCRIPT % (FIND_FUNCTION, json.dumps(locator)))
+        if point is None:
+            raise CDPError(f"Element disappeared before click: {locator}")
+        for event in ("mousePressed", "mouseReleased"):
+            await self.send("Input.dispatchMouseEvent", {
+                "type": event, "x": point["x"], "y": point["y"], "button": "left", "clickCount": 1})
+
+    async def focus(self, locator, timeout=10, frame=False):
+        """Waits for an element and focuses it, or the body of the iframe it is with frame=True"""
+        await self.wait_for(locator, timeout)
+        script = FOCUS_SCRIPT % (FIND_FUNCTION, json.dumps(locator), "true" if frame else "false")
+        if not await self.evaluate(script):
+            raise CDPError(f"Element not found for focus: {locator}")
+
+    async def type(self, locator, text, timeout=10, frame=False):
+        """Focuses an element and inserts text, firing the input events Vue listens to"""
+        await self.focus(locator, timeout, frame)
+        await self.send("Input.insertText", {"text": text})
+
+    async def press(self, key, times=1, pause=0):
+        """Presses a named key (Enter, ArrowDown, ...) on the focused element"""
+        if key not in KEY_CODES:
+            raise CDPError(f"Unknown key: {key} (known: {', '.join(KEY_CODES)})")
+        code = KEY_CODES[key]
+        for _ in range(times):
+            down = {"type": "rawKeyDown", "key": key, "code": key, "windowsVirtualKeyCode": code}
+            if key == "Enter":
+                down.update(type="keyDown", text="\r")
+            await self.send("Input.dispatchKeyEvent", down)
+            await self.send("Input.dispatchKeyEvent", {"type": "keyUp", "key": key, "code": key, "windowsVirtualKeyCode": code})
+            await asyncio.sleep(pause)
+
+    async def screenshot(self, path):
+        """Captures a PNG of the viewport"""
+        data = await self.send("Page.captureScreenshot", {"format": "png"})
+        png = base64.b64decode(data["data"])
+        await asyncio.get_running_loop().run_in_executor(None, self._write, path, png)
+        print(f"Screenshot saved: {path}")
+
+    @staticmethod
+    def _write(path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    async def add_init_script(self, source):
+        """Runs a script in every document this tab loads, before the page's own scripts"""
+        await self.send("Page.addScriptToEvaluateOnNewDocument", {"source": source})
+
+    async def close(self):
+        """Closes the tab"""
+        await self.connection.send("Target.closeTarget", {"targetId": self.target_id})
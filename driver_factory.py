@@ -0,0 +1,169 @@
+"""
+Driver Factory Module
+This module creates the WebDriver sessions used by the test scripts, either a
+local Chrome or a Remote WebDriver session on a Selenium Grid hub, and binds
+them to the thread running a flow.
+"""
+
+from selenium import webdriver # type: ignore
+from selenium.webdriver.chrome.options import Options # type: ignore
+import os
+import queue
+import threading
+
+from event_wait import install_network_tracker
+from fault_proxy import proxy_address, proxy_args
+from failure_snapshot import install_toast_buffer
+from memory_monitor import MemoryMonitor
+from network_capture import enable_performance_log, network_capture_enabled
+from page_metrics import install_page_observer
+
+# Set this to a hub URL (e.g. http://localhost:4444) to run every flow remotely
+REMOTE_URL_ENV = "SELENIUM_REMOTE_URL"
+
+_local = threading.local()
+
+
+def build_chrome_options(headless=False, extra_args=None):
+    """Builds the Chrome options shared by local and remote sessions"""
+    chrome_options = Options()
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    if headless:
+        chrome_options.add_argument("--headless=new")
+    for arg in extra_args or []:
+        chrome_options.add_argument(arg)
+    if network_capture_enabled():
+        enable_performance_log(chrome_options)
+    if proxy_address():
+        for arg in proxy_args(proxy_address()):
+            chrome_options.add_argument(arg)
+    return chrome_options
+
+
+def create_driver(remote_url=None, options=None):
+    """Creates a local Chrome, or a Remote session when a hub URL is given or configured"""
+    remote_url = remote_url or os.environ.get(REMOTE_URL_ENV)
+    options = options or build_chrome_options()
+    if remote_url:
+        print(f"Starting remote session on {remote_url}")
+        return webdriver.Remote(command_executor=remote_url, options=options)
+    driver = webdriver.Chrome(options=options)
+    install_toast_buffer(driver)
+    install_network_tracker(driver)
+    install_page_observer(driver)
+    return driver
+
+
+# ===== Driver Binding =====
+def bind_driver(driver):
+    """Binds a driver to the current thread so DriverProxy calls reach it"""
+    _local.driver = driver
+    return driver
+
+
+def unbind_driver():
+    """Removes the driver bound to the current thread"""
+    _local.driver = None
+
+
+def current_driver():
+    """Returns the driver bound to this thread; a worker never borrows another thread's browser"""
+    driver = getattr(_local, "driver", None)
+    if driver is None:
+        raise Exception(f"No WebDriver bound to thread {threading.current_thread().name}, call bind_driver() first")
+    return driver
+
+
+class DriverProxy:
+    """Stands in for a module-level driver and forwards every call to the bound driver"""
+
+    def __getattr__(self, name):
+        return getattr(current_driver(), name)
+
+    def __repr__(self):
+        return f"<DriverProxy bound to {getattr(_local, 'driver', None)!r}>"
+
+
+# ===== Driver Pool =====
+class DriverPool:
+    def __init__(self, size, factory=create_driver, recycle_policy=None, telemetry_path=None, on_quit=None):
+        self.size = size
+        self.factory = factory
+        self.on_quit = on_quit
+        self.recycle_policy = recycle_policy
+        self.telemetry_path = telemetry_path
+        self._idle = queue.Queue()
+        self._all = []
+        self._uses = {}
+        self._monitors = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Returns an idle driver, starting a new one while the pool is below its size"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.size:
+                driver = self.factory()
+                monitor = MemoryMonitor(driver, label=f"pool-{len(self._all) + 1}", log_path=self.telemetry_path)
+                if self.recycle_policy:
+                    try:
+                        self.recycle_policy.check(monitor)
+                    except Exception:
+                        driver.quit()
+                        raise
+                self._all.append(driver)
+                self._uses[id(driver)] = 0
+                self._monitors[id(driver)] = monitor
+                return driver
+
+        return self._idle.get(timeout=timeout)
+
+    def release(self, driver, step_name="release"):
+        """Returns a driver for reuse, or recycles it once the policy says it has grown too large"""
+        self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+        monitor = self._monitors.get(id(driver))
+        if monitor and (self.recycle_policy or self.telemetry_path):
+            sample = monitor.sample(step_name)
+            reason = self.recycle_policy.reason(sample, self._uses[id(driver)]) if self.recycle_policy else None
+            if reason:
+                print(f"Recycling browser {monitor.label}: {reason}")
+                self.discard(driver)
+                return
+        self._idle.put(driver)
+
+    def monitor(self, driver):
+        """Memory monitor attached to a pooled driver"""
+        return self._monitors.get(id(driver))
+
+    def discard(self, driver):
+        """Quits a broken or recycled driver and frees its slot"""
+        with self._lock:
+            if driver in self._all:
+                self._all.remove(driver)
+            self._uses.pop(id(driver), None)
+            self._monitors.pop(id(driver), None)
+        self._quit(driver)
+
+    def close_all(self):
+        """Quits every driver the pool has started"""
+        with self._lock:
+            drivers, self._all = self._all, []
+            self._uses.clear()
+            self._monitors.clear()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for driver in drivers:
+            self._quit(driver)
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"WARNING: Failed to quit driver: {str(e)}")
+        if self.on_quit:
+            self.on_quit(driver)
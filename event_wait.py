@@ -0,0 +1,211 @@
+"""
+Event Wait Module
+This module waits for page conditions inside the browser instead of polling
+from Python. Each wait is one execute_async_script call: the script checks the
+condition, then re-checks it on every DOM mutation (and a short in-page timer)
+and calls back the moment it holds. Conditions: an element being present,
+visible, clickable or gone, a route change, network idle, or any JavaScript
+expression.
+"""
+
+from selenium.common.exceptions import TimeoutException # type: ignore
+import os
+
+# Script timeout set once per session; every wait enforces its own timeout in the page
+SESSION_SCRIPT_TIMEOUT = 120
+
+_configured_sessions = set()
+
+# Counts fetch/XHR requests in flight from the moment it is installed
+NETWORK_TRACKER_SCRIPT = """
+(() => {
+    if (window.__eventWaitNet) return;
+    const net = window.__eventWaitNet = {inflight: 0, last: performance.now()};
+    const begin = () => { net.inflight++; net.last = performance.now(); };
+    const end = () => { net.inflight = Math.max(0, net.inflight - 1); net.last = performance.now(); };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        begin();
+        this.addEventListener('loadend', end, {once: true});
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        const fetch = window.fetch;
+        window.fetch = function () {
+            begin();
+            return fetch.apply(this, arguments).finally(end);
+        };
+    }
+})();
+"""
+
+WAIT_SCRIPT = """
+const [condition, options, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const started = performance.now();
+
+const find = (by, value) => {
+    switch (by) {
+        case 'xpath': {
+            const result = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const nodes = [];
+            for (let i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+            return nodes;
+        }
+        case 'css selector': return Array.from(document.querySelectorAll(value));
+        case 'class name': return Array.from(document.getElementsByClassName(value));
+        case 'id': return document.getElementById(value) ? [document.getElementById(value)] : [];
+        case 'name': return Array.from(document.getElementsByName(value));
+        case 'tag name': return Array.from(document.getElementsByTagName(value));
+        case 'link text': return Array.from(document.links).filter(a => a.innerText.trim() === value);
+        default: throw new Error('Unsupported locator strategy: ' + by);
+    }
+};
+const visible = el => {
+    if (!el.getClientRects().length) return false;
+    const style = getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none';
+};
+
+const checks = {
+    present: () => { const el = find(options.by, options.value)[0]; return el ? {element: el} : null; },
+    visible: () => { const el = find(options.by, options.value)[0]; return el && visible(el) ? {element: el} : null; },
+    clickable: () => {
+        const el = find(options.by, options.value)[0];
+        return el && visible(el) && !el.disabled ? {element: el} : null;
+    },
+    gone: () => find(options.by, options.value).some(visible) ? null : {gone: true},
+    route: () => {
+        const href = location.href;
+        if (options.pattern) return new RegExp(options.pattern).test(href) ? {url: href} : null;
+        return href !== options.from ? {url: href} : null;
+    },
+    network_idle: () => {
+        const net = window.__eventWaitNet;
+        const entries = performance.getEntriesByType('resource');
+        const lastResource = entries.length ? entries[entries.length - 1].responseEnd : 0;
+        const last = Math.max(net.last, lastResource);
+        return net.inflight === 0 && performance.now() - last >= options.idle_ms
+            ? {idle_ms: Math.round(performance.now() - last)} : null;
+    },
+    script: () => { const value = (new Function(options.body))(); return value ? {value: value} : null; },
+};
+const check = checks[condition];
+if (condition === 'network_idle') { %s }
+
+let finished = false;
+let observer = null;
+let timer = null;
+const finish = result => {
+    if (finished) return;
+    finished = true;
+    if (observer) observer.disconnect();
+    clearInterval(timer);
+    clearTimeout(deadline);
+    window.removeEventListener('popstate', evaluate);
+    window.removeEventListener('hashchange', evaluate);
+    result.elapsed_ms = Math.round(performance.now() - started);
+    done(result);
+};
+const evaluate = () => {
+    if (finished) return;
+    try {
+        const result = check();
+        if (result) finish(result);
+    } catch (e) {
+        finish({error: String(e)});
+    }
+};
+const deadline = setTimeout(() => finish({timeout: true}), timeoutMs);
+evaluate();
+if (!finished) {
+    observer = new MutationObserver(evaluate);
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    window.addEventListener('popstate', evaluate);
+    window.addEventListener('hashchange', evaluate);
+    // Catches changes no mutation reports: CSS transitions, pushState, network counters
+    timer = setInterval(evaluate, options.interval_ms);
+}
+""" % NETWORK_TRACKER_SCRIPT
+
+
+class EventWait:
+    def __init__(self, driver, timeout=10, interval_ms=50):
+        self.driver = driver
+        self.timeout = timeout
+        self.interval_ms = interval_ms
+
+    def _configure(self):
+        """Raises the session's script timeout once, so each wait costs a single round trip"""
+        session_id = self.driver.session_id
+        if session_id not in _configured_sessions:
+            self.driver.set_script_timeout(max(SESSION_SCRIPT_TIMEOUT, self.timeout + 5))
+            _configured_sessions.add(session_id)
+
+    def until(self, condition, options, timeout=None, message=""):
+        """Runs one wait in the page and returns its result; raises TimeoutException like WebDriverWait"""
+        self._configure()
+        timeout = timeout or self.timeout
+        options = dict(options, interval_ms=self.interval_ms)
+        result = self.driver.execute_async_script(WAIT_SCRIPT, condition, options, int(timeout * 1000))
+        if result.get("timeout"):
+            raise TimeoutException(message or f"Timed out after {timeout}s waiting for {condition} {options}")
+        if result.get("error"):
+            raise Exception(f"Wait for {condition} failed in the page: {result['error']}")
+        return result
+
+    # ===== Conditions =====
+    def present(self, locator, timeout=None):
+        """First element matching a (By, value) locator once it is in the DOM"""
+        return self._element("present", locator, timeout)
+
+    def visible(self, locator, timeout=None):
+        return self._element("visible", locator, timeout)
+
+    def clickable(self, locator, timeout=None):
+        """First matching element once it is visible and enabled"""
+        return self._element("clickable", locator, timeout)
+
+    def gone(self, locator, timeout=None):
+        """Waits until no matching element is visible (e.g. a loading mask or closed dialog)"""
+        by, value = locator
+        self.until("gone", {"by": by, "value": value}, timeout, f"Element still visible: {value}")
+        return True
+
+    def route(self, pattern=None, from_url=None, timeout=None):
+        """Waits for the URL to match a regex, or to move away from from_url; returns the new URL"""
+        from_url = from_url if from_url is not None or pattern else self.driver.current_url
+        result = self.until("route", {"pattern": pattern, "from": from_url}, timeout,
+                            f"Route did not change to {pattern or 'a new URL'}")
+        return result["url"]
+
+    def network_idle(self, idle_ms=500, timeout=None):
+        """Waits until no fetch/XHR has been in flight for idle_ms"""
+        return self.until("network_idle", {"idle_ms": idle_ms}, timeout, "Network did not go idle")["idle_ms"]
+
+    def script(self, body, timeout=None):
+        """Waits until a JavaScript function body returns a truthy value and returns it"""
+        return self.until("script", {"body": body}, timeout, f"Condition not met: {body}")["value"]
+
+    def _element(self, state, locator, timeout):
+        by, value = locator
+        result = self.until(state, {"by": by, "value": value}, timeout, f"Element not {state}: {value}")
+        return result["element"]
+
+
+def install_network_tracker(driver):
+    """Counts requests from document start in every page the session loads (needs CDP)"""
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return False
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_TRACKER_SCRIPT})
+        return True
+    except Exception as e:
+        print(f"WARNING: Network tracker not installed: {str(e)}")
+        return False
+
+
+def event_waits_enabled():
+    """Event waits are used unless WAIT_STRATEGY=poll"""
+    return os.environ.get("WAIT_STRATEGY", "event") != "poll"
+
@@ -0,0 +1,137 @@
+"""
+Failure Snapshot Module
+This module captures what a failed step looked like to the browser: an MHTML
+snapshot of the page (CDP Page.captureSnapshot, or the serialized DOM where
+CDP is not available), the toasts shown so far and the last network requests.
+Collection is a few quick calls on the failing thread; compression and writing
+happen on a background writer, into the run archive when one is open.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import gzip
+import json
+import os
+
+from report_store import get_store
+
+# Keeps every Element UI toast of the document in window.__toastBuffer
+TOAST_BUFFER_SCRIPT = """
+(() => {
+    if (window.__toastBuffer) return;
+    window.__toastBuffer = [];
+    const record = node => {
+        if (node.nodeType !== 1) return;
+        const message = node.matches('.el-message, .el-notification') ? node
+            : node.querySelector('.el-message, .el-notification');
+        if (!message) return;
+        window.__toastBuffer.push({
+            time: new Date().toISOString(),
+            type: message.className,
+            text: message.innerText.trim()
+        });
+        if (window.__toastBuffer.length > 50) window.__toastBuffer.shift();
+    };
+    const start = () => new MutationObserver(mutations => {
+        mutations.forEach(mutation => mutation.addedNodes.forEach(record));
+    }).observe(document.body, {childList: true, subtree: true});
+    if (document.body) start(); else document.addEventListener('DOMContentLoaded', start);
+})();
+"""
+
+COLLECT_SCRIPT = """
+const limit = arguments[0];
+const visible = Array.from(document.querySelectorAll('.el-message, .el-notification, .el-message-box'))
+    .map(el => ({type: el.className, text: el.innerText.trim()}));
+const requests = performance.getEntriesByType('resource').slice(-limit).map(entry => ({
+    url: entry.name,
+    type: entry.initiatorType,
+    start_ms: Math.round(entry.startTime),
+    duration_ms: Math.round(entry.duration),
+    status: entry.responseStatus || null,
+    transfer_size: entry.transferSize
+}));
+return {
+    url: location.href,
+    title: document.title,
+    toasts: window.__toastBuffer || [],
+    visible_toasts: visible,
+    requests: requests,
+    html: document.documentElement.outerHTML
+};
+"""
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot-writer")
+
+
+def install_toast_buffer(driver):
+    """Registers the toast buffer for every document the session loads (needs CDP)"""
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return False
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": TOAST_BUFFER_SCRIPT})
+        driver.execute_script(TOAST_BUFFER_SCRIPT)
+        return True
+    except Exception as e:
+        print(f"WARNING: Toast buffer not installed: {str(e)}")
+        return False
+
+
+def collect(driver, request_limit=30):
+    """Gathers page state on the calling thread; only cheap browser calls happen here"""
+    state = driver.execute_script(COLLECT_SCRIPT, request_limit)
+    state["captured_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    state["mhtml"] = None
+    if hasattr(driver, "execute_cdp_cmd"):
+        try:
+            state["mhtml"] = driver.execute_cdp_cmd("Page.captureSnapshot", {"format": "mhtml"})["data"]
+        except Exception as e:
+            print(f"WARNING: MHTML snapshot failed, keeping the DOM only: {str(e)}")
+    return state
+
+
+def write_snapshot(state, step_name, report_dir):
+    """Compresses and stores the snapshot; runs on the writer thread"""
+    if state["mhtml"]:
+        page, extension = state.pop("mhtml").encode("utf-8"), ".mhtml.gz"
+        state.pop("html")
+    else:
+        state.pop("mhtml")
+        page, extension = state.pop("html").encode("utf-8"), ".html.gz"
+    details = json.dumps(state, ensure_ascii=False, indent=1).encode("utf-8")
+
+    store = get_store(report_dir)
+    artifacts = [(f"{step_name}_snapshot", gzip.compress(page, 6), extension),
+                 (f"{step_name}_state", gzip.compress(details, 6), ".json.gz")]
+    paths = []
+    for name, data, ext in artifacts:
+        if store:
+            # Already gzipped, so stored without zip compression
+            paths.append(f"{store.archive_path}::{store.add_file(name, data, 'snapshot', ext, 0)}")
+        else:
+            path = os.path.join(report_dir, f"{name}{ext}")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+    print(f"Failure snapshot saved: {', '.join(paths)}")
+    return paths
+
+
+def capture_failure(driver, step_name, report_dir):
+    """Captures a failure snapshot and hands it to the background writer; never raises"""
+    try:
+        state = collect(driver)
+    except Exception as e:
+        print(f"WARNING: Failure snapshot not captured: {str(e)}")
+        return None
+    future = _writer.submit(write_snapshot, state, step_name, report_dir)
+    store = get_store(report_dir)
+    if store:
+        store.track(future)
+    return future
+
+
+def read_snapshot(path):
+    """Decompressed text of a snapshot file written outside an archive"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return f.read()
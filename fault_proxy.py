@@ -0,0 +1,290 @@
+"""
+Fault Proxy Module
+This module runs a local HTTP proxy for the browsers to route through, which
+slows down, jitters or fails backend calls according to a scenario file. It is
+used to tune the wait and latency budgets and to catch races that only show
+when the backend is slow (e.g. the positional /html/body/div[N] toast
+locators). Every injected delay and error is recorded and written to the run
+report.
+
+    python runner.py run add_ip --scenario scenarios/slow_backend.json
+    python fault_proxy.py serve scenarios/slow_backend.json --port 8899
+    FAULT_PROXY=127.0.0.1:8899 python flow_engine.py add_ip
+
+A scenario is a JSON file with rules; the first rule whose URL pattern
+(fnmatch) and method match a request applies:
+
+    {"name": "flaky_backend", "seed": 1, "rules": [
+        {"match": "https://*ipipgo*", "latency_ms": 1500, "jitter_ms": 500},
+        {"match": "https://sso.*", "error_rate": 0.2, "error_status": 503}]}
+
+HTTPS traffic goes through CONNECT tunnels the proxy cannot look into: for
+https:// sites a rule matches on https://host and the CONNECT method only, so
+path patterns and other methods only apply to plain http:// requests. Its
+latency is added at the start of every tunnel turn (the client writing again
+after the server answered: a request, or a TLS handshake round trip), and
+errors refuse the tunnel. The report counts requests and tunnel turns apart.
+"""
+
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import fnmatch
+import http.client
+import json
+import os
+import random
+import select
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+FAULT_PROXY_ENV = "FAULT_PROXY"
+FAULT_SCENARIO_ENV = "FAULT_SCENARIO"
+UPSTREAM_TIMEOUT = 60
+TUNNEL_IDLE_TIMEOUT = 120
+# Connection-level headers are not forwarded
+HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "proxy-authenticate", "proxy-authorization", "te",
+               "trailers", "transfer-encoding", "upgrade"}
+RULE_KEYS = {"match", "methods", "latency_ms", "jitter_ms", "error_rate", "error_status"}
+
+
+def proxy_address():
+    """host:port of the fault proxy the browsers should use (FAULT_PROXY), or None"""
+    return os.environ.get(FAULT_PROXY_ENV) or None
+
+
+def proxy_args(address):
+    """Chrome arguments routing all traffic through the proxy"""
+    # HTTP/2 multiplexes requests in one tunnel; HTTP/1.1 keeps one request per tunnel turn
+    return [f"--proxy-server=http://{address}", "--proxy-bypass-list=<-loopback>", "--disable-http2"]
+
+
+def load_scenario(path):
+    """Reads and checks a scenario file"""
+    with open(path, encoding="utf-8") as f:
+        scenario = json.load(f)
+    rules = scenario.get("rules")
+    if not isinstance(rules, list) or not rules:
+        raise Exception(f"Scenario {path} has no rules")
+    for number, rule in enumerate(rules, start=1):
+        unknown = set(rule) - RULE_KEYS
+        if unknown or "match" not in rule:
+            raise Exception(f"Scenario {path} rule {number}: needs \"match\", unknown keys {sorted(unknown)}")
+        if not 0 <= rule.get("error_rate", 0) <= 1:
+            raise Exception(f"Scenario {path} rule {number}: error_rate must be between 0 and 1")
+    scenario.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return scenario
+
+
+class FaultProxy:
+    """The proxy server plus the faults it injected"""
+
+    def __init__(self, scenario, host="127.0.0.1", port=0):
+        self.scenario = scenario
+        self.random = random.Random(scenario.get("seed"))
+        self.events = []
+        self.requests = 0
+        self.turns = 0
+        self._lock = threading.Lock()
+        handler = type("BoundProxyHandler", (ProxyHandler,), {"proxy": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Fault proxy for scenario {self.scenario['name']} listening on {self.address}")
+        return self.address
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def rule_for(self, method, url):
+        """(index, rule) of the first matching rule, or (None, None)"""
+        for index, rule in enumerate(self.scenario["rules"]):
+            methods = [m.upper() for m in rule.get("methods") or []]
+            if fnmatch.fnmatch(url, rule["match"]) and (not methods or method in methods):
+                return index, rule
+        return None, None
+
+    def decide(self, method, url, turn=False):
+        """(rule index, delay in ms, error status or None) for a request or tunnel turn; records what it injects"""
+        # A CONNECT can only be refused; its latency is added to each turn of the tunnel it opens
+        index, rule = self.rule_for(method, url)
+        with self._lock:
+            if turn:
+                self.turns += 1
+            else:
+                self.requests += 1
+            if rule is None:
+                return None, 0.0, None
+            delay = 0.0
+            if turn or method != "CONNECT":
+                delay = rule.get("latency_ms", 0) + self.random.uniform(0, rule.get("jitter_ms", 0))
+            failed = not turn and self.random.random() < rule.get("error_rate", 0)
+            error = rule.get("error_status", 503) if failed else None
+            if delay or error:
+                self.events.append({"time": datetime.now().strftime("%H:%M:%S.%f")[:-3],
+                                    "method": "TUNNEL" if turn else method, "url": url, "rule": index,
+                                    "delay_ms": round(delay, 1), "error": error})
+        return index, delay, error
+
+    def summary(self):
+        with self._lock:
+            events = list(self.events)
+            requests, turns = self.requests, self.turns
+        rules = []
+        for index, rule in enumerate(self.scenario["rules"]):
+            matched = [event for event in events if event["rule"] == index]
+            delays = [event["delay_ms"] for event in matched if event["delay_ms"]]
+            rules.append({"rule": index, "match": rule["match"], "injected": len(matched),
+                          "errors": sum(1 for event in matched if event["error"]),
+                          "mean_delay_ms": round(sum(delays) / len(delays), 1) if delays else 0.0})
+        return {"scenario": self.scenario["name"], "seed": self.scenario.get("seed"), "requests": requests,
+                "tunnel_turns": turns, "rules": rules, "events": events}
+
+    def save(self, report_dir):
+        """Writes what the proxy injected during the run to fault_injection.json in the report"""
+        summary = self.summary()
+        path = os.path.join(report_dir, "fault_injection.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        injected = sum(rule["injected"] for rule in summary["rules"])
+        errors = sum(rule["errors"] for rule in summary["rules"])
+        print(f"Fault proxy: {injected} faults injected ({errors} errors) over {summary['requests']} requests "
+              f"and {summary['tunnel_turns']} tunnel turns, see {path}")
+        return path
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """Forward proxy: plain HTTP requests by absolute URL, HTTPS through CONNECT tunnels"""
+
+    proxy = None
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def fail(self, status):
+        body = f"Injected by fault proxy ({self.proxy.scenario['name']})".encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def forward(self):
+        _, delay, error = self.proxy.decide(self.command, self.path)
+        if delay:
+            time.sleep(delay / 1000)
+        if error:
+            self.fail(error)
+            return
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)) or None
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in HOP_HEADERS}
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=UPSTREAM_TIMEOUT)
+        try:
+            connection.request(self.command, url.path + (f"?{url.query}" if url.query else "") or "/", body, headers)
+            response = connection.getresponse()
+            data = response.read()
+        except OSError as e:
+            self.fail(502)
+            print(f"WARNING: Fault proxy could not reach {url.netloc}: {str(e)}")
+            return
+        finally:
+            connection.close()
+        self.send_response(response.status, response.reason)
+        for name, value in response.getheaders():
+            if name.lower() not in HOP_HEADERS and name.lower() != "content-length":
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = forward
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(":")
+        url = f"https://{host}"
+        _, _, error = self.proxy.decide("CONNECT", url)
+        if error:
+            self.fail(error)
+            return
+        try:
+            upstream = socket.create_connection((host, int(port or 443)), timeout=UPSTREAM_TIMEOUT)
+        except OSError:
+            self.fail(502)
+            return
+        self.send_response(200, "Connection Established")
+        self.end_headers()
+        try:
+            self.tunnel(upstream, url)
+        finally:
+            upstream.close()
+
+    def tunnel(self, upstream, url):
+        """Relays bytes both ways, delaying the first client write after each upstream answer (a new turn)"""
+        client = self.connection
+        new_turn = True
+        while True:
+            readable, _, broken = select.select([client, upstream], [], [client, upstream], TUNNEL_IDLE_TIMEOUT)
+            if broken or not readable:
+                return
+            for sock in readable:
+                try:
+                    data = sock.recv(65536)
+                except OSError:
+                    return
+                if not data:
+                    return
+                if sock is client:
+                    if new_turn:
+                        _, delay, _ = self.proxy.decide("CONNECT", url, turn=True)
+                        if delay:
+                            time.sleep(delay / 1000)
+                    new_turn = False
+                    upstream.sendall(data)
+                else:
+                    new_turn = True
+                    client.sendall(data)
+
+
+def main():
+    """Serves a scenario until Ctrl+C, then writes what it injected"""
+    parser = argparse.ArgumentParser(description="Local proxy injecting latency, jitter and errors")
+    parser.add_argument("command", choices=["serve", "check"])
+    parser.add_argument("scenario")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--report-dir", default=os.getcwd(), help="where fault_injection.json is written on exit")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    if args.command == "check":
+        for index, rule in enumerate(scenario["rules"]):
+            print(f"{index}: {json.dumps(rule, ensure_ascii=False)}")
+        return
+    proxy = FaultProxy(scenario, port=args.port)
+    proxy.start()
+    print(f"Route browsers through it with: {FAULT_PROXY_ENV}={proxy.address}")
+    try:
+        proxy.thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.stop()
+        proxy.save(args.report_dir)
+
+
+if __name__ == "__main__":
+    main()
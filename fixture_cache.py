@@ -0,0 +1,239 @@
+"""
+Fixture Cache Module
+This module remembers prerequisite entities (suppliers, server groups,
+customer sources, article categories) that earlier runs created, per
+environment, in a small SQLite database. Dependent flows such as add_ip and
+add_new_link take a cached entity that is still known to exist and only run
+the prerequisite flow on a cache miss. With the cache turned off, entities
+created earlier in the same process are still reused (SessionFixtures).
+
+    python fixture_cache.py list
+    python fixture_cache.py clear --kind supplier
+"""
+
+from selenium.webdriver.support.ui import WebDriverWait # type: ignore
+from contextlib import contextmanager
+from datetime import datetime
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from table_reader import TableReader
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "fixtures.sqlite")
+DEFAULT_TTL = 24 * 3600
+# A cached entity verified this recently is handed out without checking again
+VERIFY_INTERVAL = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    environment TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    verified_at REAL NOT NULL,
+    PRIMARY KEY (environment, kind, name)
+)
+"""
+
+
+class FixtureCache:
+    # Entities outlive the run, so dependents of a failed producer can still use an older one
+    persistent = True
+
+    def __init__(self, environment, path=CACHE_PATH, ttl=DEFAULT_TTL, verify_interval=VERIFY_INTERVAL):
+        self.environment = environment
+        self.path = path
+        self.ttl = ttl
+        self.verify_interval = verify_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A connection that commits on success and is always closed"""
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def put(self, kind, name, data=None):
+        """Records an entity that a flow has just created (and so verified)"""
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?, ?)",
+                (self.environment, kind, name, json.dumps(data or {}), now, now))
+
+    def invalidate(self, kind, name):
+        with self._lock, self._connect() as connection:
+            connection.execute("DELETE FROM entities WHERE environment = ? AND kind = ? AND name = ?",
+                               (self.environment, kind, name))
+
+    def entries(self, kind=None):
+        """Unexpired entities of this environment, newest first"""
+        query = "SELECT * FROM entities WHERE environment = ? AND created_at > ?"
+        params = [self.environment, time.time() - self.ttl]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(query + " ORDER BY created_at DESC", params)]
+
+    def get(self, kind, verify=None):
+        """Returns a live cached entity, checking it with verify(name) when not verified recently"""
+        for entry in self.entries(kind):
+            if verify and time.time() - entry["verified_at"] > self.verify_interval:
+                try:
+                    alive = verify(entry["name"])
+                except Exception as e:
+                    print(f"WARNING: Could not verify cached {kind} {entry['name']}: {str(e)}")
+                    alive = False
+                if not alive:
+                    print(f"Cached {kind} {entry['name']} no longer exists, dropping it")
+                    self.invalidate(kind, entry["name"])
+                    continue
+                with self._lock, self._connect() as connection:
+                    connection.execute(
+                        "UPDATE entities SET verified_at = ? WHERE environment = ? AND kind = ? AND name = ?",
+                        (time.time(), self.environment, kind, entry["name"]))
+            self.hits += 1
+            print(f"Fixture cache hit: {kind} {entry['name']}")
+            return entry
+        self.misses += 1
+        print(f"Fixture cache miss: {kind}")
+        return None
+
+    def ensure(self, kind, create, verify=None):
+        """Name of a live entity of a kind, calling create() for a new one on a cache miss"""
+        entry = self.get(kind, verify)
+        if entry:
+            return entry["name"]
+        name = create()
+        self.put(kind, name)
+        return name
+
+    def clear(self, kind=None):
+        query = "DELETE FROM entities WHERE environment = ?"
+        params = [self.environment]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock, self._connect() as connection:
+            connection.execute(query, params)
+
+
+class SessionFixtures:
+    """In-memory stand-in for FixtureCache when FIXTURE_CACHE=0: entities created in this process only"""
+
+    persistent = False
+
+    def __init__(self, environment):
+        self.environment = environment
+        self.hits = 0
+        self.misses = 0
+        self._entities = {}
+        self._lock = threading.Lock()
+
+    def put(self, kind, name, data=None):
+        with self._lock:
+            self._entities.setdefault(kind, []).insert(0, {"kind": kind, "name": name, "data": json.dumps(data or {}),
+                                                           "created_at": time.time(), "verified_at": time.time()})
+
+    def invalidate(self, kind, name):
+        with self._lock:
+            self._entities[kind] = [entry for entry in self._entities.get(kind, []) if entry["name"] != name]
+
+    def entries(self, kind=None):
+        with self._lock:
+            if kind:
+                return list(self._entities.get(kind, []))
+            return [entry for entries in self._entities.values() for entry in entries]
+
+    def ensure(self, kind, create, verify=None):
+        """Name of an entity created earlier in this process, or of a new one from create()"""
+        entries = self.entries(kind)
+        if entries:
+            self.hits += 1
+            print(f"Reusing {kind} {entries[0]['name']} from this session")
+            return entries[0]["name"]
+        self.misses += 1
+        name = create()
+        self.put(kind, name)
+        return name
+
+    def clear(self, kind=None):
+        with self._lock:
+            if kind:
+                self._entities.pop(kind, None)
+            else:
+                self._entities.clear()
+
+
+_session_fixtures = {}
+_session_lock = threading.Lock()
+
+
+def session_fixtures(environment):
+    """The process-wide SessionFixtures of an environment"""
+    with _session_lock:
+        return _session_fixtures.setdefault(environment, SessionFixtures(environment))
+
+
+class TableVerifier:
+    """Checks an entity exists by looking its name up in the list page's table"""
+
+    def __init__(self, driver, base_url, path, max_pages=3, page_size=100):
+        self.driver = driver
+        self.url = f"{base_url.rstrip('/')}/{path.lstrip('/')}"
+        self.max_pages = max_pages
+        self.page_size = page_size
+
+    def __call__(self, name):
+        self.driver.get(self.url)
+        reader = TableReader(self.driver, WebDriverWait(self.driver, 10))
+        for page in reader.iter_pages(page_size=self.page_size, max_pages=self.max_pages):
+            if any(name in cell for row in page["rows"] for cell in row):
+                return True
+        return False
+
+
+def fixtures_enabled():
+    """The cache is used unless FIXTURE_CACHE=0"""
+    return os.environ.get("FIXTURE_CACHE", "1") != "0"
+
+
+def main():
+    """Lists or clears cached prerequisite entities"""
+    from flow_engine import BASE_URL
+
+    parser = argparse.ArgumentParser(description="Inspect the prerequisite fixture cache")
+    parser.add_argument("command", choices=["list", "clear"])
+    parser.add_argument("--kind", default=None)
+    parser.add_argument("--environment", default=BASE_URL)
+    args = parser.parse_args()
+
+    cache = FixtureCache(args.environment)
+    if args.command == "clear":
+        cache.clear(args.kind)
+        print(f"Cleared {args.kind or 'all'} fixtures of {args.environment}")
+        return
+    for entry in cache.entries(args.kind):
+        created = datetime.fromtimestamp(entry["created_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        verified = datetime.fromtimestamp(entry["verified_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{entry['kind']:<18} {entry['name']:<40} created {created}  verified {verified}")
+
+
+if __name__ == "__main__":
+    main()
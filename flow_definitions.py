@@ -0,0 +1,252 @@
+"""
+Flow Definitions Module
+This module describes the admin flows as data for the step engine in
+flow_engine.py: the page path, the locators, the actions and values, and how
+success is verified. Screenshot names match the ones the scripts always took.
+"""
+
+from datetime import datetime
+import random
+import string
+
+from flow_engine import Flow, Step
+
+# ===== Shared Locators =====
+LAYOUT = '//*[@id="app"]/div/div[2]/section/section/div'
+DIALOG = f"{LAYOUT}/div[2]/div"
+FORM = f"{DIALOG}/div[2]/form"
+SUBMIT = f"{DIALOG}/div[3]/div/button[2]/span"
+# Article pages nest their content one div deeper
+ARTICLE_LAYOUT = "//*[@id='app']/div/div[2]/section/section/div/div"
+ARTICLE_FORM = f"{ARTICLE_LAYOUT}/div[2]/div/div[2]/form"
+ARTICLE_SUBMIT = f"{ARTICLE_LAYOUT}/div[2]/div/div[3]/div/button[2]/span"
+
+# ===== Latency Budgets (seconds) =====
+# Over-budget steps warn; LATENCY_BUDGETS=fail turns every budget into a hard failure
+PAGE_BUDGET = 8.0
+DIALOG_BUDGET = 2.0
+SAVE_BUDGET = 3.0
+
+
+# ===== Value Generators =====
+def timestamp():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def random_string(length=8):
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=length))
+
+
+def generate_random_ip():
+    """Generates a random IP address with port"""
+    ip_parts = [str(random.randint(0, 255)) for _ in range(4)]
+    return f"{'.'.join(ip_parts)}:{random.randint(1111, 9999)}"
+
+
+def generate_random_words(count):
+    """Generate random words for testing"""
+    words = ['test', 'article', 'content', 'sample', 'random', 'example', 'data', 'text', 'word', 'sentence',
+             'paragraph', 'story', 'news', 'update', 'information', 'details', 'description', 'summary', 'note']
+    return ' '.join(random.choices(words, k=count))
+
+
+def select_first(input_xpath, prefix, first, title):
+    """Opens an Element UI select with Space and picks its first option"""
+    return [
+        Step("click", input_xpath, name=f"{first:02d}_{prefix}_input_click", title=f"Open {title}"),
+        Step("press", input_xpath, "SPACE", name=f"{first + 1:02d}_{prefix}_dropdown", pause=2),
+        Step("press", input_xpath, "ARROW_DOWN", name=f"{first + 2:02d}_{prefix}_select"),
+        Step("press", input_xpath, "ENTER", name=f"{first + 3:02d}_{prefix}_confirm", title=f"Confirm {title}"),
+    ]
+
+
+def option(value_name):
+    """XPath of the open dropdown's option showing a flow value, e.g. a prerequisite handed out by the cache"""
+    # Element UI renders select options into <body>, so they are matched by their text
+    return f"//li[contains(@class, 'el-select-dropdown__item')][normalize-space()='{{{value_name}}}']"
+
+
+# ===== Flows =====
+ADD_SUPPLIER = Flow(
+    name="add_supplier",
+    title="Add Supplier",
+    path="operation/provider",
+    tags=("supplier", "operation"),
+    provides=("supplier", "supplier_name"),
+    values={"supplier_name": lambda: f"MY-S-{timestamp()}"},
+    load_budget=PAGE_BUDGET,
+    initial_screenshot="07_initial_page",
+    steps=[
+        Step("click", f"{LAYOUT}/form/button/span", name="08_create_button", title="Click Create Supplier Button"),
+        Step("wait", f"{DIALOG}/div[1]/span", title="Wait for Popup", pause=0, budget=DIALOG_BUDGET),
+        Step("fill", f"{FORM}/div[1]/div/div/input", "{supplier_name}", name="09_name_input",
+             title="Enter Supplier Name"),
+        Step("click", SUBMIT, title="Submit Form", pause=0),
+        Step("verify_toast", "/html/body/div[4]/p", name="10_success_message", title="Verify Success Message",
+             budget=SAVE_BUDGET),
+    ],
+)
+
+ADD_SERVER_GROUP = Flow(
+    name="add_server_group",
+    title="Add Server Group",
+    path="operation/server-group",
+    tags=("supplier", "operation"),
+    provides=("server_group", "server_group_name"),
+    values={"server_group_name": lambda: f"MY-SG-{timestamp()}"},
+    load_budget=PAGE_BUDGET,
+    initial_screenshot="11_initial_page",
+    steps=[
+        Step("click", f"{LAYOUT}/form/button/span", name="12_add_button", title="Click Add Server Group Button"),
+        Step("wait", f"{DIALOG}/div[1]", title="Wait for Dialog", pause=0, budget=DIALOG_BUDGET),
+        Step("fill", f"{FORM}/div[2]/div/div/input", "{server_group_name}", name="13_name_input",
+             title="Enter Server Group Name"),
+        *select_first(f"{FORM}/div[3]/div/div/div[1]/div[1]/input", "country", 14, "Country"),
+        *select_first(f"{FORM}/div[3]/div/div/div[2]/div[1]/input", "city", 18, "City"),
+        Step("click", SUBMIT, title="Submit Form", pause=0),
+        Step("verify_toast", "/html/body/div[6]/p", name="22_success_message", title="Verify Success Message",
+             budget=SAVE_BUDGET),
+    ],
+)
+
+ADD_IP = Flow(
+    name="add_ip",
+    title="Add IP",
+    path="operation/ip",
+    tags=("supplier", "operation"),
+    depends_on=("add_supplier", "add_server_group"),
+    requires=("supplier", "server_group"),
+    values={"ip": generate_random_ip},
+    load_budget=PAGE_BUDGET,
+    initial_screenshot="23_initial_page",
+    steps=[
+        Step("click", f"{LAYOUT}/form/button[2]/span", name="24_add_button", title="Click Add IP Button"),
+        Step("wait", f"{DIALOG}/div[1]/span", name="25_popup", title="Wait for Popup", key=True, pause=0,
+             budget=DIALOG_BUDGET),
+        Step("click", f"{FORM}/div[1]/div/div/div/input", name="26_supplier_input", title="Open Supplier"),
+        Step("click", option("supplier_name"), title="Select Supplier", preflight=False),
+        Step("click", f"{FORM}/div[2]/div/div/div/input", name="27_server_input", title="Open Server Group"),
+        Step("type", f"{FORM}/div[2]/div/div/div/input", "{server_group_name}", name="28_server_search",
+             title="Search Server Group", pause=1),
+        Step("click", option("server_group_name"), name="30_server_confirm", title="Select Server Group",
+             preflight=False),
+        Step("fill", f"{FORM}/div[3]/div/div[1]/textarea", "{ip}", name="31_ip_entered", title="Enter IP Address"),
+        Step("click", SUBMIT, title="Submit Form", pause=0),
+        Step("verify_toast", "/html/body/div[7]/p", name="32_success_message", title="Verify Success Message",
+             budget=SAVE_BUDGET),
+    ],
+)
+
+ADD_NEW_SOURCE = Flow(
+    name="add_new_source",
+    title="Add New Source",
+    path="promoting-short-link/customer-source",
+    tags=("promotion",),
+    provides=("customer_source", "source_name"),
+    values={"source_name": lambda: f"MY-S-{timestamp()}"},
+    load_budget=PAGE_BUDGET,
+    initial_screenshot="07_initial_page",
+    final_screenshot="final_success",
+    steps=[
+        Step("click", "//span[text()='添加新来源']/..", name="08_add_button", title="Click Add New Source Button"),
+        Step("wait", "//*[contains(@class, 'el-message-box')]//input", name="09_popup", title="Wait for Popup",
+             key=True, budget=DIALOG_BUDGET),
+        Step("type", "//*[contains(@class, 'el-message-box')]//input", "{source_name}", title="Enter Source Name",
+             pause=0),
+        Step("press", "//*[contains(@class, 'el-message-box')]//input", "ENTER", name="10_name_input",
+             title="Confirm Source Name", pause=0),
+        Step("verify_toast", "/html/body/div[5]", name="11_success_message", title="Verify Success Message",
+             timeout=1, pause=1, budget=SAVE_BUDGET),
+    ],
+)
+
+ADD_NEW_LINK = Flow(
+    name="add_new_link",
+    title="Add New Link",
+    path="promoting-short-link/channel",
+    tags=("promotion",),
+    depends_on=("add_new_source",),
+    requires=("customer_source",),
+    values={"channel_name": lambda: f"MY{datetime.now().strftime('%d%H%M%S')}"},
+    load_budget=PAGE_BUDGET,
+    initial_screenshot="12_initial_page",
+    final_screenshot="final_success",
+    steps=[
+        Step("click", f"{LAYOUT}/form/button[2]/span", name="13_add_button", title="Click Add New Link Button"),
+        Step("wait", f"{DIALOG}/div[1]", name="14_popup", title="Wait for Popup", key=True, pause=0,
+             budget=DIALOG_BUDGET),
+        Step("fill", f"{FORM}/div[1]/div/div[1]/input", "{channel_name}", name="15_name_input",
+             title="Enter Channel Name"),
+        Step("click", f"{FORM}/div[3]/div/div/div[1]/input", name="16_source_input", title="Open Customer Source"),
+        Step("click", option("source_name"), name="17_source_selected", title="Select Customer Source",
+             preflight=False),
+        Step("click", SUBMIT, title="Submit Form"),
+        Step("verify_toast", "/html/body/div[5]", name="18_success_message", title="Verify Success Message",
+             timeout=1, pause=1, budget=SAVE_BUDGET),
+    ],
+)
+
+ADD_ARTICLE_CATEGORY = Flow(
+    name="add_article_category",
+    title="Add Article Category",
+    path="operational/article/categorization",
+    tags=("article",),
+    provides=("article_category", "category_name"),
+    values={"category_name": lambda: f"test_{random_string()}_{timestamp()}"},
+    load_budget=PAGE_BUDGET,
+    initial_screenshot="07_category_initial_page",
+    final_screenshot="13_category_final_success",
+    error_screenshot="category_final_error",
+    steps=[
+        Step("click", f"{ARTICLE_LAYOUT}/form/button[2]/span", name="08_category_add_button",
+             title="Click Add Button"),
+        Step("fill", f"{ARTICLE_FORM}/div[2]/div/div[1]/input", "{category_name}", name="09_category_name_input",
+             title="Enter Category Name", budget=DIALOG_BUDGET),
+        Step("fill", f"{ARTICLE_FORM}/div[3]/div/div/input", "1", name="10_category_sort_input",
+             title="Enter Sorting Number"),
+        Step("click", ARTICLE_SUBMIT, name="11_category_confirm_button", title="Click Confirm Button", pause=0),
+        Step("verify_toast", "/html/body/div[3]", name="12_category_success_message", title="Verify Success",
+             timeout=1, pause=1, budget=SAVE_BUDGET),
+    ],
+)
+
+CREATE_ARTICLE = Flow(
+    name="create_article",
+    title="Create Article",
+    path="operational/article/list",
+    tags=("article",),
+    depends_on=("add_article_category",),
+    requires=("article_category",),
+    values={
+        "article_title": lambda: f"title_{random_string()}_{timestamp()}",
+        "article_summary": lambda: generate_random_words(5),
+        "article_content": lambda: generate_random_words(10),
+    },
+    load_budget=PAGE_BUDGET,
+    initial_screenshot="14_article_initial_page",
+    final_screenshot="24_article_final_success",
+    error_screenshot="article_final_error",
+    steps=[
+        Step("click", f"{ARTICLE_LAYOUT}/form/button[2]/span", name="15_article_add_button",
+             title="Click Add Article Button"),
+        Step("click", f"{ARTICLE_FORM}/div[2]/div/div/div/input", name="16_article_category_dropdown",
+             title="Open Category", budget=DIALOG_BUDGET),
+        Step("click", option("category_name"), name="17_article_category_selected", title="Select Category",
+             preflight=False),
+        Step("fill", f"{ARTICLE_FORM}/div[3]/div/div[1]/input", "{article_title}", name="18_article_title_input",
+             title="Enter Title"),
+        Step("fill", f"{ARTICLE_FORM}/div[4]/div/div[1]/textarea", "{article_summary}",
+             name="19_article_summary_input", title="Enter Summary"),
+        Step("click", f"{ARTICLE_FORM}/div[5]/div/div/div[1]/div[2]/div[1]", name="20_article_content_input",
+             title="Open Content Editor"),
+        Step("frame_type", value="{article_content}", frame="class:tox-edit-area__iframe",
+             fallback=f"{ARTICLE_FORM}/div[5]/div/div/div[1]/div[2]/div[1]", name="21_article_content_entered",
+             title="Enter Content"),
+        Step("click", ARTICLE_SUBMIT, name="22_article_submit_button", title="Submit Form", pause=0),
+        Step("verify_toast", "/html/body/div[3]", name="23_article_success_message", title="Verify Success",
+             timeout=1, pause=1, budget=SAVE_BUDGET),
+    ],
+)
+
+FLOWS = {flow.name: flow for flow in (ADD_SUPPLIER, ADD_SERVER_GROUP, ADD_IP, ADD_NEW_SOURCE, ADD_NEW_LINK,
+                                      ADD_ARTICLE_CATEGORY, CREATE_ARTICLE)}
@@ -0,0 +1,647 @@
+"""
+Flow Engine Module
+This module runs admin flows described as data (see flow_definitions.py)
+instead of hand-written Selenium code. A flow is a page path plus a list of
+steps; the engine plans them (consecutive fills become one script call),
+applies the wait and screenshot policy in one place, and can run independent
+flows in parallel on a pool of browsers.
+
+    python flow_engine.py add_supplier add_server_group add_ip --workers 2 --screenshots key
+"""
+
+from selenium.webdriver.common.by import By # type: ignore
+from selenium.webdriver.common.keys import Keys # type: ignore
+from selenium.webdriver.support.ui import WebDriverWait # type: ignore
+from selenium.webdriver.support import expected_conditions as EC # type: ignore
+from selenium.common.exceptions import TimeoutException # type: ignore
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import os
+import sys
+import threading
+import time
+
+from driver_factory import REMOTE_URL_ENV, DriverPool, bind_driver, create_driver, current_driver, unbind_driver
+from event_wait import EventWait, event_waits_enabled
+from fault_proxy import FAULT_SCENARIO_ENV
+from fixture_cache import FixtureCache, TableVerifier, fixtures_enabled, session_fixtures
+from latency_budget import LatencyLog
+from locator_index import LocatorIndex, healing_enabled
+from network_capture import NetworkCapture, network_capture_enabled
+from page_metrics import PageMetrics, page_metrics_enabled
+from report_store import archiving_enabled, close_store, get_store, open_store, save_screenshot
+from run_history import RunHistory, flatten, run_history_enabled
+from throttling import apply_profile, throttle_profile
+
+BASE_URL = os.environ.get("ADMIN_BASE_URL", "https://test-admin-ipipgo.cd.xiaoxigroup.net/app-manager")
+TOAST_CLASS = "class:el-message__content"
+# Steps that wait for what the click before them opens or saves; their budget runs from that click
+RESULT_ACTIONS = ("wait", "verify_toast", "fill")
+# Pause after each key of a press step, so dropdowns keep up with the highlight moving
+KEY_PAUSE = 0.1
+
+# Loaded and without requests in flight (the counter is event_wait's network tracker, when installed)
+IDLE_SCRIPT = """
+const net = window.__eventWaitNet;
+return document.readyState === 'complete' && !(net && net.inflight);
+"""
+
+# all: every named step, key: only steps marked key (popups, results), failure: only final_error
+SCREENSHOT_POLICIES = ("all", "key", "failure")
+
+# Sets input/textarea values the way Element UI expects (native setter plus input event)
+FILL_SCRIPT = """
+const fills = arguments[0];
+const missing = [];
+const find = (kind, value) => kind === 'css' ? document.querySelector(value)
+    : document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+for (const [kind, locator, text] of fills) {
+    const el = find(kind, locator);
+    if (!el) { missing.push(locator); continue; }
+    const proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, text);
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+}
+return missing;
+"""
+
+
+# ===== Flow Definitions =====
+@dataclass
+class Step:
+    action: str                        # click, fill, type, press, wait, frame_type, verify_toast
+    locator: Optional[str] = None      # XPath, or "css:..." / "class:..."; may hold {placeholders}
+    value: Optional[str] = None        # text with {placeholders}, or a Keys name for press
+    name: Optional[str] = None         # screenshot and report name, e.g. "09_popup"
+    title: Optional[str] = None        # human readable step title
+    repeat: int = 1
+    pause: Optional[float] = None      # seconds to let the page settle afterwards
+    timeout: Optional[float] = None
+    fallback: Optional[str] = None     # alternative locator (toast class, editor element)
+    frame: Optional[str] = None        # iframe locator for frame_type
+    key: bool = False                  # screenshot kept under the "key" policy
+    budget: Optional[float] = None     # seconds the action and its wait may take (see RESULT_ACTIONS)
+    budget_mode: str = "warn"          # warn, or fail the flow when over budget
+    preflight: bool = True             # False for elements only an earlier step shows (dropdown options)
+
+
+@dataclass
+class Flow:
+    name: str
+    title: str
+    path: str                          # relative to the base URL
+    steps: List[Step]
+    values: Dict[str, Callable[[], str]] = field(default_factory=dict)
+    depends_on: Tuple[str, ...] = ()
+    provides: Optional[Tuple[str, str]] = None   # (entity kind, value holding its name)
+    requires: Tuple[str, ...] = ()               # entity kinds taken from the fixture cache
+    tags: Tuple[str, ...] = ()
+    initial_screenshot: Optional[str] = None
+    final_screenshot: Optional[str] = None
+    error_screenshot: str = "final_error"
+    load_budget: Optional[float] = None          # seconds for the initial page load
+    load_budget_mode: str = "warn"
+
+
+def by_locator(locator):
+    """Splits a step locator into a Selenium (By, value) pair"""
+    if locator.startswith("css:"):
+        return By.CSS_SELECTOR, locator[4:]
+    if locator.startswith("class:"):
+        return By.CLASS_NAME, locator[6:]
+    return By.XPATH, locator
+
+
+def batch_budget(steps):
+    """Budget of a planned item: the sum of its steps' budgets, failing if any of them fails"""
+    budgets = [step.budget for step in steps if step.budget is not None]
+    if not budgets:
+        return None, "warn"
+    return sum(budgets), "fail" if any(step.budget_mode == "fail" for step in steps) else "warn"
+
+
+def item_title(steps):
+    """Report and history name of a planned item"""
+    return " + ".join(step.title or step.name or step.action for step in steps)
+
+
+def plan(flow):
+    """Groups the steps of a flow; runs of consecutive fills become one batch"""
+    planned = []
+    for step in flow.steps:
+        if step.action == "fill" and planned and isinstance(planned[-1], list):
+            planned[-1].append(step)
+        elif step.action == "fill":
+            planned.append([step])
+        else:
+            planned.append(step)
+    return planned
+
+
+# ===== Engine =====
+class StepEngine:
+    def __init__(self, driver=None, base_url=BASE_URL, screenshots=None, timeout=10, settle=0.5, on_step=None,
+                 fixtures=None, event_waits=None, page_metrics=None, network_capture=None, history=None, locators=None,
+                 throttling=None):
+        self.driver = driver
+        self.throttling = throttle_profile() if throttling is None else throttling
+        self.history = history
+        self.locators = locators
+        self.healed = {}
+        self.page = None
+        self.network_capture = network_capture_enabled() if network_capture is None else network_capture
+        self.page_metrics = page_metrics_enabled() if page_metrics is None else page_metrics
+        self.event_waits = event_waits_enabled() if event_waits is None else event_waits
+        self.fixtures = fixtures
+        self.base_url = base_url.rstrip("/")
+        self.screenshots = screenshots or os.environ.get("SCREENSHOT_POLICY", "all")
+        if self.screenshots not in SCREENSHOT_POLICIES:
+            raise Exception(f"Unknown screenshot policy: {self.screenshots}")
+        self.timeout = timeout
+        self.settle = settle
+        self.on_step = on_step
+        self.step_started = None
+        self.clicked_at = None
+        self.elapsed = None
+
+    @property
+    def browser(self):
+        return self.driver or current_driver()
+
+    def present(self, locator, timeout=None):
+        """Waits for an element in the DOM, in the page by default or by polling with WAIT_STRATEGY=poll"""
+        if self.event_waits:
+            return EventWait(self.browser, self.timeout).present(locator, timeout)
+        return WebDriverWait(self.browser, timeout or self.timeout).until(EC.presence_of_element_located(locator))
+
+    def clickable(self, locator, timeout=None):
+        if self.event_waits:
+            return EventWait(self.browser, self.timeout).clickable(locator, timeout)
+        return WebDriverWait(self.browser, timeout or self.timeout).until(EC.element_to_be_clickable(locator))
+
+    def resolve(self, locator):
+        """The locator to use on the current page, after any healing earlier in the run"""
+        return self.healed.get((self.page, locator), locator)
+
+    def find(self, locator, timeout=None, clickable=False, heal=True):
+        """Waits for a step locator; a known one still missing once the page is idle is healed from its fingerprint"""
+        wait = self.clickable if clickable else self.present
+        resolved = self.resolve(locator)
+        timeout = timeout or self.timeout
+        heal = heal and self.locators is not None
+        if not heal or resolved != locator or not self.locators.get(self.page, locator):
+            element = wait(by_locator(resolved), timeout)
+        else:
+            deadline = time.monotonic() + timeout
+            try:
+                element = wait(by_locator(locator), min(timeout, self.locators.grace))
+            except TimeoutException:
+                # A slow page is not a broken locator: heal only when the loaded, idle page lacks the element
+                match = None
+                if self.idle(deadline - time.monotonic()) and not self.browser.find_elements(*by_locator(locator)):
+                    match = self.locators.heal(self.browser, self.page, locator)
+                if match:
+                    print(f"WARNING: Healed locator (score {match['score']:.2f}): {locator} -> {match['locator']}")
+                    self.healed[(self.page, locator)] = match["locator"]
+                    return match["element"]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise
+                element = wait(by_locator(locator), remaining)
+        if heal and resolved == locator:
+            self.locators.remember(self.browser, self.page, locator, element)
+        return element
+
+    def idle(self, timeout):
+        """Waits until the page has loaded and no fetch/XHR is in flight; False if it stays busy"""
+        if timeout <= 0:
+            return False
+        try:
+            if self.event_waits:
+                EventWait(self.browser, self.timeout).network_idle(timeout=timeout)
+            else:
+                WebDriverWait(self.browser, timeout).until(lambda d: d.execute_script(IDLE_SCRIPT))
+            return self.browser.execute_script(IDLE_SCRIPT)
+        except TimeoutException:
+            return False
+
+    def run(self, flow, report_dir):
+        """Runs one flow; on failure takes the error screenshot and re-raises"""
+        values = {name: generate() for name, generate in flow.values.items()}
+        for kind in flow.requires:
+            producer = self.producer(kind)
+            values[producer.provides[1]] = self.prerequisite(producer, report_dir)
+        print(f"\n=== Starting {flow.name} test ===")
+        for name, value in values.items():
+            print(f"Generated {name.replace('_', ' ')}: {value}")
+        started = time.time()
+        latency = LatencyLog(flow.name, self.base_url, throttling=self.throttling)
+        metrics = PageMetrics(self.browser, flow.name, self.base_url) if self.page_metrics else None
+        network = NetworkCapture(self.browser, flow.name, self.base_url) if self.network_capture else None
+        if network:
+            network.reset()
+        passed = False
+        try:
+            if self.throttling != "none":
+                apply_profile(self.browser, self.throttling)
+            self.page = flow.path
+            loading = time.perf_counter()
+            self.browser.get(f"{self.base_url}/{flow.path.lstrip('/')}")
+            latency.measure("Page load", time.perf_counter() - loading, flow.load_budget, flow.load_budget_mode)
+            if metrics:
+                metrics.collect("Page load")
+            if network:
+                network.drain("Page load")
+            print(f"Current URL: {self.browser.current_url}")
+            if flow.initial_screenshot:
+                self.screenshot(flow.initial_screenshot, report_dir, key=True)
+
+            for number, item in enumerate(plan(flow), start=1):
+                steps = item if isinstance(item, list) else [item]
+                title = item_title(steps)
+                print(f"\n--- Step {number}: {title} ---")
+                try:
+                    self.step_started = time.perf_counter()
+                    if self.clicked_at is not None and steps[0].action in RESULT_ACTIONS:
+                        # The dialog or toast started with the click, before its settle pause and screenshot
+                        self.step_started = self.clicked_at
+                    self.clicked_at = None
+                    self.elapsed = None
+                    if isinstance(item, list):
+                        self.fill(steps, values, report_dir)
+                    else:
+                        self.execute(item, values, report_dir)
+                    latency.measure(title, self.elapsed, *batch_budget(steps))
+                    if metrics:
+                        metrics.collect(title)
+                    if network:
+                        network.drain(title)
+                except Exception as e:
+                    print(f"ERROR: Failed to {title.lower()}: {str(e)}")
+                    self.report(title, "failed", str(e))
+                    raise
+                self.report(title, "passed")
+
+            if flow.steps and flow.steps[-1].action == "verify_toast":
+                print("TEST PASSED: Success message was found and verified")
+            else:
+                print(f"TEST PASSED: {flow.name} passed")
+            if flow.final_screenshot:
+                self.screenshot(flow.final_screenshot, report_dir, key=True)
+            if flow.provides and self.fixtures:
+                self.fixtures.put(flow.provides[0], values[flow.provides[1]], {"flow": flow.name})
+            passed = True
+            return {"flow": flow.name, "values": values, "duration": time.time() - started,
+                    "latency": latency.summary(), "healed": self.healed_locators(flow.path)}
+        except Exception as e:
+            print(f"\n=== Test failed with error: {str(e)} ===")
+            self.screenshot(flow.error_screenshot, report_dir, key=True, failure=True)
+            raise
+        finally:
+            self.log_healed(flow.path, report_dir)
+            if self.throttling != "none":
+                # Pooled browsers go back unthrottled
+                try:
+                    apply_profile(self.browser, "none")
+                except Exception as e:
+                    print(f"WARNING: {str(e)}")
+            try:
+                latency.save(report_dir, passed)
+                if metrics:
+                    metrics.save(report_dir)
+                if network:
+                    network.drain("After flow")
+                    network.save(report_dir)
+                if self.history:
+                    samples = flatten(latency.summary(), metrics and metrics.summary(), network and network.summary())
+                    self.history.record(flow.name, self.base_url, self.config(), passed, time.time() - started,
+                                        samples)
+            except Exception as e:
+                print(f"WARNING: Performance reports not saved: {str(e)}")
+
+    @staticmethod
+    def producer(kind):
+        from flow_definitions import FLOWS
+
+        for flow in FLOWS.values():
+            if flow.provides and flow.provides[0] == kind:
+                return flow
+        raise Exception(f"No flow provides {kind}")
+
+    def prerequisite(self, producer, report_dir):
+        """Name of a live entity from the fixture cache, running the producing flow on a miss"""
+        kind, value_name = producer.provides
+
+        def create():
+            return self.run(producer, report_dir)["values"][value_name]
+
+        if self.fixtures is None:
+            return create()
+        verify = TableVerifier(self.browser, self.base_url, producer.path)
+        return self.fixtures.ensure(kind, create, verify)
+
+    def config(self):
+        """Runner settings that affect timings; runs are only compared with runs of the same config"""
+        config = {
+            "screenshots": self.screenshots,
+            "event_waits": self.event_waits,
+            "page_metrics": self.page_metrics,
+            "network_capture": self.network_capture,
+            "remote": bool(os.environ.get(REMOTE_URL_ENV)),
+        }
+        if os.environ.get(FAULT_SCENARIO_ENV):
+            config["fault_scenario"] = os.environ[FAULT_SCENARIO_ENV]
+        # Only throttled runs carry a profile, so unthrottled series continue the existing history
+        if self.throttling != "none":
+            config["throttling"] = self.throttling
+        return config
+
+    def lap(self):
+        """Stops the step clock once the action and its wait are done, before settle pauses and screenshots"""
+        self.elapsed = time.perf_counter() - self.step_started
+
+    def healed_locators(self, page):
+        return {locator: healed for (healed_page, locator), healed in self.healed.items() if healed_page == page}
+
+    def log_healed(self, page, report_dir):
+        """Lists the locators healed on a page in the run report, so the definitions can be updated"""
+        healed = self.healed_locators(page)
+        store = get_store(report_dir)
+        for locator, replacement in healed.items():
+            print(f"Healed locator on {page}: {locator} -> {replacement}")
+            if store:
+                store.add_log("healed_locator", "healed", f"{page}: {locator} -> {replacement}")
+
+    def report(self, title, status, error=""):
+        if self.on_step:
+            self.on_step(title, status, error)
+
+    # ===== Actions =====
+    def execute(self, step, values, report_dir):
+        text = step.value.format(**values) if step.value else ""
+        heal = True
+        if step.locator and "{" in step.locator:
+            # Picks an entity by its generated or handed-out name; such locators change every run
+            step = replace(step, locator=step.locator.format(**values))
+            heal = False
+
+        if step.action == "verify_toast":
+            self.verify_toast(step, report_dir)
+            return
+        if step.action == "wait":
+            element = self.find(step.locator, step.timeout, heal=heal)
+        elif step.action == "click":
+            element = self.find(step.locator, step.timeout, clickable=True, heal=heal)
+            self.highlight(step, element)
+            self.clicked_at = time.perf_counter()
+            element.click()
+        elif step.action == "type":
+            element = self.find(step.locator, step.timeout, heal=heal)
+            self.highlight(step, element)
+            element.send_keys(text)
+        elif step.action == "press":
+            element = self.find(step.locator, step.timeout, heal=heal)
+            keys = [getattr(Keys, name) for name in step.value.split("+")]
+            for _ in range(step.repeat):
+                element.send_keys(*keys)
+                time.sleep(KEY_PAUSE)
+        elif step.action == "frame_type":
+            self.frame_type(step, text)
+        else:
+            raise Exception(f"Unknown step action: {step.action}")
+
+        self.lap()
+        time.sleep(self.settle if step.pause is None else step.pause)
+        if step.name:
+            self.screenshot(step.name, report_dir, key=step.key)
+
+    def fill(self, steps, values, report_dir):
+        """Fills a run of inputs with one script call, waiting only for the ones not rendered yet"""
+        self.find(steps[0].locator, steps[0].timeout)
+        missing = self.browser.execute_script(FILL_SCRIPT, self.fill_args(steps, values))
+        if missing:
+            retry = [step for step in steps if by_locator(self.resolve(step.locator))[1] in missing]
+            for step in retry:
+                self.find(step.locator, step.timeout)
+            still_missing = self.browser.execute_script(FILL_SCRIPT, self.fill_args(retry, values))
+            if still_missing:
+                raise Exception(f"Inputs not found: {still_missing}")
+        self.lap()
+        time.sleep(self.settle if steps[-1].pause is None else steps[-1].pause)
+        named = [step for step in steps if step.name]
+        if named:
+            self.screenshot(named[-1].name, report_dir, key=any(step.key for step in named))
+
+    def fill_args(self, steps, values):
+        """FILL_SCRIPT arguments: (locator kind, locator, text) per step, with healed locators"""
+        args = []
+        for step in steps:
+            locator = self.resolve(step.locator)
+            args.append(("css" if locator.startswith("css:") else "xpath", by_locator(locator)[1],
+                         step.value.format(**values)))
+        return args
+
+    def frame_type(self, step, text):
+        """Types into the body of an editor iframe, falling back to the editor element itself"""
+        try:
+            frame = self.find(step.frame, step.timeout)
+            self.browser.switch_to.frame(frame)
+            try:
+                self.present((By.TAG_NAME, "body"), step.timeout).send_keys(text)
+            finally:
+                self.browser.switch_to.default_content()
+        except Exception as e:
+            if not step.fallback:
+                raise
+            print(f"WARNING: Failed to enter content in iframe: {str(e)}")
+            self.browser.find_element(*by_locator(step.fallback)).send_keys(text)
+
+    def verify_toast(self, step, report_dir):
+        """Waits for the success message, trying the positional locator and then the toast class"""
+        timeout = step.timeout or 2
+        try:
+            self.present(by_locator(step.locator), timeout)
+            self.lap()
+            suffix = ""
+        except Exception as e:
+            # The budget covers the wait for the toast, not the second search with another locator
+            self.lap()
+            print(f"Could not catch success message: {str(e)}")
+            self.present(by_locator(step.fallback or TOAST_CLASS), timeout)
+            print("Success message found with alternative selector")
+            suffix = "_alt"
+        if step.name:
+            self.screenshot(f"{step.name}{suffix}", report_dir, key=True)
+        if step.pause:
+            time.sleep(step.pause)
+
+    # ===== Policies =====
+    def highlight(self, step, element):
+        """Outlines the element in screenshots, only for steps that will be captured"""
+        if step.name and self.captures(step.key):
+            self.browser.execute_script("arguments[0].style.border='3px solid red'", element)
+
+    def captures(self, key, failure=False):
+        return failure or self.screenshots == "all" or (self.screenshots == "key" and key)
+
+    def screenshot(self, step_name, report_dir, key=False, failure=False):
+        if self.captures(key, failure):
+            print(f"Screenshot saved: {save_screenshot(self.browser, step_name, report_dir)}")
+
+
+# ===== Runners =====
+def default_fixtures(base_url=BASE_URL):
+    """The shared fixture cache of an environment; with FIXTURE_CACHE=0 only this process's entities"""
+    return FixtureCache(base_url) if fixtures_enabled() else session_fixtures(base_url)
+
+
+def default_locators():
+    """The locator fingerprint index, or None when LOCATOR_HEALING=0"""
+    return LocatorIndex() if healing_enabled() else None
+
+
+def default_history():
+    """The run history database, or None when RUN_HISTORY=0"""
+    return RunHistory() if run_history_enabled() else None
+
+
+def run_flow(name, report_dir, driver=None, on_step=None, **engine_options):
+    """Runs a defined flow on the given driver, or the one bound to this thread"""
+    from flow_definitions import FLOWS
+
+    engine_options.setdefault("fixtures", default_fixtures(engine_options.get("base_url", BASE_URL)))
+    engine_options.setdefault("history", default_history())
+    engine_options.setdefault("locators", default_locators())
+    return StepEngine(driver, on_step=on_step, **engine_options).run(FLOWS[name], report_dir)
+
+
+def blocked_by(flow, failed, fixtures=None):
+    """Failed or skipped flows this flow depends on; none when a persistent fixture cache can stand in"""
+    # With the fixture cache a dependent flow can still use an entity from an earlier run
+    if fixtures is not None and fixtures.persistent:
+        return []
+    return [dep for dep in flow.depends_on if dep in failed]
+
+
+def waves(names, flows):
+    """Orders flows into waves; a flow runs only after the flows it depends on"""
+    remaining = list(names)
+    done = set()
+    ordered = []
+    while remaining:
+        ready = [name for name in remaining
+                 if all(dep in done or dep not in names for dep in flows[name].depends_on)]
+        if not ready:
+            raise Exception(f"Circular flow dependencies among: {remaining}")
+        ordered.append(ready)
+        done.update(ready)
+        remaining = [name for name in remaining if name not in ready]
+    return ordered
+
+
+def run_parallel(names, report_dir, workers=2, factory=create_driver, setup=None, **engine_options):
+    """Runs independent flows concurrently on a pool of browsers, wave by wave"""
+    from flow_definitions import FLOWS
+
+    engine_options.setdefault("fixtures", default_fixtures(engine_options.get("base_url") or BASE_URL))
+    engine_options.setdefault("history", default_history())
+    engine_options.setdefault("locators", default_locators())
+    pool = DriverPool(workers, factory)
+    prepared = set()
+    prepared_lock = threading.Lock()
+    # One setup at a time: an interactive login must not share the terminal, and later ones reuse its session
+    setup_lock = threading.Lock()
+    failed = set()
+    results = []
+
+    def run_one(name):
+        flow_dir = os.path.join(report_dir, name)
+        os.makedirs(flow_dir, exist_ok=True)
+        blocked = blocked_by(FLOWS[name], failed, engine_options.get("fixtures"))
+        if blocked:
+            failed.add(name)
+            return {"flow": name, "status": "skipped", "error": f"depends on failed {', '.join(blocked)}",
+                    "duration": 0.0}
+        driver = pool.acquire()
+        bind_driver(driver)
+        if archiving_enabled():
+            open_store(flow_dir)
+        started = time.time()
+        try:
+            with prepared_lock:
+                needs_setup = setup and driver.session_id not in prepared
+            if needs_setup:
+                with setup_lock:
+                    setup(driver, flow_dir)
+                # Only after the setup worked; a failed one is retried the next time the browser is handed out
+                with prepared_lock:
+                    prepared.add(driver.session_id)
+            StepEngine(driver, **engine_options).run(FLOWS[name], flow_dir)
+            return {"flow": name, "status": "passed", "error": "", "duration": time.time() - started}
+        except Exception as e:
+            failed.add(name)
+            return {"flow": name, "status": "failed", "error": str(e), "duration": time.time() - started}
+        finally:
+            close_store(flow_dir)
+            unbind_driver()
+            pool.release(driver, step_name=name)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flow") as executor:
+            for wave in waves(names, FLOWS):
+                print(f"\n=== Running in parallel: {', '.join(wave)} ===")
+                results.extend(executor.map(run_one, wave))
+    finally:
+        pool.close_all()
+
+    for result in results:
+        print(f"{result['flow']}: {result['status']} in {result['duration']:.1f}s"
+              + (f" ({result['error']})" if result["error"] else ""))
+    return results
+
+
+def restore_login(driver, report_dir, base_url=BASE_URL):
+    """Logs a browser in to an environment from the cached session, or interactively when there is none"""
+    from login_manager import LoginManager
+
+    login_manager = LoginManager(driver, WebDriverWait(driver, 10), base_url)
+    session_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".auth", "session.json")
+    if not login_manager.restore_session(session_path):
+        if not sys.stdin.isatty():
+            # The CAPTCHA needs a person at the terminal; without one login() would block on input()
+            raise Exception(f"No usable login session in {session_path}; log in once with: pytest -m login -s")
+        login_manager.login(report_dir)
+        login_manager.save_session(session_path)
+
+
+def main():
+    """Runs the named flows, independent ones in parallel"""
+    from flow_definitions import FLOWS
+
+    parser = argparse.ArgumentParser(description="Run declarative admin flows")
+    parser.add_argument("flows", nargs="*", help=f"flow names (default: all of {', '.join(FLOWS)})")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--screenshots", choices=SCREENSHOT_POLICIES, default=None)
+    parser.add_argument("--base-url", default=BASE_URL)
+    args = parser.parse_args()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_dir = os.path.join(os.getcwd(), "reports", f"Flow-Engine_test_run_{timestamp}")
+    os.makedirs(report_dir)
+    base_url = args.base_url.rstrip("/")
+
+    def login(driver, flow_dir):
+        restore_login(driver, flow_dir, base_url)
+
+    results = run_parallel(args.flows or list(FLOWS), report_dir, args.workers, setup=login,
+                           screenshots=args.screenshots, base_url=base_url)
+    if any(result["status"] != "passed" for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Grid Runner Module
+This module spreads test flows across the slots of a Selenium Grid hub.
+Each slot keeps one Remote WebDriver session for all the flows it runs, and
+every flow writes its screenshots into one central run directory.
+
+Try it locally with a standalone Selenium server standing in for the grid:
+    java -jar selenium-server-<version>.jar standalone --max-sessions 4
+    python grid_runner.py --hub http://localhost:4444 --slots 2 add_supplier add_server_group
+"""
+
+from selenium.webdriver.support.ui import WebDriverWait # type: ignore
+from datetime import datetime
+from urllib.parse import urlparse
+import argparse
+import os
+import queue
+import threading
+import time
+
+from driver_factory import DriverPool, bind_driver, build_chrome_options, create_driver, current_driver, unbind_driver
+from memory_monitor import RecyclePolicy
+from report_store import archiving_enabled, close_store, open_store
+from screencast import screencast_enabled, start_recorder, stop_recorder
+
+
+class GridRunner:
+    def __init__(self, hub_url, slots, setup=None, run_name="grid", options_factory=build_chrome_options,
+                 recycle_policy=None):
+        self.hub_url = hub_url
+        self.recycle_policy = recycle_policy
+        self.slots = slots
+        self.setup = setup
+        self.run_name = run_name
+        self.options_factory = options_factory
+        self.results = []
+        self._results_lock = threading.Lock()
+        self._setup_lock = threading.Lock()
+        self.slot_errors = {}
+
+    def create_run_dir(self):
+        """Creates the central directory collecting artifacts of every slot"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        run_dir = os.path.join(os.getcwd(), "reports", f"{self.run_name}_run_{timestamp}")
+        os.makedirs(run_dir)
+        return run_dir
+
+    def run(self, flows):
+        """Runs (name, flow) pairs across the slots and returns one result per flow"""
+        run_dir = self.create_run_dir()
+        print(f"\n=== Starting grid run on {self.hub_url} with {self.slots} slots: {run_dir} ===")
+
+        pending = queue.Queue()
+        for index, (name, flow) in enumerate(flows, start=1):
+            pending.put((index, name, flow))
+
+        # A slot that cannot start or set up a session hands its flow back and stops; the slots that
+        # still work go another round when they had already drained the queue
+        slots = list(range(1, min(self.slots, len(flows)) + 1))
+        while slots and not pending.empty():
+            workers = [threading.Thread(target=self._run_slot, args=(slot, pending, run_dir), name=f"slot-{slot}")
+                       for slot in slots]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            slots = [slot for slot in slots if slot not in self.slot_errors]
+        # Flows left over once every slot failed
+        while True:
+            try:
+                index, name, _ = pending.get_nowait()
+            except queue.Empty:
+                break
+            errors = "; ".join(f"slot {slot}: {error}" for slot, error in sorted(self.slot_errors.items()))
+            self._record(index, name, "-", "-", "failed", f"no slot could run it ({errors})", 0.0)
+
+        self.results.sort(key=lambda result: result["index"])
+        self.write_summary(run_dir)
+        return self.results
+
+    def _run_slot(self, slot, pending, run_dir):
+        """Runs queued flows one after another on this slot's session, recycling it when it grows"""
+        pool = DriverPool(1, lambda: create_driver(self.hub_url, self.options_factory()),
+                          recycle_policy=self.recycle_policy,
+                          telemetry_path=os.path.join(run_dir, f"memory_slot{slot}.jsonl"))
+        sessions = set()
+        try:
+            while True:
+                try:
+                    index, name, flow = pending.get_nowait()
+                except queue.Empty:
+                    break
+
+                try:
+                    driver = pool.acquire()
+                except Exception as e:
+                    print(f"ERROR: Slot {slot} could not start a session, stopping it: {str(e)}")
+                    self.slot_errors[slot] = str(e)
+                    pending.put((index, name, flow))
+                    return
+                bind_driver(driver)
+                node = self.node_of(driver)
+                if driver.session_id not in sessions:
+                    sessions.add(driver.session_id)
+                    print(f"Slot {slot} started session {driver.session_id} on {node}")
+                    try:
+                        if self.setup:
+                            # Setup may prompt on stdin (manual CAPTCHA), so slots take turns
+                            with self._setup_lock:
+                                self.setup(driver, WebDriverWait(driver, 10),
+                                           os.path.join(run_dir, f"slot{slot}_setup_{len(sessions)}"))
+                    except Exception as e:
+                        print(f"ERROR: Slot {slot} setup failed, stopping it: {str(e)}")
+                        self.slot_errors[slot] = f"setup failed: {str(e)}"
+                        pending.put((index, name, flow))
+                        unbind_driver()
+                        pool.discard(driver)
+                        return
+
+                self._run_flow(slot, node, index, name, flow, run_dir)
+                unbind_driver()
+                pool.release(driver, step_name=name)
+        finally:
+            unbind_driver()
+            pool.close_all()
+
+    def _run_flow(self, slot, node, index, name, flow, run_dir):
+        """Runs one flow in its own report subdirectory and records the outcome"""
+        report_dir = os.path.join(run_dir, f"{index:02d}_{name}")
+        os.makedirs(report_dir, exist_ok=True)
+        if archiving_enabled():
+            open_store(report_dir)
+        if screencast_enabled():
+            start_recorder(current_driver(), report_dir)
+        started = time.time()
+        status, error = "passed", ""
+        try:
+            flow(report_dir)
+        except Exception as e:
+            status, error = "failed", str(e)
+        finally:
+            stop_recorder(report_dir)
+            close_store(report_dir)
+        self._record(index, name, slot, node, status, error, time.time() - started)
+
+    def _record(self, index, name, slot, node, status, error, duration):
+        result = {"index": index, "flow": name, "slot": slot, "node": node,
+                  "status": status, "error": error, "duration": duration}
+        print(f"[slot {slot}] {name}: {status} in {duration:.1f}s")
+        with self._results_lock:
+            self.results.append(result)
+
+    @staticmethod
+    def node_of(driver):
+        """Returns the grid node serving a session, taken from its se:cdp capability when present"""
+        cdp_url = driver.capabilities.get("se:cdp")
+        if cdp_url:
+            return urlparse(cdp_url).netloc
+        return "local"
+
+    def write_summary(self, run_dir):
+        """Writes one line per flow with its slot, node, status and duration"""
+        summary_path = os.path.join(run_dir, "grid_summary.txt")
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(f"Grid run on {self.hub_url} ({self.slots} slots)\n")
+            for result in self.results:
+                f.write(f"{result['index']:02d} {result['flow']} slot={result['slot']} node={result['node']} "
+                        f"{result['status']} {result['duration']:.1f}s\n")
+                if result["error"]:
+                    f.write(f"  Error: {result['error']}\n")
+        print(f"\nGrid summary generated: {summary_path}")
+
+
+def login_setup(driver, wait, report_dir):
+    """Logs a slot's session in once before it runs any flow"""
+    from login_manager import LoginManager
+
+    os.makedirs(report_dir, exist_ok=True)
+    LoginManager(driver, wait).login(report_dir)
+
+
+def main():
+    """Runs the named test_manager flows on a grid hub"""
+    import test_manager
+
+    parser = argparse.ArgumentParser(description="Run test flows across Selenium Grid slots")
+    parser.add_argument("flows", nargs="+", help="test_manager flow names, e.g. add_supplier add_ip")
+    parser.add_argument("--hub", default=os.environ.get("SELENIUM_REMOTE_URL", "http://localhost:4444"))
+    parser.add_argument("--slots", type=int, default=2)
+    parser.add_argument("--no-login", action="store_true", help="skip the per-slot login")
+    # Remote sessions have no local processes to measure RSS of, only the page's JS heap
+    parser.add_argument("--recycle-heap-mb", type=float, default=None,
+                        help="replace a slot's browser above this JS heap")
+    parser.add_argument("--recycle-after", type=int, default=None, help="replace a slot's browser after N flows")
+    args = parser.parse_args()
+
+    flows = [(name, getattr(test_manager, name)) for name in args.flows]
+    policy = RecyclePolicy(max_js_heap_mb=args.recycle_heap_mb, max_uses=args.recycle_after)
+    runner = GridRunner(args.hub, args.slots, setup=None if args.no_login else login_setup, recycle_policy=policy)
+    results = runner.run(flows)
+    if any(result["status"] == "failed" for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
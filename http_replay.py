@@ -0,0 +1,393 @@
+"""
+HTTP Replay Module
+This module records the backend requests a flow makes during one browser run
+(from Chrome's DevTools performance log, saved as HAR) and turns them into a
+parameterized replay script. Replaying sends the same API calls without a
+browser, over pooled keep-alive connections: the flow's generated names and
+IPs get fresh values, prerequisites come from the fixture cache and the login
+comes from the cached session. IDs the server assigns in a JSON response
+(e.g. a created entity's id) are captured, and later requests send the IDs of
+the replayed responses instead of the recorded ones. A replay of add_supplier
+takes milliseconds, so the backend can be smoke-checked between full UI runs.
+
+    python http_replay.py record add_supplier
+    python http_replay.py replay add_supplier --repeat 5
+"""
+
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, quote, urlparse
+import argparse
+import http.client
+import json
+import os
+import re
+import time
+
+from network_capture import API_TYPES
+
+REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "replays")
+SESSION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".auth", "session.json")
+
+# Set by the connection or rebuilt from the cached session at replay time
+DROPPED_HEADERS = {"host", "content-length", "connection", "cookie", "accept-encoding", "keep-alive"}
+PLACEHOLDER = re.compile(r"\$\{(storage:|response:)?([^}]+)\}")
+# Stored tokens shorter than this are too likely to match unrelated text
+MIN_TOKEN_LENGTH = 16
+# JSON keys of server-assigned IDs, and the shortest ID worth capturing (1 or 2 digits match anything)
+ID_KEY = re.compile(r"(^id$|Id$|_id$)")
+MIN_ID_LENGTH = 3
+
+
+# ===== Recording =====
+def har_entries(messages, driver=None):
+    """HAR entries of the XHR/fetch requests in DevTools network events, with JSON bodies when CDP allows"""
+    requests, order = {}, []
+    for message in messages:
+        method, params = message.get("method"), message.get("params", {})
+        request_id = params.get("requestId")
+        if method == "Network.requestWillBeSent" and params.get("type") in API_TYPES:
+            requests[request_id] = {"sent": params}
+            order.append(request_id)
+        elif request_id in requests and method == "Network.responseReceived":
+            requests[request_id]["response"] = params["response"]
+        elif request_id in requests and method in ("Network.loadingFinished", "Network.loadingFailed"):
+            requests[request_id]["finished"] = params
+    entries = []
+    for request_id in order:
+        item = requests[request_id]
+        if "response" not in item or "finished" not in item:
+            continue
+        sent, response, finished = item["sent"], item["response"], item["finished"]
+        request = sent["request"]
+        body = request.get("postData")
+        if body is None and request.get("hasPostData") and driver is not None:
+            body = cdp(driver, "Network.getRequestPostData", {"requestId": request_id}).get("postData")
+        content = {"size": finished.get("encodedDataLength", 0), "mimeType": response.get("mimeType", "")}
+        if "json" in content["mimeType"] and driver is not None:
+            content["text"] = cdp(driver, "Network.getResponseBody", {"requestId": request_id}).get("body")
+        entry = {
+            "startedDateTime": datetime.fromtimestamp(sent["wallTime"], timezone.utc).isoformat(),
+            "time": round((finished["timestamp"] - sent["timestamp"]) * 1000, 1),
+            "request": {
+                "method": request["method"],
+                "url": request["url"],
+                "httpVersion": "HTTP/1.1",
+                "headers": [{"name": k, "value": v} for k, v in request.get("headers", {}).items()],
+                "queryString": [{"name": k, "value": v} for k, v in parse_qsl(urlparse(request["url"]).query)],
+                "headersSize": -1,
+                "bodySize": len(body or ""),
+            },
+            "response": {
+                "status": response.get("status"),
+                "statusText": response.get("statusText", ""),
+                "httpVersion": "HTTP/1.1",
+                "headers": [{"name": k, "value": v} for k, v in response.get("headers", {}).items()],
+                "content": content,
+                "redirectURL": "",
+                "headersSize": -1,
+                "bodySize": content["size"],
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": round((finished["timestamp"] - sent["timestamp"]) * 1000, 1),
+                        "receive": 0},
+        }
+        if body is not None:
+            entry["request"]["postData"] = {"mimeType": request.get("headers", {}).get("Content-Type", ""),
+                                            "text": body}
+        entries.append(entry)
+    return entries
+
+
+def cdp(driver, command, params):
+    """Best-effort CDP call; bodies of requests the page already dropped are simply missing"""
+    try:
+        return driver.execute_cdp_cmd(command, params)
+    except Exception:
+        return {}
+
+
+def record(flow_name, base_url=None, headless=False):
+    """Runs a flow in a browser with the performance log on; returns (HAR, the flow's values)"""
+    from driver_factory import build_chrome_options, create_driver
+    from flow_engine import BASE_URL, StepEngine, default_fixtures, restore_login
+    from flow_definitions import FLOWS
+    from network_capture import enable_performance_log
+
+    base_url = base_url or BASE_URL
+    report_dir = os.path.join(os.getcwd(), "reports", f"Replay-Record_{flow_name}_{datetime.now():%Y%m%d_%H%M%S}")
+    os.makedirs(report_dir)
+    driver = create_driver(options=enable_performance_log(build_chrome_options(headless)))
+    try:
+        restore_login(driver, report_dir, base_url)
+        driver.get_log("performance")  # drop the login traffic
+        engine = StepEngine(driver, base_url=base_url, screenshots="failure", fixtures=default_fixtures(base_url),
+                            page_metrics=False, network_capture=False)
+        result = engine.run(FLOWS[flow_name], report_dir)
+        messages = [json.loads(entry["message"])["message"] for entry in driver.get_log("performance")]
+        har = {"log": {"version": "1.2", "creator": {"name": "http_replay", "version": "1.0"},
+                       "entries": har_entries(messages, driver)}}
+        return har, result["values"]
+    finally:
+        driver.quit()
+
+
+# ===== Parameterization =====
+def load_session(path=SESSION_PATH):
+    if not os.path.exists(path):
+        return {"cookies": [], "local_storage": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parameterize(text, values, storage=None):
+    """Replaces generated values (plain and URL-encoded) and stored tokens with ${...} placeholders"""
+    if not text:
+        return text
+    replacements = [(value, f"${{{name}}}") for name, value in values.items()]
+    replacements += [(quote(value), f"${{{name}}}") for name, value in values.items() if quote(value) != value]
+    replacements += [(value, f"${{storage:{key}}}") for key, value in (storage or {}).items()
+                     if isinstance(value, str) and len(value) >= MIN_TOKEN_LENGTH]
+    for old, new in sorted(replacements, key=lambda pair: len(pair[0]), reverse=True):
+        text = text.replace(old, new)
+    return text
+
+
+def response_ids(body, path=""):
+    """[(path, value)] of the ID fields in a JSON response, e.g. ("data.list.0.id", 1234)"""
+    found = []
+    items = body.items() if isinstance(body, dict) else enumerate(body) if isinstance(body, list) else []
+    for key, value in items:
+        child = f"{path}.{key}" if path else str(key)
+        if isinstance(value, (dict, list)):
+            found += response_ids(value, child)
+        elif (isinstance(key, str) and ID_KEY.search(key) and isinstance(value, (int, str))
+              and not isinstance(value, bool) and len(str(value)) >= MIN_ID_LENGTH):
+            found.append((child, value))
+    return found
+
+
+def capture_ids(text, captured):
+    """Replaces IDs seen in earlier responses with ${response:<request number>:<path>} placeholders"""
+    if not text or not captured:
+        return text
+    ids = "|".join(re.escape(value) for value in sorted(captured, key=len, reverse=True))
+    # Placeholders already in the text are matched first and kept as they are
+    pattern = re.compile(rf"(\$\{{[^}}]*\}})|(?<![\w-])({ids})(?![\w-])")
+    return pattern.sub(lambda match: match.group(1) or captured[match.group(2)], text)
+
+
+def build_script(flow_name, har, values, session=None):
+    """Replay script of a recorded HAR: requests with placeholders and the response each one expects"""
+    storage = (session or {}).get("local_storage", {})
+    requests = []
+    captured = {}
+
+    def placeholders(text):
+        return capture_ids(parameterize(text, values, storage), captured)
+
+    for number, entry in enumerate(har["log"]["entries"], start=1):
+        request, response = entry["request"], entry["response"]
+        expect = {"status": response["status"]}
+        body = None
+        text = response["content"].get("text")
+        if text:
+            try:
+                body = json.loads(text)
+                if isinstance(body, dict) and "code" in body:
+                    expect["code"] = body["code"]
+            except ValueError:
+                pass
+        requests.append({
+            "method": request["method"],
+            "url": placeholders(request["url"]),
+            "headers": {header["name"]: placeholders(header["value"])
+                        for header in request["headers"]
+                        if header["name"].lower() not in DROPPED_HEADERS and not header["name"].startswith(":")},
+            "body": placeholders(request.get("postData", {}).get("text")),
+            "expect": expect,
+            "recorded_ms": entry["time"],
+        })
+        # Later requests refer to the latest response that handed out an ID
+        for path, value in response_ids(body):
+            captured[str(value)] = f"${{response:{number}:{path}}}"
+    return {"flow": flow_name, "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "values": values, "requests": requests}
+
+
+def fresh_values(script, base_url=None):
+    """New values for the flow's generators; prerequisites from the fixture cache, else as recorded"""
+    from fixture_cache import FixtureCache, fixtures_enabled
+    from flow_definitions import FLOWS
+    from flow_engine import BASE_URL, StepEngine
+
+    flow = FLOWS[script["flow"]]
+    values = dict(script["values"])
+    values.update({name: generate() for name, generate in flow.values.items()})
+    cache = FixtureCache(base_url or BASE_URL) if fixtures_enabled() else None
+    for kind in flow.requires:
+        entries = cache.entries(kind) if cache else []
+        if entries:
+            values[StepEngine.producer(kind).provides[1]] = entries[0]["name"]
+    return values
+
+
+def response_value(responses, reference):
+    """Value at "<request number>:<path>" in the replayed JSON responses, or None"""
+    number, _, path = reference.partition(":")
+    value = responses[int(number) - 1] if 0 < int(number) <= len(responses) else None
+    for key in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return None
+    return None if value is None else str(value)
+
+
+def substitute(text, values, storage, responses=None):
+    def replace(match):
+        if match.group(1) == "response:":
+            value = response_value(responses or [], match.group(2))
+        else:
+            value = (storage if match.group(1) else values).get(match.group(2))
+        if value is None:
+            raise Exception(f"No value for placeholder {match.group(0)}")
+        return value
+
+    return PLACEHOLDER.sub(replace, text) if text else text
+
+
+# ===== Replay =====
+class ConnectionPool:
+    """One keep-alive connection per scheme and host, reopened when the server closes it"""
+
+    def __init__(self, timeout=15):
+        self.timeout = timeout
+        self._connections = {}
+
+    def connection(self, scheme, host):
+        key = (scheme, host)
+        if key not in self._connections:
+            factory = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            self._connections[key] = factory(host, timeout=self.timeout)
+        return self._connections[key]
+
+    def send(self, method, url, headers, body=None):
+        """Returns (status, body bytes, milliseconds)"""
+        parsed = urlparse(url)
+        path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        for attempt in (1, 2):
+            connection = self.connection(parsed.scheme, parsed.netloc)
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                content = response.read()
+                return response.status, content, (time.perf_counter() - started) * 1000
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                self._connections.pop((parsed.scheme, parsed.netloc), None)
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections = {}
+
+
+def cookie_header(session, host):
+    """Cookie header of the cached session for a host"""
+    pairs = []
+    for cookie in session.get("cookies", []):
+        domain = cookie.get("domain", "").lstrip(".")
+        if host == domain or host.endswith(f".{domain}"):
+            pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+def replay(script, values, session, pool):
+    """Sends every request of a script in order; returns per-request results"""
+    storage = session.get("local_storage", {})
+    results = []
+    responses = []
+    for number, request in enumerate(script["requests"], start=1):
+        url = substitute(request["url"], values, storage, responses)
+        headers = {name: substitute(value, values, storage, responses) for name, value in request["headers"].items()}
+        cookies = cookie_header(session, urlparse(url).hostname)
+        if cookies:
+            headers["Cookie"] = cookies
+        body = substitute(request["body"], values, storage, responses)
+        status, content, ms = pool.send(request["method"], url, headers, body)
+        try:
+            responses.append(json.loads(content))
+        except ValueError:
+            responses.append(None)
+        problems = []
+        if status != request["expect"]["status"]:
+            problems.append(f"status {status}, expected {request['expect']['status']}")
+        if "code" in request["expect"]:
+            code = responses[-1].get("code") if isinstance(responses[-1], dict) else None
+            if code != request["expect"]["code"]:
+                problems.append(f"code {code}, expected {request['expect']['code']}")
+        results.append({"number": number, "method": request["method"], "url": url, "status": status,
+                        "ms": round(ms, 1), "recorded_ms": request["recorded_ms"], "problems": problems})
+    return results
+
+
+def script_paths(flow_name, directory=REPLAY_DIR):
+    return os.path.join(directory, f"{flow_name}.har"), os.path.join(directory, f"{flow_name}.json")
+
+
+def main():
+    """Records a flow's API calls from a browser run, or replays them over HTTP"""
+    parser = argparse.ArgumentParser(description="Record flows as HAR and replay their API calls without a browser")
+    parser.add_argument("command", choices=["record", "replay"])
+    parser.add_argument("flow")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--dir", default=REPLAY_DIR)
+    args = parser.parse_args()
+
+    har_path, script_path = script_paths(args.flow, args.dir)
+    session = load_session()
+    if args.command == "record":
+        har, values = record(args.flow, args.base_url, args.headless)
+        script = build_script(args.flow, har, values, session)
+        os.makedirs(args.dir, exist_ok=True)
+        with open(har_path, "w", encoding="utf-8") as f:
+            json.dump(har, f, ensure_ascii=False, indent=1)
+        with open(script_path, "w", encoding="utf-8") as f:
+            json.dump(script, f, ensure_ascii=False, indent=2)
+        print(f"Recorded {len(script['requests'])} requests: {har_path}, {script_path}")
+        return
+
+    if not os.path.exists(script_path):
+        raise SystemExit(f"No replay script for {args.flow}, record one with: python http_replay.py record {args.flow}")
+    with open(script_path, encoding="utf-8") as f:
+        script = json.load(f)
+    pool = ConnectionPool()
+    failed = False
+    try:
+        for run in range(1, args.repeat + 1):
+            values = fresh_values(script, args.base_url)
+            started = time.perf_counter()
+            results = replay(script, values, session, pool)
+            total = (time.perf_counter() - started) * 1000
+            for result in results:
+                status = "; ".join(result["problems"]) or "ok"
+                print(f"  {result['number']:>3} {result['method']:<6} {urlparse(result['url']).path[:60]:<60} "
+                      f"{result['status']} {result['ms']:7.1f}ms (recorded {result['recorded_ms']}ms) {status}")
+            failed = failed or any(result["problems"] for result in results)
+            print(f"Replay {run}/{args.repeat} of {args.flow}: {len(results)} requests in {total:.0f}ms")
+    finally:
+        pool.close()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
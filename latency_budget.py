@@ -0,0 +1,145 @@
+"""
+Latency Budget Module
+This module checks how long each flow step took against the budget declared on
+the step (see Step.budget in flow_engine.py). A step over its budget logs a
+warning or fails the flow, depending on its budget mode. Every measured step
+is written to the run report and recorded in the run history (run_history.py),
+so the suite also works as a performance regression gate for the admin UI.
+
+    python latency_budget.py history add_ip --runs 20
+"""
+
+from datetime import datetime
+import argparse
+import os
+import statistics
+
+from report_store import save_json
+
+BUDGET_MODES = ("warn", "fail")
+
+
+class BudgetExceeded(Exception):
+    """A step with budget_mode="fail" took longer than its budget"""
+
+
+def budget_override():
+    """LATENCY_BUDGETS=warn|fail applies one mode to every budget, off disables the checks"""
+    mode = os.environ.get("LATENCY_BUDGETS", "")
+    if mode and mode not in BUDGET_MODES + ("off",):
+        raise Exception(f"Unknown LATENCY_BUDGETS mode: {mode}")
+    return mode or None
+
+
+class LatencyLog:
+    """Measurements of one flow run, checked against their budgets as they come in"""
+
+    def __init__(self, flow_name, environment="", override=None, throttling="none"):
+        self.flow_name = flow_name
+        self.environment = environment
+        self.throttling = throttling
+        self.override = budget_override() if override is None else override
+        # Budgets are set for unthrottled runs, so a throttled one only warns unless LATENCY_BUDGETS says otherwise
+        if throttling != "none" and self.override is None:
+            self.override = "warn"
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.entries = []
+
+    def measure(self, step, seconds, budget=None, mode="warn"):
+        """Records a step duration; raises BudgetExceeded for a failed budget in fail mode"""
+        if self.override == "off":
+            budget = None
+        elif self.override:
+            mode = self.override
+        over = budget is not None and seconds > budget
+        self.entries.append({"step": step, "seconds": round(seconds, 3), "budget": budget,
+                             "mode": mode if budget is not None else None, "over": over})
+        if budget is None:
+            print(f"Latency: {step} took {seconds:.2f}s")
+            return
+        if not over:
+            print(f"Latency: {step} took {seconds:.2f}s (budget {budget:.2f}s)")
+            return
+        message = f"{step} took {seconds:.2f}s, over its {budget:.2f}s budget"
+        if mode == "fail":
+            raise BudgetExceeded(message)
+        print(f"WARNING: {message}")
+
+    def summary(self):
+        return {
+            "flow": self.flow_name,
+            "environment": self.environment,
+            "throttling": self.throttling,
+            "started_at": self.started_at,
+            "steps": self.entries,
+            "over_budget": [entry["step"] for entry in self.entries if entry["over"]],
+        }
+
+    def save(self, report_dir, passed=True):
+        """Writes the run's measurements to the report"""
+        summary = dict(self.summary(), passed=passed)
+        save_json(report_dir, f"{self.flow_name}_latency", "latency", summary)
+        if summary["over_budget"]:
+            print(f"Steps over budget in {self.flow_name}: {', '.join(summary['over_budget'])}")
+        return summary
+
+
+def declared_budgets():
+    """{(flow, step title): budget} as the flow definitions declare them now"""
+    from flow_definitions import FLOWS
+    from flow_engine import batch_budget, item_title, plan
+
+    budgets = {}
+    for flow in FLOWS.values():
+        budgets[(flow.name, "Page load")] = flow.load_budget
+        for item in plan(flow):
+            steps = item if isinstance(item, list) else [item]
+            budgets[(flow.name, item_title(steps))] = batch_budget(steps)[0]
+    return budgets
+
+
+def step_trends(samples, budgets):
+    """Per (flow, step): run count, median, worst and latest duration, budget and how often it was exceeded"""
+    trends = {}
+    for (flow, step, metric), seconds in samples.items():
+        if metric != "seconds" or not seconds:
+            continue
+        budget = budgets.get((flow, step))
+        trends[(flow, step)] = {"runs": len(seconds),
+                                "median": statistics.median(seconds),
+                                "max": max(seconds),
+                                "last": seconds[-1],
+                                "budget": budget,
+                                "over": sum(1 for value in seconds if budget is not None and value > budget)}
+    return trends
+
+
+def main():
+    """Prints step latency trends of the recorded passed runs against the budgets declared now"""
+    from run_history import HISTORY_DB, RunHistory
+
+    parser = argparse.ArgumentParser(description="Show step latency history against budgets")
+    parser.add_argument("command", choices=["history"])
+    parser.add_argument("flow", nargs="?", default=None)
+    parser.add_argument("--runs", type=int, default=20, help="number of most recent runs to include")
+    parser.add_argument("--environment", default=None)
+    parser.add_argument("--path", default=HISTORY_DB)
+    args = parser.parse_args()
+
+    samples = RunHistory(args.path).samples("step", args.flow, args.environment, args.runs)
+    trends = step_trends(samples, declared_budgets())
+    if not trends:
+        print("No latency history recorded yet")
+        return
+    for flow_name in dict.fromkeys(flow for flow, _ in trends):
+        print(f"\n{flow_name}")
+        for (flow, step), trend in trends.items():
+            if flow != flow_name:
+                continue
+            budget = f"{trend['budget']:.2f}s" if trend["budget"] is not None else "-"
+            print(f"  {step[:50]:<50} runs {trend['runs']:>3}  median {trend['median']:6.2f}s  "
+                  f"max {trend['max']:6.2f}s  last {trend['last']:6.2f}s  budget {budget:>6}  over {trend['over']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Locator Index Module
+This module remembers what the element behind each step locator looked like
+the last time it was found: tag, text, attributes, classes, form label and
+ancestor path. When a locator stops matching after a UI change, the step
+engine waits a short grace period and then for the page to be loaded and
+idle; only if the locator still matches nothing is the stored fingerprint
+matched against the page in one script call, continuing with the healed
+element and reporting a replacement locator instead of burning the full
+timeout and failing every following step.
+
+    python locator_index.py healed
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "locators.sqlite")
+# A fingerprint younger than this is not taken again on every lookup
+REFRESH_INTERVAL = 24 * 3600
+# How long a known locator may miss before the engine checks whether the page is idle and heals
+HEAL_GRACE = 2.0
+HEAL_THRESHOLD = 0.7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS locators (
+    page TEXT NOT NULL,
+    locator TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    healed_to TEXT,
+    healed_at REAL,
+    PRIMARY KEY (page, locator)
+)
+"""
+
+FINGERPRINT_JS = """
+const ATTRIBUTES = ['id', 'name', 'type', 'placeholder', 'aria-label', 'role', 'title', 'href'];
+const textOf = el => (el.innerText || el.value || '').trim().replace(/\\s+/g, ' ').slice(0, 80);
+const fingerprint = el => {
+    const attributes = {};
+    ATTRIBUTES.forEach(name => { const value = el.getAttribute(name); if (value) attributes[name] = value; });
+    const ancestors = [];
+    for (let node = el.parentElement; node && ancestors.length < 4; node = node.parentElement) {
+        ancestors.push(node.tagName.toLowerCase() + Array.from(node.classList).slice(0, 2).map(c => '.' + c).join(''));
+    }
+    const container = el.closest('.el-form-item, .el-dialog, .el-message-box');
+    const title = container &&
+        container.querySelector('.el-form-item__label, .el-dialog__title, .el-message-box__title');
+    return {
+        tag: el.tagName.toLowerCase(),
+        text: textOf(el),
+        attributes: attributes,
+        classes: Array.from(el.classList).filter(c => !/^is-|hover|focus|active/.test(c)),
+        ancestors: ancestors,
+        label: title ? title.innerText.trim() : null
+    };
+};
+"""
+
+FINGERPRINT_SCRIPT = FINGERPRINT_JS + "return fingerprint(arguments[0]);"
+
+# Scores every visible element with the stored tag; returns the best one when it is a clear match
+HEAL_SCRIPT = FINGERPRINT_JS + """
+const [stored, threshold] = arguments;
+const overlap = (a, b) => {
+    if (!a.length && !b.length) return 1;
+    const known = new Set(a);
+    return b.filter(item => known.has(item)).length / Math.max(a.length, b.length);
+};
+const score = candidate => {
+    let total = 0, max = 0;
+    const add = (weight, value) => { max += weight; total += weight * value; };
+    if (stored.text) add(3, candidate.text === stored.text ? 1 : 0);
+    if (stored.label) add(3, candidate.label === stored.label ? 1 : 0);
+    Object.entries(stored.attributes).forEach(([name, value]) =>
+        add(name === 'id' ? 3 : 1, candidate.attributes[name] === value ? 1 : 0));
+    add(2, overlap(stored.classes, candidate.classes));
+    add(2, overlap(stored.ancestors, candidate.ancestors));
+    return total / max;
+};
+const unique = xpath => document.evaluate('count(' + xpath + ')', document, null, XPathResult.NUMBER_TYPE, null)
+    .numberValue === 1;
+const locatorOf = el => {
+    if (el.id && unique(`//*[@id='${el.id}']`)) return `//*[@id='${el.id}']`;
+    const text = textOf(el);
+    const byText = `//${el.tagName.toLowerCase()}[normalize-space()='${text}']`;
+    if (text && text.length <= 40 && !text.includes("'") && unique(byText)) return byText;
+    const parts = [];
+    for (let node = el; node && node.nodeType === 1; node = node.parentElement) {
+        let index = 1;
+        for (let sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+            if (sibling.tagName === node.tagName) index++;
+        }
+        parts.unshift(`${node.tagName.toLowerCase()}[${index}]`);
+    }
+    return '/' + parts.join('/');
+};
+const ranked = Array.from(document.getElementsByTagName(stored.tag))
+    .filter(el => el.getClientRects().length)
+    .map(el => ({element: el, score: score(fingerprint(el))}))
+    .sort((a, b) => b.score - a.score);
+if (!ranked.length || ranked[0].score < threshold) return null;
+// Two equally good candidates would be a guess, not a heal
+if (ranked.length > 1 && ranked[0].score - ranked[1].score < 0.1) return null;
+return {element: ranked[0].element, score: ranked[0].score, locator: locatorOf(ranked[0].element)};
+"""
+
+
+class LocatorIndex:
+    def __init__(self, path=INDEX_PATH, refresh=REFRESH_INTERVAL, grace=HEAL_GRACE, threshold=HEAL_THRESHOLD):
+        self.path = path
+        self.refresh = refresh
+        self.grace = grace
+        self.threshold = threshold
+        self._fresh = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A connection that commits on success and is always closed"""
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, page, locator):
+        """Stored fingerprint of a locator on a page, or None"""
+        if (page, locator) in self._fingerprints:
+            return self._fingerprints[(page, locator)]
+        with self._connect() as connection:
+            row = connection.execute("SELECT fingerprint, updated_at FROM locators WHERE page = ? AND locator = ?",
+                                     (page, locator)).fetchone()
+        if not row:
+            return None
+        self._fresh[(page, locator)] = row["updated_at"]
+        self._fingerprints[(page, locator)] = json.loads(row["fingerprint"])
+        return self._fingerprints[(page, locator)]
+
+    def remember(self, driver, page, locator, element):
+        """Fingerprints a found element unless a recent fingerprint exists; never raises"""
+        if time.time() - self._fresh.get((page, locator), 0) < self.refresh:
+            return
+        try:
+            fingerprint = driver.execute_script(FINGERPRINT_SCRIPT, element)
+        except Exception as e:
+            print(f"WARNING: Could not fingerprint {locator}: {str(e)}")
+            return
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT INTO locators (page, locator, fingerprint, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (page, locator) DO UPDATE SET fingerprint = excluded.fingerprint, "
+                "updated_at = excluded.updated_at",
+                (page, locator, json.dumps(fingerprint, ensure_ascii=False), now))
+        self._fresh[(page, locator)] = now
+        self._fingerprints[(page, locator)] = fingerprint
+
+    def heal(self, driver, page, locator):
+        """Best match for a missing locator's fingerprint: {"element", "score", "locator"}, or None"""
+        fingerprint = self.get(page, locator)
+        if not fingerprint:
+            return None
+        try:
+            match = driver.execute_script(HEAL_SCRIPT, fingerprint, self.threshold)
+        except Exception as e:
+            print(f"WARNING: Locator healing failed for {locator}: {str(e)}")
+            return None
+        if match:
+            with self._lock, self._connect() as connection:
+                connection.execute("UPDATE locators SET healed_to = ?, healed_at = ? WHERE page = ? AND locator = ?",
+                                   (match["locator"], time.time(), page, locator))
+        return match
+
+    def healed(self):
+        """Locators that had to be healed, with the replacement to put in the flow definitions"""
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(
+                "SELECT page, locator, healed_to, healed_at FROM locators WHERE healed_to IS NOT NULL "
+                "ORDER BY healed_at DESC")]
+
+    def clear(self, page=None):
+        with self._lock, self._connect() as connection:
+            if page:
+                connection.execute("DELETE FROM locators WHERE page = ?", (page,))
+            else:
+                connection.execute("DELETE FROM locators")
+
+
+def healing_enabled():
+    """Locators are fingerprinted and healed unless LOCATOR_HEALING=0"""
+    return os.environ.get("LOCATOR_HEALING", "1") != "0"
+
+
+def main():
+    """Lists healed locators or clears the index"""
+    parser = argparse.ArgumentParser(description="Inspect the locator fingerprint index")
+    parser.add_argument("command", choices=["healed", "clear"])
+    parser.add_argument("--page", default=None)
+    args = parser.parse_args()
+
+    index = LocatorIndex()
+    if args.command == "clear":
+        index.clear(args.page)
+        print(f"Cleared fingerprints of {args.page or 'all pages'}")
+        return
+    rows = [row for row in index.healed() if not args.page or row["page"] == args.page]
+    if not rows:
+        print("No healed locators")
+    for row in rows:
+        healed_at = datetime.fromtimestamp(row["healed_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{row['page']}  (healed {healed_at})\n  was: {row['locator']}\n  now: {row['healed_to']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,18 +7,38 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import json
 import os
 import time
+from urllib.parse import quote, urlsplit
+
+from event_wait import EventWait
+from report_store import save_screenshot
+
+ADMIN_URL = "https://test-admin-ipipgo.cd.xiaoxigroup.net/app-manager/"
+ADMIN_HOST = "test-admin-ipipgo.cd.xiaoxigroup.net/app-manager"
+ADMIN_LAYOUT_XPATH = '//*[@id="app"]/div/div[2]/section'
+SSO_LOGIN_URL = "https://sso.xiaoxitech.com/login?project=lwlu63w1&cb="
+
+# Fields accepted by CDP Network.setCookies (getAllCookies returns a few more)
+COOKIE_PARAM_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+def admin_host(base_url):
+    """Host and path of an admin base URL, as its pages' URLs contain it"""
+    url = urlsplit(base_url)
+    return f"{url.netloc}{url.path.rstrip('/')}"
+
 
 class LoginManager:
-    def __init__(self, driver: webdriver.Chrome, wait: WebDriverWait):
+    def __init__(self, driver: webdriver.Chrome, wait: WebDriverWait, base_url=ADMIN_URL):
         self.driver = driver
         self.wait = wait
+        self.admin_url = base_url.rstrip("/") + "/"
+        self.admin_host = admin_host(base_url)
 
     def take_screenshot(self, step_name, report_dir):
         """Takes and saves a screenshot with the given step name"""
-        screenshot_path = os.path.join(report_dir, f"{step_name}.png")
-        self.driver.save_screenshot(screenshot_path)
+        screenshot_path = save_screenshot(self.driver, step_name, report_dir)
         print(f"Screenshot saved: {screenshot_path}")
 
     def interact_with_element(self, element, action, step_name, report_dir, wait_time=1, **kwargs):
@@ -46,7 +66,7 @@ class LoginManager:
         """Handles the login process"""
         try:
             print("\n=== Starting login process ===")
-            self.driver.get("https://sso.xiaoxitech.com/login?project=lwlu63w1&cb=https%3A%2F%2Ftest-admin-ipipgo.cd.xiaoxigroup.net%2Fapp-manager%2F")
+            self.driver.get(SSO_LOGIN_URL + quote(self.admin_url, safe=""))
             print("Navigated to login page")
             self.take_screenshot("01_login_page", report_dir)
             
@@ -98,7 +118,7 @@ class LoginManager:
             # Step 6: Verify login success
             try:
                 print("\n--- Step 6: Verifying login success ---")
-                self.wait.until(EC.url_contains("test-admin-ipipgo.cd.xiaoxigroup.net/app-manager"))
+                self.wait.until(EC.url_contains(self.admin_host))
                 print("Login successful")
                 self.take_screenshot("06_login_success", report_dir)
             except Exception as e:
@@ -108,4 +128,55 @@ class LoginManager:
         except Exception as e:
             print(f"\n=== Login failed with error: {str(e)} ===")
             self.take_screenshot("final_error", report_dir)
-            raise
\ No newline at end of file
+            raise
+
+    def save_session(self, session_path):
+        """Saves cookies and local storage of the logged-in admin so later runs can skip the CAPTCHA"""
+        if hasattr(self.driver, "execute_cdp_cmd"):
+            cookies = self.driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        else:
+            cookies = self.driver.get_cookies()
+        local_storage = self.driver.execute_script(
+            "var items = {}; for (var i = 0; i < localStorage.length; i++) {"
+            " var key = localStorage.key(i); items[key] = localStorage.getItem(key); } return items;")
+
+        os.makedirs(os.path.dirname(os.path.abspath(session_path)), exist_ok=True)
+        with open(session_path, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": time.time(), "cookies": cookies, "local_storage": local_storage}, f)
+        print(f"Login session saved: {session_path}")
+
+    def restore_session(self, session_path):
+        """Restores a session saved by save_session; returns True when the admin accepts it"""
+        if not os.path.exists(session_path):
+            return False
+        try:
+            with open(session_path, encoding="utf-8") as f:
+                session = json.load(f)
+
+            if hasattr(self.driver, "execute_cdp_cmd"):
+                cookies = [{k: c[k] for k in COOKIE_PARAM_FIELDS if k in c} for c in session["cookies"]]
+                self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+                self.driver.get(self.admin_url)
+            else:
+                self.driver.get(self.admin_url)
+                for cookie in session["cookies"]:
+                    try:
+                        self.driver.add_cookie(cookie)
+                    except Exception:
+                        pass  # cookie for another domain (e.g. the SSO host)
+
+            if self.admin_host in self.driver.current_url:
+                self.driver.execute_script(
+                    "var items = arguments[0]; for (var key in items) { localStorage.setItem(key, items[key]); }",
+                    session["local_storage"])
+                self.driver.get(self.admin_url)
+
+            # The SPA may redirect to SSO after loading, so wait for the admin layout itself
+            EventWait(self.driver, 5).present((By.XPATH, ADMIN_LAYOUT_XPATH))
+            if self.admin_host not in self.driver.current_url:
+                raise Exception(f"redirected to {self.driver.current_url}")
+            print("Restored cached login session")
+            return True
+        except Exception as e:
+            print(f"Cached login session rejected: {str(e)}")
+            return False
@@ -0,0 +1,163 @@
+"""
+Memory Monitor Module
+This module samples the memory of a WebDriver session: RSS of chromedriver and
+every Chrome process under it (read from /proc) and the page's JS heap from
+CDP Performance.getMetrics. Remote (grid) sessions have no local processes and
+no CDP command, so only their JS heap is sampled, from performance.memory. A
+RecyclePolicy decides when a browser has grown
+too large or served too many flows and should be replaced.
+"""
+
+from datetime import datetime
+import json
+import os
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+MB = 1024 * 1024
+# Chrome-only, so sessions without CDP can still report their JS heap
+HEAP_SCRIPT = "const m = performance.memory; return m ? {used: m.usedJSHeapSize, total: m.totalJSHeapSize} : null;"
+
+
+# ===== /proc Helpers =====
+def child_map():
+    """Maps every pid to the pids of its direct children"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, so parse after its closing paren
+        parent = int(stat[stat.rindex(")") + 2:].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+    return children
+
+
+def process_tree(root_pid):
+    """Returns root_pid and all of its descendants"""
+    children = child_map()
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def rss_bytes(pid):
+    """Resident set size of one process, 0 when it has exited"""
+    try:
+        with open(f"/proc/{pid}/statm", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def process_name(pid):
+    try:
+        with open(f"/proc/{pid}/comm", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+# ===== Monitor =====
+class MemoryMonitor:
+    def __init__(self, driver, label="driver", log_path=None):
+        self.driver = driver
+        self.label = label
+        self.log_path = log_path
+        self.samples = []
+        self._metrics_enabled = False
+
+    def driver_pid(self):
+        """Pid of the local chromedriver, None for remote sessions"""
+        service = getattr(self.driver, "service", None)
+        process = getattr(service, "process", None)
+        return process.pid if process else None
+
+    def process_rss(self):
+        """RSS in bytes of chromedriver and of all Chrome processes it started"""
+        pid = self.driver_pid()
+        if pid is None or not os.path.isdir("/proc"):
+            return {"chromedriver": 0, "chrome": 0, "processes": 0}
+        tree = process_tree(pid)
+        chrome = sum(rss_bytes(p) for p in tree if p != pid)
+        return {"chromedriver": rss_bytes(pid), "chrome": chrome, "processes": len(tree) - 1}
+
+    def js_metrics(self):
+        """JS heap and DOM counters of the current page from CDP Performance.getMetrics"""
+        if not hasattr(self.driver, "execute_cdp_cmd"):
+            return self.page_heap()
+        try:
+            if not self._metrics_enabled:
+                self.driver.execute_cdp_cmd("Performance.enable", {})
+                self._metrics_enabled = True
+            metrics = self.driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+        except Exception as e:
+            print(f"WARNING: Could not read JS heap metrics: {str(e)}")
+            return {}
+        wanted = ("JSHeapUsedSize", "JSHeapTotalSize", "Nodes", "JSEventListeners", "Documents")
+        return {m["name"]: m["value"] for m in metrics if m["name"] in wanted}
+
+    def page_heap(self):
+        """JS heap of the current page from performance.memory, for sessions without CDP"""
+        try:
+            memory = self.driver.execute_script(HEAP_SCRIPT)
+        except Exception as e:
+            print(f"WARNING: Could not read JS heap metrics: {str(e)}")
+            return {}
+        return {"JSHeapUsedSize": memory["used"], "JSHeapTotalSize": memory["total"]} if memory else {}
+
+    def sample(self, step_name=""):
+        """Takes one sample, keeps it and appends it to the log file when configured"""
+        rss = self.process_rss()
+        js = self.js_metrics()
+        sample = {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "label": self.label,
+            "step": step_name,
+            "chromedriver_rss_mb": round(rss["chromedriver"] / MB, 1),
+            "chrome_rss_mb": round(rss["chrome"] / MB, 1),
+            "chrome_processes": rss["processes"],
+            "js_heap_used_mb": round(js.get("JSHeapUsedSize", 0) / MB, 1),
+            "js_heap_total_mb": round(js.get("JSHeapTotalSize", 0) / MB, 1),
+            "dom_nodes": int(js.get("Nodes", 0)),
+            "js_listeners": int(js.get("JSEventListeners", 0)),
+        }
+        self.samples.append(sample)
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(sample) + "\n")
+        return sample
+
+    def peak(self, key):
+        """Highest value of a sample field seen so far"""
+        return max((sample[key] for sample in self.samples), default=0)
+
+
+# ===== Recycling =====
+class RecyclePolicy:
+    def __init__(self, max_chrome_rss_mb=None, max_js_heap_mb=None, max_uses=None):
+        self.max_chrome_rss_mb = max_chrome_rss_mb
+        self.max_js_heap_mb = max_js_heap_mb
+        self.max_uses = max_uses
+
+    def check(self, monitor):
+        """Refuses a limit the session cannot report, instead of never recycling it"""
+        if self.max_chrome_rss_mb and monitor.driver_pid() is None:
+            raise Exception(f"A Chrome RSS limit ({self.max_chrome_rss_mb}MB) needs a local chromedriver; "
+                            f"{monitor.label} is a remote session, limit its JS heap or its uses instead")
+
+    def reason(self, sample, uses):
+        """Returns why a browser should be recycled, or None to keep it"""
+        if self.max_uses and uses >= self.max_uses:
+            return f"served {uses} flows (limit {self.max_uses})"
+        if self.max_chrome_rss_mb and sample["chrome_rss_mb"] >= self.max_chrome_rss_mb:
+            return f"Chrome RSS {sample['chrome_rss_mb']}MB (limit {self.max_chrome_rss_mb}MB)"
+        if self.max_js_heap_mb and sample["js_heap_used_mb"] >= self.max_js_heap_mb:
+            return f"JS heap {sample['js_heap_used_mb']}MB (limit {self.max_js_heap_mb}MB)"
+        return None
@@ -0,0 +1,221 @@
+"""
+Network Capture Module
+This module times the backend API calls the admin pages make. With
+NETWORK_CAPTURE=1 Chrome keeps a performance log of its DevTools network
+events; after every flow step the log is drained and each XHR/fetch request is
+turned into method, URL template, status, size and timing. Per-endpoint
+histograms with p50/p95/p99 go into the run report, so a slow step can be
+traced to the UI or to the server; the run history keeps the timings for the
+summary across runs.
+
+    python network_capture.py summary --endpoint provider
+"""
+
+from datetime import datetime
+import argparse
+import json
+import os
+import re
+from urllib.parse import urlparse
+
+from report_store import save_json
+from run_history import percentile
+
+# Upper bounds (ms) of the histogram buckets; slower requests land in the last, open bucket
+BUCKETS = (25, 50, 100, 250, 500, 1000, 2500, 5000)
+API_TYPES = ("XHR", "Fetch")
+
+# Path segments that identify an entity rather than an endpoint
+ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,})$",
+                        re.IGNORECASE)
+
+
+def network_capture_enabled():
+    """Backend requests are captured only with NETWORK_CAPTURE=1 (the performance log costs memory)"""
+    return os.environ.get("NETWORK_CAPTURE", "0") == "1"
+
+
+def enable_performance_log(options):
+    """Asks Chrome for the DevTools performance log, which get_log("performance") drains"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def url_template(url):
+    """Endpoint of a request URL: the path with ids replaced by {id}, without host and query"""
+    path = urlparse(url).path
+    return "/".join("{id}" if ID_SEGMENT.match(segment) else segment for segment in path.split("/")) or "/"
+
+
+class NetworkCapture:
+    """Backend requests of one flow run, read from the driver's performance log"""
+
+    def __init__(self, driver, flow_name="", environment=""):
+        self.driver = driver
+        self.flow_name = flow_name
+        self.environment = environment
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.requests = []
+        self._pending = {}
+        self.available = hasattr(driver, "get_log")
+
+    def reset(self):
+        """Discards what the log holds from before this run (pooled drivers keep their log)"""
+        self.drain(None)
+        self.requests = []
+        self._pending = {}
+
+    def drain(self, step):
+        """Turns the log entries since the last call into requests attributed to the step; never raises"""
+        if not self.available:
+            return []
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            print(f"WARNING: Performance log not available, network capture off: {str(e)}")
+            self.available = False
+            return []
+        finished = []
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            request = self.handle(message.get("method"), message.get("params", {}))
+            if request:
+                request["step"] = step
+                finished.append(request)
+        self.requests.extend(finished)
+        return finished
+
+    def handle(self, method, params):
+        """Follows one DevTools network event; returns a request once it has finished"""
+        request_id = params.get("requestId")
+        if method == "Network.requestWillBeSent":
+            if params.get("type") not in API_TYPES:
+                return None
+            self._pending[request_id] = {
+                "method": params["request"]["method"],
+                "url": params["request"]["url"],
+                "endpoint": url_template(params["request"]["url"]),
+                "started": params["timestamp"],
+                "status": None,
+                "server_ms": None,
+            }
+        elif method == "Network.responseReceived" and request_id in self._pending:
+            response = params["response"]
+            request = self._pending[request_id]
+            request["status"] = response.get("status")
+            timing = response.get("timing")
+            if timing:
+                # Time the server took from the request being sent to the response headers arriving
+                request["server_ms"] = round(timing["receiveHeadersEnd"] - timing["sendEnd"], 1)
+        elif method in ("Network.loadingFinished", "Network.loadingFailed") and request_id in self._pending:
+            request = self._pending.pop(request_id)
+            request["duration_ms"] = round((params["timestamp"] - request.pop("started")) * 1000, 1)
+            request["size"] = params.get("encodedDataLength", 0)
+            if method == "Network.loadingFailed":
+                request["status"] = request["status"] or "failed"
+                request["error"] = params.get("errorText", "")
+            return request
+        return None
+
+    def step_totals(self):
+        """Per step: request count, summed and slowest duration, to compare with the step's own time"""
+        totals = {}
+        for request in self.requests:
+            total = totals.setdefault(request["step"], {"requests": 0, "total_ms": 0.0, "max_ms": 0.0})
+            total["requests"] += 1
+            total["total_ms"] = round(total["total_ms"] + request["duration_ms"], 1)
+            total["max_ms"] = max(total["max_ms"], request["duration_ms"])
+        return totals
+
+    def summary(self):
+        return {
+            "flow": self.flow_name,
+            "environment": self.environment,
+            "started_at": self.started_at,
+            "endpoints": endpoint_stats(self.requests),
+            "steps": self.step_totals(),
+            "requests": self.requests,
+        }
+
+    def save(self, report_dir):
+        """Writes the run's endpoint histograms to the report"""
+        summary = self.summary()
+        save_json(report_dir, f"{self.flow_name}_endpoints", "network", summary)
+        for endpoint, stats in summary["endpoints"].items():
+            print(f"{endpoint}: n={stats['count']} p50 {stats['p50']}ms p95 {stats['p95']}ms p99 {stats['p99']}ms")
+        return summary
+
+
+def histogram(durations):
+    """Request counts per bucket, labelled by the bucket's upper bound"""
+    counts = {f"<={bound}ms": 0 for bound in BUCKETS}
+    counts[f">{BUCKETS[-1]}ms"] = 0
+    for duration in durations:
+        bound = next((bound for bound in BUCKETS if duration <= bound), None)
+        counts[f"<={bound}ms" if bound else f">{BUCKETS[-1]}ms"] += 1
+    return counts
+
+
+def endpoint_stats(requests):
+    """Per "METHOD /endpoint": count, errors, percentiles of the duration and server time, and a histogram"""
+    grouped = {}
+    for request in requests:
+        grouped.setdefault(f"{request['method']} {request['endpoint']}", []).append(request)
+    stats = {}
+    for endpoint, calls in sorted(grouped.items()):
+        durations = [call["duration_ms"] for call in calls]
+        server = [call["server_ms"] for call in calls if call["server_ms"] is not None]
+        stats[endpoint] = {
+            "count": len(calls),
+            "errors": sum(1 for call in calls if call["status"] == "failed" or (call["status"] or 0) >= 400),
+            "p50": percentile(durations, 50),
+            "p95": percentile(durations, 95),
+            "p99": percentile(durations, 99),
+            "server_p50": percentile(server, 50),
+            "server_p95": percentile(server, 95),
+            "bytes": sum(call["size"] for call in calls),
+            "histogram": histogram(durations),
+        }
+    return stats
+
+
+def history_stats(samples):
+    """Per "METHOD /endpoint": count and percentiles of the duration and server time in run history samples"""
+    endpoints = {}
+    for (_, endpoint, metric), values in samples.items():
+        endpoints.setdefault(endpoint, {}).setdefault(metric, []).extend(values)
+    stats = {}
+    for endpoint, metrics in sorted(endpoints.items()):
+        durations, server = metrics.get("duration_ms", []), metrics.get("server_ms", [])
+        stats[endpoint] = {"count": len(durations), "p50": percentile(durations, 50),
+                           "p95": percentile(durations, 95), "p99": percentile(durations, 99),
+                           "server_p50": percentile(server, 50)}
+    return stats
+
+
+def main():
+    """Prints endpoint latency percentiles across the recorded passed runs"""
+    from run_history import HISTORY_DB, RunHistory
+
+    parser = argparse.ArgumentParser(description="Aggregate backend endpoint latency across runs")
+    parser.add_argument("command", choices=["summary"])
+    parser.add_argument("--endpoint", default=None, help="only endpoints containing this text")
+    parser.add_argument("--runs", type=int, default=None, help="number of most recent runs to include")
+    parser.add_argument("--environment", default=None)
+    parser.add_argument("--path", default=HISTORY_DB)
+    args = parser.parse_args()
+
+    stats = history_stats(RunHistory(args.path).samples("endpoint", environment=args.environment, runs=args.runs))
+    if not stats:
+        print("No endpoint timings recorded yet (run with NETWORK_CAPTURE=1)")
+        return
+    for endpoint, endpoint_summary in stats.items():
+        if args.endpoint and args.endpoint not in endpoint:
+            continue
+        print(f"{endpoint[:60]:<60} n={endpoint_summary['count']:<5} p50 {endpoint_summary['p50']:>8}  "
+              f"p95 {endpoint_summary['p95']:>8}  p99 {endpoint_summary['p99']:>8}  "
+              f"server p50 {endpoint_summary['server_p50']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Page Metrics Module
+This module records how fast the admin pages are for a user, from the
+Performance API of the browser the flows already drive: Navigation Timing,
+first (contentful) paint, largest contentful paint, long tasks and how long the
+Vue app takes to render after a route change. One script call per step
+collects everything since the previous step; the run history keeps the
+samples, aggregated per page by the summary command.
+
+    python page_metrics.py summary --page provider
+"""
+
+from datetime import datetime
+import argparse
+import os
+from urllib.parse import urlparse
+
+from report_store import save_json
+from run_history import percentile
+
+# Path segment the admin app is served under
+APP_PREFIX = "app-manager"
+
+# Buffers LCP, long tasks and route renders in window.__pageMetrics from document start
+OBSERVER_SCRIPT = """
+(() => {
+    if (window.__pageMetrics) return;
+    const metrics = window.__pageMetrics = {
+        document: Math.random().toString(36).slice(2), lcp: null, longTasks: [], routes: []
+    };
+    const observe = (type, callback) => {
+        try {
+            new PerformanceObserver(list => list.getEntries().forEach(callback)).observe({type: type, buffered: true});
+        } catch (e) { /* entry type not supported by this browser */ }
+    };
+    observe('largest-contentful-paint', entry => {
+        metrics.lcp = {ms: Math.round(entry.renderTime || entry.loadTime || entry.startTime),
+                       element: entry.element ? entry.element.tagName.toLowerCase() : null};
+    });
+    observe('longtask', entry => metrics.longTasks.push(
+        {start_ms: Math.round(entry.startTime), duration_ms: Math.round(entry.duration)}));
+
+    // A route has rendered once the DOM stays quiet for 100ms after the route change
+    let lastMutation = performance.now();
+    new MutationObserver(() => { lastMutation = performance.now(); })
+        .observe(document, {childList: true, subtree: true, attributes: true});
+    const routeChanged = from => {
+        if (location.href === from) return;
+        const route = {from: from, to: location.href, start: performance.now(), render_ms: null};
+        metrics.routes.push(route);
+        lastMutation = route.start;
+        const settle = () => {
+            const now = performance.now();
+            if (now - lastMutation >= 100 || now - route.start > 10000) {
+                route.render_ms = Math.round(lastMutation - route.start);
+            } else {
+                setTimeout(settle, 50);
+            }
+        };
+        setTimeout(settle, 50);
+    };
+    ['pushState', 'replaceState'].forEach(name => {
+        const original = history[name];
+        history[name] = function () {
+            const from = location.href;
+            const result = original.apply(this, arguments);
+            routeChanged(from);
+            return result;
+        };
+    });
+    let current = location.href;
+    const onNavigate = () => { const from = current; current = location.href; routeChanged(from); };
+    window.addEventListener('popstate', onNavigate);
+    window.addEventListener('hashchange', onNavigate);
+})();
+"""
+
+COLLECT_SCRIPT = OBSERVER_SCRIPT + """
+const metrics = window.__pageMetrics;
+const nav = performance.getEntriesByType('navigation')[0];
+const paints = {};
+performance.getEntriesByType('paint').forEach(entry => { paints[entry.name] = Math.round(entry.startTime); });
+const longTasks = metrics.longTasks.splice(0);
+const routes = metrics.routes.filter(route => route.render_ms !== null);
+metrics.routes = metrics.routes.filter(route => route.render_ms === null);
+return {
+    document: metrics.document,
+    url: location.href,
+    navigation: nav ? {
+        type: nav.type,
+        ttfb_ms: Math.round(nav.responseStart),
+        dom_interactive_ms: Math.round(nav.domInteractive),
+        dom_content_loaded_ms: Math.round(nav.domContentLoadedEventEnd),
+        load_ms: Math.round(nav.loadEventEnd),
+        transfer_size: nav.transferSize
+    } : null,
+    first_paint_ms: paints['first-paint'] || null,
+    first_contentful_paint_ms: paints['first-contentful-paint'] || null,
+    lcp: metrics.lcp,
+    long_tasks: longTasks,
+    routes: routes.map(route => ({from: route.from, to: route.to, render_ms: route.render_ms}))
+};
+"""
+
+# Metrics aggregated per page
+PAGE_FIELDS = ("ttfb_ms", "dom_content_loaded_ms", "load_ms", "first_contentful_paint_ms", "lcp_ms",
+               "long_task_ms", "route_render_ms")
+
+
+def install_page_observer(driver):
+    """Registers the performance observers for every document the session loads (needs CDP)"""
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return False
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": OBSERVER_SCRIPT})
+        return True
+    except Exception as e:
+        print(f"WARNING: Page metrics observer not installed: {str(e)}")
+        return False
+
+
+def page_metrics_enabled():
+    """Metrics are collected unless PAGE_METRICS=0"""
+    return os.environ.get("PAGE_METRICS", "1") != "0"
+
+
+def page_key(url):
+    """Admin page a URL belongs to, e.g. "operation/provider" (hash routes included, query dropped)"""
+    parsed = urlparse(url)
+    path = parsed.fragment.split("?")[0] if parsed.fragment.startswith("/") else parsed.path
+    parts = [part for part in path.split("/") if part]
+    if parts and parts[0] == APP_PREFIX:
+        parts = parts[1:]
+    return "/".join(parts) or "/"
+
+
+class PageMetrics:
+    """Front-end metrics of one flow run, one script call per collected step"""
+
+    def __init__(self, driver, flow_name="", environment=""):
+        self.driver = driver
+        self.flow_name = flow_name
+        self.environment = environment
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.documents = {}
+        self.steps = []
+
+    def collect(self, step):
+        """Takes everything the page buffered since the last call; never raises"""
+        try:
+            sample = self.driver.execute_script(COLLECT_SCRIPT)
+        except Exception as e:
+            print(f"WARNING: Page metrics not collected for {step}: {str(e)}")
+            return None
+        page = page_key(sample["url"])
+        document = self.documents.setdefault(sample["document"], {
+            "page": page,
+            "navigation": sample["navigation"],
+            "first_paint_ms": sample["first_paint_ms"],
+            "first_contentful_paint_ms": sample["first_contentful_paint_ms"],
+            "long_task_ms": 0,
+        })
+        # LCP keeps updating until the first interaction, so the latest value wins
+        if sample["lcp"]:
+            document["lcp_ms"] = sample["lcp"]["ms"]
+        long_task_ms = sum(task["duration_ms"] for task in sample["long_tasks"])
+        document["long_task_ms"] += long_task_ms
+        routes = [dict(route, page=page_key(route["to"])) for route in sample["routes"]]
+        self.steps.append({"step": step, "page": page, "long_tasks": len(sample["long_tasks"]),
+                           "long_task_ms": long_task_ms, "routes": routes})
+        return sample
+
+    def summary(self):
+        return {
+            "flow": self.flow_name,
+            "environment": self.environment,
+            "started_at": self.started_at,
+            "documents": list(self.documents.values()),
+            "steps": self.steps,
+        }
+
+    def save(self, report_dir):
+        """Writes the run's metrics to the report"""
+        summary = self.summary()
+        save_json(report_dir, f"{self.flow_name}_page_metrics", "metrics", summary)
+        return summary
+
+
+def aggregate(samples):
+    """Per page and metric: sample count, p50, p75 and p95 of run history samples (see RunHistory.samples)"""
+    pages = {}
+    for (_, page, metric), values in samples.items():
+        pages.setdefault(page, {}).setdefault(metric, []).extend(values)
+    return {page: {name: {"count": len(metrics[name]), "p50": percentile(metrics[name], 50),
+                          "p75": percentile(metrics[name], 75), "p95": percentile(metrics[name], 95)}
+                   for name in PAGE_FIELDS if metrics.get(name)}
+            for page, metrics in pages.items()}
+
+
+def main():
+    """Prints per-page metric percentiles of the recorded passed runs"""
+    from run_history import HISTORY_DB, RunHistory
+
+    parser = argparse.ArgumentParser(description="Aggregate front-end page metrics across runs")
+    parser.add_argument("command", choices=["summary"])
+    parser.add_argument("--page", default=None, help="only pages whose path contains this text")
+    parser.add_argument("--runs", type=int, default=None, help="number of most recent runs to include")
+    parser.add_argument("--environment", default=None)
+    parser.add_argument("--path", default=HISTORY_DB)
+    args = parser.parse_args()
+
+    pages = aggregate(RunHistory(args.path).samples("page", environment=args.environment, runs=args.runs))
+    if not pages:
+        print("No page metrics recorded yet")
+        return
+    for page, metrics in sorted(pages.items()):
+        if args.page and args.page not in page:
+            continue
+        print(f"\n{page}")
+        for name, stats in metrics.items():
+            print(f"  {name:<28} n={stats['count']:<4} p50 {stats['p50']:>7}  p75 {stats['p75']:>7}  "
+                  f"p95 {stats['p95']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Preflight Module
+This module checks every locator the flows declare before any flow runs, so
+a broken locator fails the run within seconds instead of after the login and
+the steps before it. Each page is visited once, and the dialog its first
+click opens is checked as well, with one script call per view. A check
+reports locators that are missing, ambiguous (more than one match), hidden
+or slow to evaluate. The DOM of every visited view is saved, and later checks
+can run against those snapshots without logging in or loading the app.
+
+    python preflight.py add_ip add_new_link
+    python preflight.py --mode snapshot
+"""
+
+from datetime import datetime
+import argparse
+import json
+import os
+import time
+
+from driver_factory import build_chrome_options, create_driver
+from flow_engine import BASE_URL, by_locator, restore_login
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "dom_snapshots")
+# Snapshots older than this are not trusted by the auto mode
+SNAPSHOT_MAX_AGE = 24 * 3600
+# How long a live view may take to render all its locators
+PAGE_WAIT = 10.0
+DIALOG_WAIT = 3.0
+POLL_INTERVAL = 0.25
+# A locator taking longer than this to evaluate is reported as slow (milliseconds)
+SLOW_MS = 20.0
+MODES = ("auto", "live", "snapshot")
+BROKEN = ("missing", "invalid")
+
+# Evaluates a batch of locators: match count, whether the first match is visible and the evaluation time
+CHECK_SCRIPT = """
+const results = [];
+for (const [kind, value] of arguments[0]) {
+    const started = performance.now();
+    let count = 0, first = null, error = null;
+    try {
+        if (kind === 'xpath') {
+            const found = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            count = found.snapshotLength;
+            first = found.snapshotItem(0);
+        } else {
+            const found = kind === 'css' ? document.querySelectorAll(value) : document.getElementsByClassName(value);
+            count = found.length;
+            first = found[0] || null;
+        }
+    } catch (e) {
+        error = e.message;
+    }
+    results.push({count: count, visible: !!first && first.getClientRects().length > 0,
+                  ms: performance.now() - started, error: error});
+}
+return results;
+"""
+
+# The current DOM without scripts, so a snapshot loads as static markup
+SNAPSHOT_SCRIPT = """
+const root = document.documentElement.cloneNode(true);
+root.querySelectorAll('script, noscript').forEach(el => el.remove());
+return '<!DOCTYPE html>' + root.outerHTML;
+"""
+
+LOAD_SNAPSHOT_SCRIPT = "document.open(); document.write(arguments[0]); document.close();"
+
+
+# ===== Views =====
+def step_locators(step):
+    """Locators of a step the preflight can check; toasts and preflight=False steps only exist later"""
+    if step.action == "verify_toast" or not step.preflight:
+        return []
+    return [locator for locator in (step.frame, step.locator) if locator]
+
+
+def views(flow):
+    """[(view, locators)] of a flow: the page up to its first click, then the dialog that click opens"""
+    page, dialog = [], []
+    current = page
+    for step in flow.steps:
+        for locator in step_locators(step):
+            if locator not in current:
+                current.append(locator)
+        if step.action == "click" and current is page:
+            current = dialog
+    return [(name, locators) for name, locators in (("page", page), ("dialog", dialog)) if locators]
+
+
+def script_kind(locator):
+    """CHECK_SCRIPT kind of a step locator (see by_locator)"""
+    if locator.startswith("css:"):
+        return "css"
+    return "class" if locator.startswith("class:") else "xpath"
+
+
+def problems(result, live):
+    """Problems of one checked locator, worst first"""
+    if result["error"]:
+        return [f"invalid: {result['error']}"]
+    found = []
+    if result["count"] == 0:
+        found.append("missing")
+    elif result["count"] > 1:
+        found.append(f"ambiguous ({result['count']} matches)")
+    if live and result["count"] and not result["visible"]:
+        found.append("hidden")
+    if result["ms"] > SLOW_MS:
+        found.append(f"slow ({result['ms']:.0f}ms)")
+    return found
+
+
+def is_broken(problem_list):
+    return any(problem.split(":")[0] in BROKEN for problem in problem_list)
+
+
+# ===== Preflight =====
+class Preflight:
+    def __init__(self, driver, base_url=BASE_URL, snapshot_dir=SNAPSHOT_DIR):
+        self.driver = driver
+        self.base_url = base_url
+        self.snapshot_dir = snapshot_dir
+
+    def check(self, view, locators, live):
+        """Checks all locators of a view in one script call"""
+        results = self.driver.execute_script(CHECK_SCRIPT, [(script_kind(locator), by_locator(locator)[1])
+                                                            for locator in locators])
+        checked = []
+        for locator, result in zip(locators, results):
+            checked.append({"view": view, "locator": locator, "count": result["count"],
+                            "ms": round(result["ms"], 2), "problems": problems(result, live)})
+        return checked
+
+    def check_until(self, view, locators, wait):
+        """Repeats the live check until every locator is there or the view had its time to render"""
+        deadline = time.perf_counter() + wait
+        while True:
+            checked = self.check(view, locators, live=True)
+            if not any(is_broken(item["problems"]) for item in checked) or time.perf_counter() >= deadline:
+                return checked
+            time.sleep(POLL_INTERVAL)
+
+    def live(self, flow):
+        """Visits the flow's page, opens its dialog with the first click and checks both"""
+        checked = []
+        snapshots = {}
+        self.driver.get(f"{self.base_url}/{flow.path.lstrip('/')}")
+        for view, locators in views(flow):
+            if view == "dialog":
+                opener = next(step.locator for step in flow.steps if step.action == "click")
+                if any(item["locator"] == opener and is_broken(item["problems"]) for item in checked):
+                    checked += [{"view": view, "locator": locator, "count": None, "ms": None,
+                                 "problems": ["not reached"]} for locator in locators]
+                    continue
+                self.driver.find_element(*by_locator(opener)).click()
+            checked += self.check_until(view, locators, DIALOG_WAIT if view == "dialog" else PAGE_WAIT)
+            snapshots[view] = self.driver.execute_script(SNAPSHOT_SCRIPT)
+        self.save_snapshot(flow, snapshots)
+        return checked
+
+    def from_snapshot(self, flow):
+        """Checks the flow's views against their saved DOM, without the app or a login"""
+        snapshot = self.load_snapshot(flow.name)
+        checked = []
+        for view, locators in views(flow):
+            if view not in snapshot["views"]:
+                checked += [{"view": view, "locator": locator, "count": None, "ms": None,
+                             "problems": ["no snapshot"]} for locator in locators]
+                continue
+            self.driver.get("about:blank")
+            self.driver.execute_script(LOAD_SNAPSHOT_SCRIPT, snapshot["views"][view])
+            checked += self.check(view, locators, live=False)
+        return checked
+
+    def run(self, flow, source):
+        started = time.perf_counter()
+        try:
+            checked = self.live(flow) if source == "live" else self.from_snapshot(flow)
+            error = ""
+        except Exception as e:
+            checked, error = [], str(e)
+        broken = bool(error) or any(is_broken(item["problems"]) for item in checked)
+        return {"flow": flow.name, "source": source, "seconds": round(time.perf_counter() - started, 2),
+                "broken": broken, "error": error, "locators": checked}
+
+    # ===== Snapshots =====
+    def snapshot_path(self, name):
+        return os.path.join(self.snapshot_dir, f"{name}.json")
+
+    def save_snapshot(self, flow, snapshots):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        with open(self.snapshot_path(flow.name), "w", encoding="utf-8") as f:
+            json.dump({"flow": flow.name, "url": f"{self.base_url}/{flow.path.lstrip('/')}",
+                       "saved_at": time.time(), "views": snapshots}, f, ensure_ascii=False)
+
+    def load_snapshot(self, name):
+        with open(self.snapshot_path(name), encoding="utf-8") as f:
+            return json.load(f)
+
+
+def snapshot_age(name, snapshot_dir=SNAPSHOT_DIR):
+    """Seconds since the flow's snapshot was saved, or None when there is none"""
+    path = os.path.join(snapshot_dir, f"{name}.json")
+    return time.time() - os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def source_of(name, mode, snapshot_dir=SNAPSHOT_DIR):
+    """live or snapshot for one flow; auto takes a snapshot younger than SNAPSHOT_MAX_AGE"""
+    if mode != "auto":
+        return mode
+    age = snapshot_age(name, snapshot_dir)
+    return "snapshot" if age is not None and age < SNAPSHOT_MAX_AGE else "live"
+
+
+def check_flows(names, mode="auto", base_url=BASE_URL, headless=False, report_dir=None):
+    """Preflight results of the named flows; logs in only when some page is checked live"""
+    from flow_definitions import FLOWS
+
+    sources = {name: source_of(name, mode) for name in names}
+    for name, source in sources.items():
+        if source == "snapshot" and snapshot_age(name) is None:
+            raise Exception(f"No DOM snapshot of {name} yet, run: python preflight.py {name} --mode live")
+    driver = create_driver(options=build_chrome_options(headless))
+    try:
+        if "live" in sources.values():
+            restore_login(driver, report_dir or os.getcwd(), base_url)
+        preflight = Preflight(driver, base_url)
+        results = [preflight.run(FLOWS[name], sources[name]) for name in names]
+    finally:
+        driver.quit()
+    if report_dir:
+        with open(os.path.join(report_dir, "preflight.json"), "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+def print_results(results):
+    for result in results:
+        status = "BROKEN" if result["broken"] else "ok"
+        print(f"{result['flow']:<24} {status:<7} {result['seconds']:5.1f}s  ({result['source']})")
+        if result["error"]:
+            print(f"  ERROR: {result['error']}")
+        for item in result["locators"]:
+            if item["problems"]:
+                print(f"  [{item['view']}] {', '.join(item['problems'])}: {item['locator']}")
+
+
+def main():
+    """Checks the locators of the named flows (default: all) live or against saved DOM snapshots"""
+    from flow_definitions import FLOWS
+
+    parser = argparse.ArgumentParser(description="Check every flow locator before running the flows")
+    parser.add_argument("flows", nargs="*", help=f"flow names (default: all of {', '.join(FLOWS)})")
+    parser.add_argument("--mode", choices=MODES, default="auto",
+                        help="auto: saved snapshots younger than a day, live visits otherwise")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.flows if name not in FLOWS]
+    if unknown:
+        raise SystemExit(f"Unknown flows: {', '.join(unknown)}")
+    started = datetime.now()
+    results = check_flows(args.flows or list(FLOWS), args.mode, args.base_url.rstrip("/"), args.headless)
+    print_results(results)
+    print(f"\nChecked {len(results)} flows in {(datetime.now() - started).total_seconds():.1f}s")
+    if any(result["broken"] for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Profile Manager Module
+This module builds a minimal Chrome profile template once (optionally with the
+cached login already in it) and hands every browser a throwaway copy of it on
+tmpfs, or a reflinked copy where the filesystem supports it. Browsers start
+from a small warm profile and parallel workers never share a profile lock.
+
+    python profile_manager.py build --login
+    python profile_manager.py benchmark --baseline-dir "/path/to/Chrome/User Data"
+"""
+
+from datetime import datetime
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+from driver_factory import build_chrome_options, create_driver
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".profiles", "template")
+SESSION_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".auth", "session.json")
+
+# Caches Chrome rebuilds on its own; dropping them keeps the template small
+PRUNED_ENTRIES = ("Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache", "GraphiteDawnCache",
+                  "Crashpad", "Crash Reports", "Safe Browsing", "optimization_guide_model_store",
+                  "component_crx_cache", "BrowserMetrics", "Service Worker/CacheStorage")
+
+PROFILE_ARGS = ("--no-first-run", "--no-default-browser-check", "--disable-sync",
+                "--disable-background-networking", "--disable-component-update")
+
+
+def default_work_root():
+    """tmpfs when available, otherwise the system temp directory"""
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+
+
+class ProfileManager:
+    def __init__(self, template_dir=TEMPLATE_DIR, work_root=None):
+        self.template_dir = template_dir
+        self.work_root = work_root or default_work_root()
+        self.checkouts = set()
+        self.copy_times = []
+        self.startups = []
+        self._lock = threading.Lock()
+
+    # ===== Template =====
+    def template_exists(self):
+        return os.path.exists(os.path.join(self.template_dir, "template.json"))
+
+    def build_template(self, login=False, session_path=SESSION_CACHE, headless=True):
+        """Launches Chrome once on an empty profile, optionally logs it in, then prunes it"""
+        from login_manager import LoginManager
+        from selenium.webdriver.support.ui import WebDriverWait # type: ignore
+
+        shutil.rmtree(self.template_dir, ignore_errors=True)
+        os.makedirs(self.template_dir)
+        print(f"\n=== Building profile template: {self.template_dir} ===")
+        started = time.time()
+        driver = create_driver(options=build_chrome_options(headless, self.chrome_args(self.template_dir)))
+        try:
+            driver.get("about:blank")
+            if login:
+                if not LoginManager(driver, WebDriverWait(driver, 10)).restore_session(session_path):
+                    raise Exception(f"Cannot log the template in, no valid session in {session_path}")
+        finally:
+            # Chrome writes cookies and local storage to disk on exit
+            driver.quit()
+
+        for entry in PRUNED_ENTRIES:
+            for base in (self.template_dir, os.path.join(self.template_dir, "Default")):
+                shutil.rmtree(os.path.join(base, entry), ignore_errors=True)
+        for lock in ("SingletonLock", "SingletonCookie", "SingletonSocket"):
+            path = os.path.join(self.template_dir, lock)
+            if os.path.lexists(path):
+                os.remove(path)
+
+        with open(os.path.join(self.template_dir, "template.json"), "w", encoding="utf-8") as f:
+            json.dump({"built_at": datetime.now().isoformat(), "with_login": login,
+                       "size_mb": round(self.directory_size(self.template_dir) / 1024 / 1024, 1)}, f)
+        print(f"Template built in {time.time() - started:.1f}s")
+
+    # ===== Checkouts =====
+    def checkout(self):
+        """Copies the template into a fresh throwaway directory and returns its path"""
+        if not self.template_exists():
+            raise Exception(f"No profile template in {self.template_dir}, run `python profile_manager.py build`")
+        path = os.path.join(self.work_root, f"chrome-profile-{uuid.uuid4().hex[:12]}")
+        started = time.time()
+        try:
+            # --reflink=auto shares blocks on btrfs/xfs and falls back to a plain copy
+            subprocess.run(["cp", "-a", "--reflink=auto", self.template_dir, path],
+                           check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError):
+            shutil.copytree(self.template_dir, path, symlinks=True)
+        with self._lock:
+            self.checkouts.add(path)
+            self.copy_times.append(time.time() - started)
+        return path
+
+    def release(self, path):
+        """Deletes a checked-out profile"""
+        with self._lock:
+            self.checkouts.discard(path)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def release_driver(self, driver):
+        """Deletes the profile a driver was started with; call after driver.quit()"""
+        path = getattr(driver, "profile_dir", None)
+        if path:
+            self.release(path)
+
+    def release_all(self):
+        """Deletes every profile still checked out"""
+        for path in list(self.checkouts):
+            self.release(path)
+
+    @staticmethod
+    def chrome_args(path):
+        """Chrome arguments for starting on a given profile directory"""
+        return [f"--user-data-dir={path}"] + list(PROFILE_ARGS)
+
+    def create_driver(self, remote_url=None, headless=False, extra_args=None):
+        """Starts a local Chrome on a fresh template copy and records the startup time"""
+        if remote_url or os.environ.get("SELENIUM_REMOTE_URL"):
+            print("WARNING: Profile templates only apply to local Chrome, starting remote session without one")
+            return create_driver(remote_url, build_chrome_options(headless, extra_args))
+
+        started = time.time()
+        path = self.checkout()
+        try:
+            driver = create_driver(options=build_chrome_options(headless, self.chrome_args(path) + list(extra_args or [])))
+        except Exception:
+            self.release(path)
+            raise
+        driver.profile_dir = path
+        with self._lock:
+            self.startups.append(time.time() - started)
+        return driver
+
+    # ===== Reporting =====
+    def measure_startup(self, args, runs=3, headless=True):
+        """Average seconds to start Chrome and load about:blank with the given arguments"""
+        durations = []
+        for _ in range(runs):
+            started = time.time()
+            driver = create_driver(options=build_chrome_options(headless, args))
+            driver.get("about:blank")
+            durations.append(time.time() - started)
+            driver.quit()
+        return sum(durations) / len(durations)
+
+    def benchmark(self, baseline_dir=None, runs=3, headless=True):
+        """Compares startup from a template copy with a baseline profile (or a brand new one)"""
+        baseline_path = baseline_dir or tempfile.mkdtemp(prefix="chrome-baseline-")
+        try:
+            baseline = self.measure_startup(self.chrome_args(baseline_path), runs, headless)
+        finally:
+            if not baseline_dir:
+                shutil.rmtree(baseline_path, ignore_errors=True)
+
+        template_runs = []
+        for _ in range(runs):
+            started = time.time()
+            driver = self.create_driver(headless=headless)
+            driver.get("about:blank")
+            template_runs.append(time.time() - started)
+            driver.quit()
+            self.release_driver(driver)
+        template = sum(template_runs) / len(template_runs)
+
+        label = baseline_dir or "a new empty profile"
+        print(f"Baseline startup ({label}): {baseline:.2f}s")
+        print(f"Template startup (copy on {self.work_root}): {template:.2f}s")
+        print(f"Saved per browser: {baseline - template:.2f}s")
+        return {"baseline": baseline, "template": template, "saved": baseline - template}
+
+    def report(self):
+        """Summarises copy and startup times of this run"""
+        if not self.startups:
+            return "No browsers started from the profile template"
+        average_copy = sum(self.copy_times) / len(self.copy_times) if self.copy_times else 0
+        return (f"{len(self.startups)} browsers started from the profile template, "
+                f"average startup {sum(self.startups) / len(self.startups):.2f}s "
+                f"(profile copy {average_copy:.3f}s)")
+
+    @staticmethod
+    def directory_size(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+
+def main():
+    """Builds the profile template or benchmarks startup against a baseline profile"""
+    parser = argparse.ArgumentParser(description="Manage the Chrome profile template")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the profile template")
+    build.add_argument("--login", action="store_true", help="bake the cached login session into the template")
+    bench = sub.add_parser("benchmark", help="compare startup time with a baseline profile")
+    bench.add_argument("--baseline-dir", default=None, help="profile to compare with, e.g. a full User Data dir")
+    bench.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    manager = ProfileManager()
+    if args.command == "build":
+        manager.build_template(login=args.login)
+    else:
+        manager.benchmark(args.baseline_dir, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""
+Report Store Module
+This module packs the screenshots and step logs of a run into one indexed zip
+archive (report.zip in the run's report directory) instead of dozens of loose
+PNG files; REPORT_ARCHIVE=1 turns it on. REPORT_STAGING=/dev/shm writes the
+open archive on tmpfs and moves it into the report directory when it is
+closed. The zip index is only written when the archive is closed, so every
+artifact and step log line is also journaled next to it as it comes in, and
+the recover command rebuilds the archive of a run that crashed before closing
+it (from tmpfs too, as long as the machine was not restarted).
+
+    python report_store.py list reports/<run>/report.zip --step popup
+    python report_store.py extract reports/<run>/report.zip 09_popup -o /tmp/frames
+    python report_store.py search reports/<run>/report.zip "el-message"
+    python report_store.py pack reports/<old run directory>
+    python report_store.py recover reports/<crashed run directory>
+"""
+
+from datetime import datetime
+import argparse
+import fnmatch
+import gzip
+import json
+import os
+import shutil
+import struct
+import threading
+import uuid
+import zipfile
+import zlib
+
+ARCHIVE_NAME = "report.zip"
+INDEX_NAME = "index.json"
+STEPS_NAME = "steps.jsonl"
+# Index entries and step log lines of an archive that is still open, one JSON object per line
+JOURNAL_NAME = "report.journal.jsonl"
+# Left in the report directory while its archive is staged elsewhere; holds the staging directory
+STAGED_NAME = "report.staged"
+STAGING_ENV = "REPORT_STAGING"
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+
+_stores = {}
+_stores_lock = threading.Lock()
+_step_markers = {}
+
+
+def staging_root():
+    """Directory open archives are staged in (REPORT_STAGING, e.g. /dev/shm), or None for the report directory"""
+    return os.environ.get(STAGING_ENV) or None
+
+
+class ReportStore:
+    def __init__(self, report_dir, staging=None):
+        self.report_dir = report_dir
+        self.archive_path = os.path.join(report_dir, ARCHIVE_NAME)
+        self.stage_dir = report_dir
+        if staging:
+            self.stage_dir = os.path.join(staging, f"report-{uuid.uuid4().hex[:12]}")
+            os.makedirs(self.stage_dir)
+            with open(os.path.join(report_dir, STAGED_NAME), "w", encoding="utf-8") as f:
+                f.write(self.stage_dir)
+        # The journal stays next to the archive it describes
+        self.stage_path = os.path.join(self.stage_dir, ARCHIVE_NAME)
+        self.journal_path = os.path.join(self.stage_dir, JOURNAL_NAME)
+        self.index = []
+        self.steps = []
+        self.closed = False
+        self._pending = []
+        self._zip = zipfile.ZipFile(self.stage_path, "w")
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def journal(self, record):
+        """Flushes one journal line, so a crash keeps everything written up to here"""
+        self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._journal.flush()
+
+    def add_screenshot(self, step_name, png):
+        """Appends a PNG frame (stored, PNG is already compressed)"""
+        return self.add_file(step_name, png, "screenshot", ".png", zipfile.ZIP_STORED)
+
+    def add_file(self, step_name, data, kind, extension="", compression=zipfile.ZIP_DEFLATED):
+        """Appends any artifact under a sequence-numbered name and indexes it by step"""
+        with self._lock:
+            if self.closed:
+                raise Exception(f"Report archive already closed: {self.archive_path}")
+            name = f"{len(self.index) + 1:04d}_{step_name}{extension}"
+            self._zip.writestr(name, data, compress_type=compression)
+            self._zip.fp.flush()
+            entry = {
+                "name": name,
+                "step": step_name,
+                "kind": kind,
+                "size": len(data),
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            }
+            self.index.append(entry)
+            self.journal({"entry": entry})
+        return name
+
+    def add_log(self, step_name, status, message=""):
+        """Records a step log line; all lines are written to steps.jsonl on close"""
+        step = {
+            "step": step_name,
+            "status": status,
+            "message": message,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        }
+        with self._lock:
+            if not self.closed:
+                self.steps.append(step)
+                self.journal({"step": step})
+
+    def track(self, future):
+        """Registers a background write that has to land before the archive is closed"""
+        self._pending.append(future)
+
+    def close(self):
+        """Writes the index and step log into the archive, moves it into the report directory and drops the journal"""
+        for future in self._pending:
+            try:
+                future.result(timeout=60)
+            except Exception as e:
+                print(f"WARNING: Background write to {self.archive_path} failed: {str(e)}")
+        with self._lock:
+            if self.closed:
+                return self.archive_path
+            self.closed = True
+            self._zip.writestr(STEPS_NAME, "".join(json.dumps(step) + "\n" for step in self.steps),
+                               compress_type=zipfile.ZIP_DEFLATED)
+            self._zip.writestr(INDEX_NAME, json.dumps({"entries": self.index}, indent=1),
+                               compress_type=zipfile.ZIP_DEFLATED)
+            self._zip.close()
+            self._journal.close()
+            if self.stage_dir != self.report_dir:
+                shutil.move(self.stage_path, self.archive_path)
+            os.remove(self.journal_path)
+            unstage(self.report_dir, self.stage_dir)
+        print(f"Report archive written: {self.archive_path} ({len(self.index)} artifacts)")
+        return self.archive_path
+
+
+# ===== Run Registry =====
+def open_store(report_dir):
+    """Starts archiving the artifacts of a report directory"""
+    with _stores_lock:
+        store = _stores.get(report_dir)
+        if store is None:
+            store = _stores[report_dir] = ReportStore(report_dir, staging_root())
+        return store
+
+
+def get_store(report_dir):
+    """Returns the open store of a report directory, or None when artifacts go to loose files"""
+    return _stores.get(report_dir)
+
+
+def close_store(report_dir):
+    """Finishes the archive of a report directory"""
+    with _stores_lock:
+        store = _stores.pop(report_dir, None)
+    return store.close() if store else None
+
+
+def close_all_stores():
+    """Finishes every archive still open, e.g. from a finally block"""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+
+def archiving_enabled():
+    """Archives are written only with REPORT_ARCHIVE=1; loose files otherwise"""
+    return os.environ.get("REPORT_ARCHIVE", "0") == "1"
+
+
+def unstage(report_dir, stage_dir):
+    """Removes an emptied staging directory and the report directory's note pointing to it"""
+    if stage_dir == report_dir:
+        return
+    shutil.rmtree(stage_dir, ignore_errors=True)
+    staged_note = os.path.join(report_dir, STAGED_NAME)
+    if os.path.exists(staged_note):
+        os.remove(staged_note)
+
+
+def register_step_marker(report_dir, marker):
+    """Routes the screenshot steps of a report directory to marker(step_name) first, e.g. a screencast"""
+    _step_markers[report_dir] = marker
+
+
+def unregister_step_marker(report_dir):
+    _step_markers.pop(report_dir, None)
+
+
+def save_screenshot(driver, step_name, report_dir):
+    """Saves a screenshot into the run archive when one is open, else as a loose PNG; returns where"""
+    if step_name.endswith("final_error"):
+        # The one place failure snapshots are taken: every flow, script and login error path ends here
+        from failure_snapshot import capture_failure
+        capture_failure(driver, step_name, report_dir)
+    marker = _step_markers.get(report_dir)
+    if marker and marker(step_name):
+        # The recording already shows this step, only its boundary is kept
+        return f"{os.path.join(report_dir, 'screencast')}@{step_name}"
+    store = get_store(report_dir)
+    if store:
+        name = store.add_screenshot(step_name, driver.get_screenshot_as_png())
+        return f"{store.archive_path}::{name}"
+    screenshot_path = os.path.join(report_dir, f"{step_name}.png")
+    driver.save_screenshot(screenshot_path)
+    return screenshot_path
+
+
+def save_json(report_dir, name, kind, data):
+    """Saves a JSON artifact into the run archive when one is open, else as a loose <name>.json; returns where"""
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    store = get_store(report_dir)
+    if store:
+        return f"{store.archive_path}::{store.add_file(name, text.encode('utf-8'), kind, '.json')}"
+    path = os.path.join(report_dir, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+# ===== Reader =====
+class ReportArchive:
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        try:
+            self._zip = zipfile.ZipFile(archive_path)
+        except zipfile.BadZipFile:
+            raise Exception(f"{archive_path} was never closed, rebuild it with: "
+                            f"python report_store.py recover {os.path.dirname(archive_path) or '.'}")
+        self.entries = json.loads(self._zip.read(INDEX_NAME))["entries"]
+
+    def find(self, step_pattern="*", kind=None):
+        """Entries whose step matches a glob pattern (a plain word matches as a substring)"""
+        if not any(ch in step_pattern for ch in "*?["):
+            step_pattern = f"*{step_pattern}*"
+        return [entry for entry in self.entries
+                if fnmatch.fnmatch(entry["step"], step_pattern) and (kind is None or entry["kind"] == kind)]
+
+    def read(self, name):
+        """Raw bytes of one archived artifact"""
+        return self._zip.read(name)
+
+    def steps(self):
+        """The step log of the run"""
+        return [json.loads(line) for line in self._zip.read(STEPS_NAME).decode("utf-8").splitlines() if line]
+
+    def search(self, text, kind="snapshot"):
+        """Names of the (gzipped) artifacts of a kind that contain a text, e.g. a locator or toast"""
+        needle = text.encode("utf-8")
+        matches = []
+        for entry in self.entries:
+            if entry["kind"] != kind:
+                continue
+            data = self.read(entry["name"])
+            if entry["name"].endswith(".gz"):
+                data = gzip.decompress(data)
+            if needle in data:
+                matches.append(entry["name"])
+        return matches
+
+    def extract(self, step_pattern, target_dir):
+        """Extracts the matching artifacts and returns their paths"""
+        os.makedirs(target_dir, exist_ok=True)
+        paths = []
+        for entry in self.find(step_pattern):
+            path = os.path.join(target_dir, entry["name"])
+            with open(path, "wb") as f:
+                f.write(self.read(entry["name"]))
+            paths.append(path)
+        return paths
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def pack_directory(report_dir, remove=False):
+    """Packs the loose PNG files of an older run directory into its archive"""
+    store = ReportStore(report_dir)
+    pngs = sorted(name for name in os.listdir(report_dir) if name.endswith(".png"))
+    for name in pngs:
+        with open(os.path.join(report_dir, name), "rb") as f:
+            store.add_screenshot(name[:-4], f.read())
+    archive_path = store.close()
+    if remove:
+        for name in pngs:
+            os.remove(os.path.join(report_dir, name))
+    return archive_path
+
+
+def written_entries(archive_path):
+    """{name: data} of the complete entries of a zip whose central directory was never written"""
+    entries = {}
+    with open(archive_path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + LOCAL_HEADER.size <= len(data):
+        (signature, _, _, method, _, _, _, compressed_size, _, name_length,
+         extra_length) = LOCAL_HEADER.unpack_from(data, offset)
+        if signature != b"PK\x03\x04":
+            break
+        start = offset + LOCAL_HEADER.size + name_length + extra_length
+        if start + compressed_size > len(data):
+            break  # cut off by the crash
+        name = data[offset + LOCAL_HEADER.size:offset + LOCAL_HEADER.size + name_length].decode("utf-8")
+        raw = data[start:start + compressed_size]
+        entries[name] = zlib.decompress(raw, -15) if method == zipfile.ZIP_DEFLATED else raw
+        offset = start + compressed_size
+    return entries
+
+
+def recover_archive(report_dir):
+    """Rebuilds the archive of a run that ended without closing it, from its entries and journal"""
+    archive_path = os.path.join(report_dir, ARCHIVE_NAME)
+    stage_dir = report_dir
+    staged_note = os.path.join(report_dir, STAGED_NAME)
+    if os.path.exists(staged_note):
+        with open(staged_note, encoding="utf-8") as f:
+            stage_dir = f.read().strip()
+    stage_path = os.path.join(stage_dir, ARCHIVE_NAME)
+    journal_path = os.path.join(stage_dir, JOURNAL_NAME)
+    if not os.path.exists(journal_path):
+        if stage_dir != report_dir:
+            raise Exception(f"The archive of {report_dir} was staged in {stage_dir}, which is gone "
+                            f"(tmpfs does not survive a restart)")
+        raise Exception(f"No unfinished archive in {report_dir}")
+    index, steps = [], []
+    with open(journal_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # last line cut off by the crash
+            if "entry" in record:
+                index.append(record["entry"])
+            else:
+                steps.append(record["step"])
+    entries = written_entries(stage_path) if os.path.exists(stage_path) else {}
+    index = [entry for entry in index if entry["name"] in entries]
+    recovered_path = archive_path + ".recovered"
+    with zipfile.ZipFile(recovered_path, "w") as archive:
+        for entry in index:
+            compression = zipfile.ZIP_STORED if entry["kind"] == "screenshot" else zipfile.ZIP_DEFLATED
+            archive.writestr(entry["name"], entries[entry["name"]], compress_type=compression)
+        archive.writestr(STEPS_NAME, "".join(json.dumps(step) + "\n" for step in steps),
+                         compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr(INDEX_NAME, json.dumps({"entries": index}, indent=1), compress_type=zipfile.ZIP_DEFLATED)
+    os.replace(recovered_path, archive_path)
+    os.remove(journal_path)
+    unstage(report_dir, stage_dir)
+    print(f"Report archive recovered: {archive_path} ({len(index)} artifacts, {len(steps)} step log lines)")
+    return archive_path
+
+
+def main():
+    """Lists, extracts, packs or recovers report archives"""
+    parser = argparse.ArgumentParser(description="Read and write packed report archives")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listing = sub.add_parser("list", help="list archived artifacts")
+    listing.add_argument("archive")
+    listing.add_argument("--step", default="*", help="step name or glob pattern")
+    extract = sub.add_parser("extract", help="extract artifacts by step name")
+    extract.add_argument("archive")
+    extract.add_argument("step", help="step name or glob pattern")
+    extract.add_argument("-o", "--output", default=".")
+    search = sub.add_parser("search", help="find failure snapshots containing a text")
+    search.add_argument("archive")
+    search.add_argument("text")
+    pack = sub.add_parser("pack", help="pack the loose PNGs of a report directory")
+    pack.add_argument("report_dir")
+    pack.add_argument("--remove", action="store_true", help="delete the PNGs once packed")
+    recover = sub.add_parser("recover", help="rebuild the archive of a run that crashed before closing it")
+    recover.add_argument("report_dir")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        pack_directory(args.report_dir, args.remove)
+        return
+    if args.command == "recover":
+        recover_archive(args.report_dir)
+        return
+
+    with ReportArchive(args.archive) as archive:
+        if args.command == "list":
+            for entry in archive.find(args.step):
+                print(f"{entry['timestamp']}  {entry['kind']:<10} {entry['size']:>9}  {entry['name']}")
+        elif args.command == "search":
+            for name in archive.search(args.text):
+                print(name)
+        else:
+            for path in archive.extract(args.step, args.output):
+                print(path)
+
+
+if __name__ == "__main__":
+    main()
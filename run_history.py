@@ -0,0 +1,327 @@
+"""
+Run History Module
+This module keeps every flow run's timings in a local SQLite database: step
+and wait durations, page metrics and backend endpoint latencies, keyed by
+commit, environment and runner configuration. The trends command compares the
+latest runs of each series with the runs before them and flags statistically
+significant slowdowns (Mann-Whitney U by default, or Welch's t-test).
+
+    python run_history.py runs --flow add_ip
+    python run_history.py trends --recent 5 --baseline 20
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+import argparse
+import json
+import math
+import os
+import sqlite3
+import statistics
+import subprocess
+import threading
+
+HISTORY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "run_history.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    flow TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    config TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_series ON samples (kind, name, metric);
+"""
+
+PAGE_METRICS = ("ttfb_ms", "dom_content_loaded_ms", "load_ms")
+DOCUMENT_METRICS = ("first_contentful_paint_ms", "lcp_ms", "long_task_ms")
+
+
+def git_commit():
+    """Commit under test: GIT_COMMIT or GITHUB_SHA when set, otherwise the checkout's HEAD"""
+    commit = os.environ.get("GIT_COMMIT") or os.environ.get("GITHUB_SHA")
+    if commit:
+        return commit[:12]
+    try:
+        return subprocess.run(["git", "rev-parse", "--short=12", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def run_history_enabled():
+    """Runs are recorded unless RUN_HISTORY=0"""
+    return os.environ.get("RUN_HISTORY", "1") != "0"
+
+
+def flatten(latency=None, metrics=None, network=None):
+    """(kind, name, metric, value) samples of a run from the latency, page metric and network summaries"""
+    samples = []
+    for entry in (latency or {}).get("steps", []):
+        samples.append(("step", entry["step"], "seconds", entry["seconds"]))
+    for document in (metrics or {}).get("documents", []):
+        navigation = document.get("navigation") or {}
+        for name in PAGE_METRICS:
+            if navigation.get(name):
+                samples.append(("page", document["page"], name, navigation[name]))
+        for name in DOCUMENT_METRICS:
+            if document.get(name) is not None:
+                samples.append(("page", document["page"], name, document[name]))
+    for step in (metrics or {}).get("steps", []):
+        for route in step["routes"]:
+            samples.append(("page", route["page"], "route_render_ms", route["render_ms"]))
+    for request in (network or {}).get("requests", []):
+        name = f"{request['method']} {request['endpoint']}"
+        samples.append(("endpoint", name, "duration_ms", request["duration_ms"]))
+        if request.get("server_ms") is not None:
+            samples.append(("endpoint", name, "server_ms", request["server_ms"]))
+    return samples
+
+
+class RunHistory:
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A connection that commits on success and is always closed"""
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def record(self, flow, environment, config, passed, duration, samples, commit=None):
+        """Stores one flow run with its samples; returns the run id"""
+        with self._lock, self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (flow, started_at, commit_sha, environment, config, passed, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (flow, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), commit or git_commit(), environment,
+                 json.dumps(config, sort_keys=True), int(passed), duration))
+            run_id = cursor.lastrowid
+            connection.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?)",
+                                   [(run_id, *sample) for sample in samples])
+        return run_id
+
+    def runs(self, flow=None, limit=20):
+        """Most recent runs, newest first"""
+        query = "SELECT * FROM runs"
+        params = []
+        if flow:
+            query += " WHERE flow = ?"
+            params.append(flow)
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit])]
+
+    def durations(self, flow, environment=None, limit=20):
+        """Durations of the latest passed runs of a flow, newest first"""
+        query = "SELECT duration FROM runs WHERE flow = ? AND passed = 1 AND duration IS NOT NULL"
+        params = [flow]
+        if environment:
+            query += " AND environment = ?"
+            params.append(environment)
+        with self._connect() as connection:
+            rows = connection.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit])
+            return [row["duration"] for row in rows]
+
+    def series(self, flow=None, kind=None, environment=None, passed_only=True):
+        """Samples grouped by series, (flow, environment, config, kind, name, metric) -> runs oldest first"""
+        query = ("SELECT runs.id, runs.flow, runs.environment, runs.config, runs.commit_sha, samples.kind, "
+                 "samples.name, samples.metric, samples.value FROM samples JOIN runs ON runs.id = samples.run_id "
+                 "WHERE 1 = 1")
+        params = []
+        for column, value in (("runs.flow", flow), ("samples.kind", kind), ("runs.environment", environment)):
+            if value:
+                query += f" AND {column} = ?"
+                params.append(value)
+        if passed_only:
+            query += " AND runs.passed = 1"
+        grouped = {}
+        with self._connect() as connection:
+            for row in connection.execute(query + " ORDER BY runs.id", params):
+                key = (row["flow"], row["environment"], row["config"], row["kind"], row["name"], row["metric"])
+                runs = grouped.setdefault(key, {})
+                run = runs.setdefault(row["id"], {"id": row["id"], "commit": row["commit_sha"], "values": []})
+                run["values"].append(row["value"])
+        return {key: list(runs.values()) for key, runs in grouped.items()}
+
+    def samples(self, kind, flow=None, environment=None, runs=None):
+        """{(flow, name, metric): values, oldest first} of the latest passed runs, across environments and configs"""
+        merged = {}
+        for (series_flow, _, _, _, name, metric), series_runs in self.series(flow, kind, environment).items():
+            merged.setdefault((series_flow, name, metric), []).extend(series_runs)
+        samples = {}
+        for key, key_runs in merged.items():
+            key_runs.sort(key=lambda run: run["id"])
+            samples[key] = [value for run in (key_runs[-runs:] if runs else key_runs) for value in run["values"]]
+        return samples
+
+
+# ===== Statistics =====
+def percentile(values, q):
+    """Nearest-rank percentile (q from 0 to 100) of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def _betacf(a, b, x):
+    """Continued fraction of the regularized incomplete beta function (modified Lentz)"""
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 3e-14:
+            break
+    return h
+
+
+def incomplete_beta(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1 - x) / b
+
+
+def welch_t_test(baseline, recent):
+    """One-sided Welch's t-test that recent is larger than baseline; returns (t, p)"""
+    n1, n2 = len(baseline), len(recent)
+    if n1 < 2 or n2 < 2:
+        return 0.0, 1.0
+    m1, m2 = statistics.fmean(baseline), statistics.fmean(recent)
+    v1, v2 = statistics.variance(baseline) / n1, statistics.variance(recent) / n2
+    if v1 + v2 == 0:
+        return (math.inf, 0.0) if m2 > m1 else (0.0, 1.0)
+    t = (m2 - m1) / math.sqrt(v1 + v2)
+    df = (v1 + v2) ** 2 / (v1 ** 2 / (n1 - 1) + v2 ** 2 / (n2 - 1))
+    tail = 0.5 * incomplete_beta(df / 2, 0.5, df / (df + t * t))
+    return t, tail if t > 0 else 1.0 - tail
+
+
+def mann_whitney_u(baseline, recent):
+    """One-sided Mann-Whitney U test that recent tends to be larger; normal approximation with tie correction"""
+    n1, n2 = len(recent), len(baseline)
+    if not n1 or not n2:
+        return 0.0, 1.0
+    combined = sorted([(value, 0) for value in recent] + [(value, 1) for value in baseline])
+    ranks, ties = [0.0] * len(combined), 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    u = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+TESTS = {"mannwhitney": mann_whitney_u, "welch": welch_t_test}
+
+
+def compare(runs, recent=5, baseline=20, test="mannwhitney", alpha=0.05, min_change=0.1, min_samples=3):
+    """Compares the last `recent` runs of a series with the `baseline` runs before them"""
+    if len(runs) < 2:
+        return None
+    recent_runs = runs[-recent:] if len(runs) > recent else runs[len(runs) // 2:]
+    baseline_runs = runs[:len(runs) - len(recent_runs)][-baseline:]
+    before = [value for run in baseline_runs for value in run["values"]]
+    after = [value for run in recent_runs for value in run["values"]]
+    if len(before) < min_samples or len(after) < min_samples:
+        return None
+    _, p = TESTS[test](before, after)
+    before_median, after_median = statistics.median(before), statistics.median(after)
+    change = (after_median - before_median) / before_median if before_median else 0.0
+    return {
+        "baseline_runs": len(baseline_runs),
+        "recent_runs": len(recent_runs),
+        "baseline_median": before_median,
+        "recent_median": after_median,
+        "change": change,
+        "p": p,
+        "regressed": p < alpha and change >= min_change,
+        "commits": [run["commit"] for run in recent_runs],
+    }
+
+
+def main():
+    """Lists recorded runs or shows timing trends with slowdown detection"""
+    parser = argparse.ArgumentParser(description="Query the run history database")
+    parser.add_argument("command", choices=["runs", "trends"])
+    parser.add_argument("--flow", default=None)
+    parser.add_argument("--kind", choices=["step", "page", "endpoint"], default=None)
+    parser.add_argument("--environment", default=None)
+    parser.add_argument("--recent", type=int, default=5, help="runs treated as the current state")
+    parser.add_argument("--baseline", type=int, default=20, help="earlier runs they are compared with")
+    parser.add_argument("--test", choices=sorted(TESTS), default="mannwhitney")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--min-change", type=float, default=0.1, help="smallest median slowdown to flag (0.1 = 10%%)")
+    parser.add_argument("--regressions", action="store_true", help="only print flagged series")
+    parser.add_argument("--path", default=HISTORY_DB)
+    args = parser.parse_args()
+
+    history = RunHistory(args.path)
+    if args.command == "runs":
+        for run in history.runs(args.flow):
+            status = "passed" if run["passed"] else "failed"
+            print(f"#{run['id']:<5} {run['started_at']}  {run['flow']:<22} {status:<7} {run['duration'] or 0:7.1f}s  "
+                  f"{run['commit_sha']:<12} {run['environment']}  {run['config']}")
+        return
+
+    regressions = 0
+    for (flow, environment, config, kind, name, metric), runs in sorted(history.series(
+            args.flow, args.kind, args.environment).items()):
+        result = compare(runs, args.recent, args.baseline, args.test, args.alpha, args.min_change)
+        if not result or (args.regressions and not result["regressed"]):
+            continue
+        regressions += result["regressed"]
+        flag = "SLOWER" if result["regressed"] else ""
+        print(f"{flow:<22} {kind:<8} {name[:45]:<45} {metric:<26} {result['baseline_median']:>9.2f} -> "
+              f"{result['recent_median']:>9.2f} ({result['change']:+.0%}) p={result['p']:.3f} {flag}")
+    if regressions:
+        print(f"\n{regressions} series got significantly slower")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Runner Module
+This module is the single command line entry point for the admin flows. It
+lists the defined flows, selects them by name (wildcards allowed) or tag, and
+runs them on a chosen number of workers, driver profile, screenshot policy and
+environment. Before anything starts it prints the execution plan: the waves,
+which prerequisites come from the fixture cache, and an estimated duration
+from earlier runs (or from the step definitions when there is no history).
+
+    python runner.py list --tag supplier
+    python runner.py plan add_ip --workers 2
+    python runner.py run --tag promotion --workers 2 --screenshots key --env https://staging/app-manager
+    python runner.py run --preflight --workers 2
+    python runner.py run --preflight --preflight-mode live add_ip
+    python runner.py run create_article --throttle low-end
+    python runner.py run add_ip --scenario scenarios/slow_backend.json
+"""
+
+from datetime import datetime
+import argparse
+import fnmatch
+import os
+import statistics
+
+from driver_factory import build_chrome_options, create_driver
+from fault_proxy import FAULT_PROXY_ENV, FAULT_SCENARIO_ENV, FaultProxy, load_scenario
+from flow_definitions import FLOWS
+from flow_engine import (BASE_URL, SCREENSHOT_POLICIES, StepEngine, default_fixtures, restore_login, run_parallel,
+                         waves)
+from preflight import MODES as PREFLIGHT_MODES, check_flows, print_results
+from run_history import RunHistory
+from throttling import PROFILES as THROTTLE_PROFILES, throttle_profile
+
+DRIVER_PROFILES = ("default", "template")
+
+# Rough costs used when a flow has no recorded runs yet (seconds)
+PAGE_ESTIMATE = 3.0
+STEP_ESTIMATE = 0.4
+SETTLE_ESTIMATE = 0.5
+# Browser start plus restoring the login, once per worker
+STARTUP_ESTIMATE = 6.0
+
+
+# ===== Selection =====
+def select(names=None, tags=None, with_dependencies=False):
+    """Flow names matching any of the name patterns and tags (all flows when neither is given)"""
+    selected = []
+    for name, flow in FLOWS.items():
+        by_name = any(fnmatch.fnmatch(name, pattern) for pattern in names or [])
+        by_tag = any(tag in flow.tags for tag in tags or [])
+        if by_name or by_tag or not (names or tags):
+            selected.append(name)
+    unknown = [pattern for pattern in names or [] if not fnmatch.filter(FLOWS, pattern)]
+    if unknown:
+        raise Exception(f"No flow matches: {', '.join(unknown)} (see python runner.py list)")
+    if with_dependencies:
+        pending = list(selected)
+        while pending:
+            for dependency in FLOWS[pending.pop()].depends_on:
+                if dependency not in selected:
+                    selected.append(dependency)
+                    pending.append(dependency)
+        selected = [name for name in FLOWS if name in selected]
+    return selected
+
+
+def blocked(names, broken):
+    """Selected flows that cannot pass: the broken ones and every flow depending on them"""
+    skipped = set(broken)
+    for wave in waves(names, FLOWS):
+        skipped.update(name for name in wave if any(dep in skipped for dep in FLOWS[name].depends_on))
+    return [name for name in names if name in skipped]
+
+
+# ===== Estimates =====
+def step_estimate(flow):
+    """Seconds a flow should take judging only by its steps and their pauses"""
+    seconds = PAGE_ESTIMATE
+    for step in flow.steps:
+        pause = step.pause if step.pause is not None else (0 if step.action == "verify_toast" else SETTLE_ESTIMATE)
+        seconds += STEP_ESTIMATE + pause
+    return seconds
+
+
+def estimate(name, history, environment):
+    """(seconds, source) of a flow: the median of its recent passed runs, or the step estimate"""
+    durations = history.durations(name, environment) if history else []
+    if durations:
+        return statistics.median(durations), f"median of {len(durations)} runs"
+    return step_estimate(FLOWS[name]), "from steps"
+
+
+def prerequisites(name, cache, selected):
+    """Prerequisite kinds of a flow and where each will come from"""
+    sources = []
+    for kind in FLOWS[name].requires:
+        producer = StepEngine.producer(kind)
+        if producer.name in selected:
+            continue
+        if cache and cache.entries(kind):
+            sources.append((kind, "cached", None))
+        else:
+            sources.append((kind, f"created by {producer.name}", producer.name))
+    return sources
+
+
+def schedule(durations, workers):
+    """Wall time of a wave: longest flows first, each onto the least loaded worker"""
+    loads = [0.0] * max(1, workers)
+    for duration in sorted(durations, reverse=True):
+        loads[loads.index(min(loads))] += duration
+    return max(loads)
+
+
+def build_plan(names, workers, environment, history=None, cache=None):
+    """Waves of the selected flows with per-flow estimates and the estimated total"""
+    plan = {"waves": [], "total": STARTUP_ESTIMATE}
+    for wave in waves(names, FLOWS):
+        flows = []
+        for name in wave:
+            seconds, source = estimate(name, history, environment)
+            needs = prerequisites(name, cache, names)
+            for _, _, producer in needs:
+                if producer:
+                    seconds += estimate(producer, history, environment)[0]
+            flows.append({"flow": name, "seconds": seconds, "source": source, "prerequisites": needs})
+        wall = schedule([flow["seconds"] for flow in flows], workers)
+        plan["waves"].append({"flows": flows, "seconds": wall})
+        plan["total"] += wall
+    return plan
+
+
+def print_plan(plan, workers, profile, screenshots, environment, throttling="none"):
+    screenshots = screenshots or os.environ.get("SCREENSHOT_POLICY", "all")
+    print(f"Environment: {environment}")
+    print(f"Workers: {workers}  Profile: {profile}  Screenshots: {screenshots}  Throttling: {throttling}")
+    for number, wave in enumerate(plan["waves"], start=1):
+        print(f"\nWave {number} (~{wave['seconds']:.0f}s)")
+        for flow in wave["flows"]:
+            print(f"  {flow['flow']:<24} ~{flow['seconds']:5.0f}s  ({flow['source']})")
+            for kind, source, _ in flow["prerequisites"]:
+                print(f"    needs {kind}: {source}")
+    print(f"\nEstimated duration: ~{plan['total']:.0f}s (including {STARTUP_ESTIMATE:.0f}s browser start and login)")
+
+
+# ===== Drivers =====
+def driver_factory(profile, headless=False):
+    """(factory, cleanup) for the chosen driver profile"""
+    if profile == "template":
+        from profile_manager import ProfileManager
+
+        manager = ProfileManager()
+        if not manager.template_exists():
+            raise Exception("No profile template yet, build one with: python profile_manager.py build --login")
+        return (lambda: manager.create_driver(headless=headless)), manager.release_all
+    return (lambda: create_driver(options=build_chrome_options(headless))), None
+
+
+def list_flows(names, history, environment):
+    for name in names:
+        flow = FLOWS[name]
+        seconds, source = estimate(name, history, environment)
+        details = [f"tags: {', '.join(flow.tags) or '-'}"]
+        if flow.requires:
+            details.append(f"requires: {', '.join(flow.requires)}")
+        if flow.provides:
+            details.append(f"provides: {flow.provides[0]}")
+        print(f"{name:<24} {flow.title:<24} ~{seconds:4.0f}s ({source})  {'  '.join(details)}")
+
+
+def main():
+    """Lists, plans or runs flows selected by name or tag"""
+    parser = argparse.ArgumentParser(description="List, plan and run admin flows")
+    parser.add_argument("command", choices=["list", "plan", "run"])
+    parser.add_argument("flows", nargs="*", help="flow names or wildcard patterns, e.g. add_* (default: all)")
+    parser.add_argument("--tag", action="append", default=[], help="select flows with this tag (repeatable)")
+    parser.add_argument("--with-deps", action="store_true", help="also run the flows the selected ones depend on")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--profile", choices=DRIVER_PROFILES, default="default",
+                        help="template: start browsers from the profile_manager.py template")
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--screenshots", choices=SCREENSHOT_POLICIES, default=None)
+    parser.add_argument("--env", default=BASE_URL, help="admin base URL to run against")
+    parser.add_argument("--throttle", choices=THROTTLE_PROFILES, default=None,
+                        help="CPU/network throttling profile (default: THROTTLE_PROFILE or none)")
+    parser.add_argument("--scenario", default=None,
+                        help="route the browsers through a fault proxy running this latency/error scenario file")
+    parser.add_argument("--preflight", action="store_true", help="check every locator first and skip broken flows")
+    parser.add_argument("--preflight-mode", choices=PREFLIGHT_MODES, default="auto",
+                        help="auto: saved DOM snapshots younger than a day, live visits otherwise")
+    # Flow names may come after options, e.g. run --preflight add_ip
+    args = parser.parse_intermixed_args()
+
+    names = select(args.flows, args.tag, args.with_deps)
+    if not names:
+        raise SystemExit("No flows selected")
+    environment = args.env.rstrip("/")
+    history = RunHistory()
+    if args.command == "list":
+        list_flows(names, history, environment)
+        return
+
+    cache = default_fixtures(environment)
+    throttling = args.throttle or throttle_profile()
+    print_plan(build_plan(names, args.workers, environment, history, cache), args.workers, args.profile,
+               args.screenshots, environment, throttling)
+    if args.command == "plan":
+        return
+
+    scenario = load_scenario(args.scenario) if args.scenario else None
+    factory, cleanup = driver_factory(args.profile, args.headless)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_dir = os.path.join(os.getcwd(), "reports", f"Runner_test_run_{timestamp}")
+    os.makedirs(report_dir)
+    started = datetime.now()
+    skipped = []
+    if args.preflight:
+        results = check_flows(names, args.preflight_mode, environment, args.headless, report_dir)
+        print_results(results)
+        skipped = blocked(names, [result["flow"] for result in results if result["broken"]])
+        if skipped:
+            print(f"\nERROR: Skipping flows with broken locators or prerequisites: {', '.join(skipped)}")
+        names = [name for name in names if name not in skipped]
+        if not names:
+            raise SystemExit(1)
+    proxy = None
+    if scenario:
+        # Started after the preflight so only the flows see the injected faults
+        proxy = FaultProxy(scenario)
+        os.environ[FAULT_PROXY_ENV] = proxy.start()
+        os.environ[FAULT_SCENARIO_ENV] = scenario["name"]
+    def login(driver, flow_dir):
+        restore_login(driver, flow_dir, environment)
+
+    try:
+        results = run_parallel(names, report_dir, args.workers, factory=factory, setup=login,
+                               screenshots=args.screenshots, base_url=environment, fixtures=cache,
+                               throttling=throttling)
+    finally:
+        if cleanup:
+            cleanup()
+        if proxy:
+            proxy.stop()
+            proxy.save(report_dir)
+    print(f"\nFinished in {(datetime.now() - started).total_seconds():.0f}s, reports in {report_dir}")
+    if skipped or any(result["status"] != "passed" for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Runner Daemon Module
+This module keeps a pool of logged-in browsers warm in a long-running process
+and runs flows on request, so a run skips the Python imports, chromedriver
+spawn, Chrome launch and login. Requests come in over localhost HTTP or a
+Unix socket; step events are streamed back as one JSON object per line while
+the flows run.
+
+    python runner_daemon.py serve --browsers 2            # keep running
+    python runner_daemon.py run add_ip --screenshots key  # from any shell
+    curl -N -d '{"flows": ["add_ip"]}' localhost:8765/run
+"""
+
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+# The client side only needs the standard library; browser modules load in serve()
+DEFAULT_PORT = 8765
+DEFAULT_SOCKET = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "runner.sock")
+
+
+class RunnerDaemon:
+    """Warm browser pool plus the flow runs requested by clients"""
+
+    def __init__(self, browsers=2, headless=False, base_url=None):
+        from driver_factory import DriverPool, build_chrome_options, create_driver
+        from flow_engine import BASE_URL, default_fixtures, default_history, default_locators
+
+        self.base_url = base_url or BASE_URL
+        self.pool = DriverPool(browsers, lambda: create_driver(options=build_chrome_options(headless)))
+        self.browsers = browsers
+        self.fixtures = default_fixtures(self.base_url)
+        self.history = default_history()
+        self.locators = default_locators()
+        self.prepared = set()
+        self.runs = 0
+        self.busy = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._login_lock = threading.Lock()
+        self.report_root = os.path.join(os.getcwd(), "reports")
+
+    def warm_up(self):
+        """Starts and logs in every browser of the pool before the first request"""
+        started = time.time()
+        drivers = [self.pool.acquire() for _ in range(self.browsers)]
+        for driver in drivers:
+            self.prepare(driver)
+            self.pool.release(driver, step_name="warm_up")
+        print(f"{len(drivers)} browsers warm and logged in after {time.time() - started:.1f}s")
+
+    def prepare(self, driver):
+        """Logs a browser in the first time the daemon hands it out"""
+        from flow_engine import restore_login
+
+        with self._lock:
+            if driver.session_id in self.prepared:
+                return
+        os.makedirs(self.report_root, exist_ok=True)
+        with self._login_lock:
+            restore_login(driver, self.report_root, self.base_url)
+        # Only after the login worked; a failed one is retried the next time the browser is handed out
+        with self._lock:
+            self.prepared.add(driver.session_id)
+
+    def status(self):
+        return {"browsers": self.browsers, "busy": self.busy, "runs": self.runs,
+                "uptime": round(time.time() - self.started), "base_url": self.base_url}
+
+    def run(self, names, emit, screenshots=None):
+        """Runs flows wave by wave on pooled browsers, reporting every event through emit(dict)"""
+        from flow_definitions import FLOWS
+        from flow_engine import blocked_by, waves
+
+        unknown = [name for name in names if name not in FLOWS]
+        if unknown:
+            raise Exception(f"Unknown flows: {', '.join(unknown)}")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        run_dir = os.path.join(self.report_root, f"Daemon_test_run_{timestamp}")
+        os.makedirs(run_dir)
+        emit({"event": "run", "flows": names, "report_dir": run_dir})
+        results = {}
+        failed = set()
+
+        def run_one(name):
+            blocked = blocked_by(FLOWS[name], failed, self.fixtures)
+            if blocked:
+                result = {"flow": name, "status": "skipped", "error": f"depends on failed {', '.join(blocked)}",
+                          "duration": 0.0}
+                emit(dict(result, event="flow"))
+            else:
+                result = self.run_flow(FLOWS[name], run_dir, emit, screenshots)
+            results[name] = result
+            if result["status"] != "passed":
+                failed.add(name)
+
+        for wave in waves(names, FLOWS):
+            threads = [threading.Thread(target=run_one, args=(name,)) for name in wave]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        # A flow whose thread died without a result did not pass either
+        ordered = [results.get(name) or {"flow": name, "status": "failed", "error": "no result", "duration": 0.0}
+                   for name in names]
+        passed = all(result["status"] == "passed" for result in ordered)
+        emit({"event": "done", "passed": passed, "results": ordered})
+        return passed
+
+    def run_flow(self, flow, run_dir, emit, screenshots):
+        from driver_factory import bind_driver, unbind_driver
+        from flow_engine import StepEngine
+        from report_store import archiving_enabled, close_store, open_store
+
+        flow_dir = os.path.join(run_dir, flow.name)
+        os.makedirs(flow_dir, exist_ok=True)
+        started = time.time()
+        emit({"event": "flow", "flow": flow.name, "status": "started"})
+
+        def on_step(title, status, error=""):
+            emit({"event": "step", "flow": flow.name, "step": title, "status": status, "error": error,
+                  "elapsed": round(time.time() - started, 3)})
+
+        driver = None
+        healthy = True
+        try:
+            driver = self.pool.acquire()
+            with self._lock:
+                self.busy += 1
+            bind_driver(driver)
+            if archiving_enabled():
+                open_store(flow_dir)
+            self.prepare(driver)
+            StepEngine(driver, base_url=self.base_url, screenshots=screenshots, on_step=on_step,
+                       fixtures=self.fixtures, history=self.history, locators=self.locators).run(flow, flow_dir)
+            result = {"flow": flow.name, "status": "passed", "error": ""}
+        except Exception as e:
+            result = {"flow": flow.name, "status": "failed", "error": str(e)}
+            healthy = driver is not None and self.alive(driver)
+        finally:
+            close_store(flow_dir)
+            unbind_driver()
+            with self._lock:
+                if driver is not None:
+                    self.busy -= 1
+                self.runs += 1
+        if driver is not None and healthy:
+            self.pool.release(driver, step_name=flow.name)
+        elif driver is not None:
+            print(f"Replacing a browser that stopped responding during {flow.name}")
+            self.pool.discard(driver)
+        result["duration"] = round(time.time() - started, 3)
+        emit(dict(result, event="flow"))
+        return result
+
+    @staticmethod
+    def alive(driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        self.pool.close_all()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """GET /status, GET /flows, POST /run (NDJSON stream) and POST /shutdown"""
+
+    runner = None
+    protocol_version = "HTTP/1.0"
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(self.runner.status())
+        elif self.path == "/flows":
+            from flow_definitions import FLOWS
+
+            self.send_json({name: {"title": flow.title, "tags": list(flow.tags)} for name, flow in FLOWS.items()})
+        else:
+            self.send_json({"error": f"Unknown path: {self.path}"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self.send_json({"error": f"Invalid JSON: {str(e)}"}, 400)
+            return
+        if self.path == "/shutdown":
+            self.send_json({"status": "shutting down"})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif self.path == "/run":
+            self.stream_run(request)
+        else:
+            self.send_json({"error": f"Unknown path: {self.path}"}, 404)
+
+    def stream_run(self, request):
+        """Runs the flows on a worker thread and writes each event as soon as it happens"""
+        events = queue.Queue()
+        done = object()
+
+        def work():
+            try:
+                self.runner.run(request.get("flows") or [], events.put, request.get("screenshots"))
+            except Exception as e:
+                events.put({"event": "error", "error": str(e)})
+            finally:
+                events.put(done)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        threading.Thread(target=work, daemon=True).start()
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            event.setdefault("time", datetime.now().strftime("%H:%M:%S.%f")[:-3])
+            try:
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except OSError:
+                # The client went away; the flows still finish and are reported
+                pass
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(args):
+    """Starts the daemon, warms its browsers and serves requests until /shutdown or Ctrl+C"""
+    daemon = RunnerDaemon(args.browsers, args.headless, args.base_url)
+    RequestHandler.runner = daemon
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        os.makedirs(os.path.dirname(os.path.abspath(args.socket)), exist_ok=True)
+        server = UnixHTTPServer(args.socket, RequestHandler)
+        where = args.socket
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), RequestHandler)
+        where = f"http://127.0.0.1:{args.port}"
+    try:
+        daemon.warm_up()
+        print(f"Runner daemon listening on {where}")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+# ===== Client =====
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def connect(args):
+    if args.socket:
+        return UnixHTTPConnection(args.socket)
+    return http.client.HTTPConnection("127.0.0.1", args.port)
+
+
+def request(args, method, path, body=None):
+    connection = connect(args)
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    connection.request(method, path, body=data, headers={"Content-Type": "application/json"})
+    return connection.getresponse()
+
+
+def print_event(event):
+    if event["event"] == "step":
+        line = f"[{event['time']}] {event['flow']}: {event['step']} {event['status']} ({event['elapsed']:.1f}s)"
+        print(line + (f" - {event['error']}" if event["error"] else ""))
+    elif event["event"] == "flow" and event["status"] != "started":
+        print(f"[{event['time']}] {event['flow']} {event['status']} in {event['duration']:.1f}s"
+              + (f" ({event['error']})" if event["error"] else ""))
+    elif event["event"] == "run":
+        print(f"[{event['time']}] running {', '.join(event['flows'])}, reports in {event['report_dir']}")
+    elif event["event"] == "error":
+        print(f"ERROR: {event['error']}")
+
+
+def main():
+    """Serves warm browsers, or asks a running daemon to run flows, report status or stop"""
+    parser = argparse.ArgumentParser(description="Resident flow runner with warm, logged-in browsers")
+    parser.add_argument("command", choices=["serve", "run", "status", "stop"])
+    parser.add_argument("flows", nargs="*")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", default=None, help=f"Unix socket path instead of HTTP (e.g. {DEFAULT_SOCKET})")
+    parser.add_argument("--browsers", type=int, default=2)
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--screenshots", choices=["all", "key", "failure"], default=None)
+    parser.add_argument("--json", action="store_true", help="print the raw event stream")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args)
+        return
+    try:
+        if args.command == "status":
+            print(json.dumps(json.loads(request(args, "GET", "/status").read()), indent=2))
+        elif args.command == "stop":
+            print(json.loads(request(args, "POST", "/shutdown", {}).read())["status"])
+        else:
+            response = request(args, "POST", "/run", {"flows": args.flows, "screenshots": args.screenshots})
+            passed = False
+            for line in response:
+                event = json.loads(line)
+                if args.json:
+                    print(line.decode("utf-8"), end="", flush=True)
+                else:
+                    print_event(event)
+                passed = passed or (event["event"] == "done" and event["passed"])
+            sys.exit(0 if passed else 1)
+    except (ConnectionRefusedError, FileNotFoundError):
+        raise SystemExit("Runner daemon is not running, start it with: python runner_daemon.py serve")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Screencast Module
+This module records a continuous, low frame-rate timeline of a WebDriver
+session with CDP Page.startScreencast. Frames arrive over the DevTools
+websocket on a background thread and are encoded on another one, into an MP4
+when ffmpeg is installed or a JPEG frame strip in the run archive otherwise.
+Step names are recorded as timeline marks instead of stopping the flow for a
+screenshot after every interaction.
+"""
+
+from urllib.request import urlopen
+import asyncio
+import base64
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+from cdp_async import Browser, Page
+from report_store import get_store, register_step_marker, unregister_step_marker
+
+_recorders = {}
+
+
+class ScreencastRecorder:
+    def __init__(self, driver, report_dir, fps=2, quality=40, max_width=960, max_height=540, video=None):
+        self.driver = driver
+        self.report_dir = report_dir
+        self.fps = fps
+        self.quality = quality
+        self.max_width = max_width
+        self.max_height = max_height
+        self.video = shutil.which("ffmpeg") is not None if video is None else video
+        self.marks = []
+        self.frame_count = 0
+        self.dropped = 0
+        self._frames = queue.Queue()
+        self._last_frame_at = 0.0
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._error = None
+        self._threads = []
+
+    # ===== DevTools Connection =====
+    def devtools_url(self):
+        """Browser-level DevTools websocket of the session (local debuggerAddress or Grid se:cdp)"""
+        capabilities = self.driver.capabilities
+        if capabilities.get("se:cdp"):
+            return capabilities["se:cdp"]
+        address = capabilities.get("goog:chromeOptions", {}).get("debuggerAddress")
+        if not address:
+            raise Exception("Session exposes no DevTools address, cannot record a screencast")
+        with urlopen(f"http://{address}/json/version", timeout=5) as response:
+            return json.load(response)["webSocketDebuggerUrl"]
+
+    def start(self):
+        """Starts recording in the background and returns once frames are flowing"""
+        ws_url = self.devtools_url()
+        window = self.driver.current_window_handle
+        recorder = threading.Thread(target=self._run_loop, args=(ws_url, window), name="screencast", daemon=True)
+        encoder = threading.Thread(target=self._encode, name="screencast-encoder", daemon=True)
+        self._threads = [recorder, encoder]
+        encoder.start()
+        recorder.start()
+        self._ready.wait(10)
+        if self._error:
+            raise Exception(f"Failed to start screencast: {self._error}")
+        register_step_marker(self.report_dir, self.mark)
+        print(f"Screencast recording at {self.fps} fps ({'video' if self.video else 'frame strip'})")
+        return self
+
+    def _run_loop(self, ws_url, window):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._record(ws_url, window))
+        except Exception as e:
+            self._error = str(e)
+            self._ready.set()
+        finally:
+            self._loop.close()
+
+    async def _record(self, ws_url, window):
+        self._stop = asyncio.Event()
+        browser = await Browser.connect(ws_url)
+        connection = browser.connection
+        targets = (await connection.send("Target.getTargets"))["targetInfos"]
+        pages = [t for t in targets if t["type"] == "page"]
+        target = next((t for t in pages if t["targetId"] == window), pages[0] if pages else None)
+        if target is None:
+            raise Exception("No page target to record")
+        attached = await connection.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        page = Page(connection, target["targetId"], attached["sessionId"])
+
+        def on_frame(params):
+            asyncio.ensure_future(page.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]}))
+            self._on_frame(params)
+
+        connection.on("Page.screencastFrame", on_frame, page.session_id)
+        await page.send("Page.startScreencast", {
+            "format": "jpeg", "quality": self.quality,
+            "maxWidth": self.max_width, "maxHeight": self.max_height, "everyNthFrame": 1})
+        self._ready.set()
+        await self._stop.wait()
+        try:
+            await page.send("Page.stopScreencast", timeout=5)
+            await connection.send("Target.detachFromTarget", {"sessionId": page.session_id}, timeout=5)
+        finally:
+            await connection.close()
+
+    def _on_frame(self, params):
+        """Keeps at most fps frames per second; the rest are acknowledged and dropped"""
+        timestamp = params.get("metadata", {}).get("timestamp", time.time())
+        if timestamp - self._last_frame_at < 1.0 / self.fps:
+            self.dropped += 1
+            return
+        self._last_frame_at = timestamp
+        self.frame_count += 1
+        self._frames.put((timestamp, params["data"]))
+
+    # ===== Step Marks =====
+    def mark(self, step_name):
+        """Records a step boundary on the timeline; returns True so no screenshot is taken"""
+        self.marks.append({"step": step_name, "time": time.time(), "frame": self.frame_count})
+        # Errors still get a full screenshot next to the timeline
+        return "error" not in step_name
+
+    def current_step(self, timestamp):
+        step = "start"
+        for mark in self.marks:
+            if mark["time"] > timestamp:
+                break
+            step = mark["step"]
+        return step
+
+    # ===== Encoding =====
+    def _encode(self):
+        if self.video:
+            self._encode_video()
+        else:
+            self._encode_strip()
+
+    def _encode_strip(self):
+        """Appends each frame to the run archive (or a frames directory) named by its step"""
+        store = get_store(self.report_dir)
+        frames_dir = os.path.join(self.report_dir, "screencast")
+        index = 0
+        while True:
+            item = self._frames.get()
+            if item is None:
+                return
+            timestamp, data = item
+            index += 1
+            name = f"frame_{index:05d}_{self.current_step(timestamp)}"
+            jpeg = base64.b64decode(data)
+            if store:
+                store.add_file(name, jpeg, "frame", ".jpg", compression=0)
+            else:
+                os.makedirs(frames_dir, exist_ok=True)
+                with open(os.path.join(frames_dir, f"{name}.jpg"), "wb") as f:
+                    f.write(jpeg)
+
+    def _encode_video(self):
+        """Pipes frames to ffmpeg, repeating each one until the next so the video keeps real time"""
+        video_path = os.path.join(self.report_dir, "screencast.mp4")
+        process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-y", "-f", "image2pipe", "-vcodec", "mjpeg",
+             "-framerate", str(self.fps), "-i", "-", "-c:v", "libx264", "-pix_fmt", "yuv420p",
+             "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", video_path],
+            stdin=subprocess.PIPE)
+        previous = None
+        while True:
+            item = self._frames.get()
+            if item is None:
+                break
+            timestamp, data = item
+            jpeg = base64.b64decode(data)
+            if previous:
+                repeat = max(1, round((timestamp - previous[0]) * self.fps))
+                process.stdin.write(previous[1] * repeat)
+            previous = (timestamp, jpeg)
+        if previous:
+            process.stdin.write(previous[1])
+        process.stdin.close()
+        process.wait()
+
+    def stop(self):
+        """Stops recording, flushes the encoder and writes the step timeline"""
+        unregister_step_marker(self.report_dir)
+        if self._loop and self._stop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        self._threads[0].join(10)
+        self._frames.put(None)
+        self._threads[1].join(60)
+
+        started = self.marks[0]["time"] if self.marks else time.time()
+        timeline = {"fps": self.fps, "frames": self.frame_count, "dropped": self.dropped,
+                    "marks": [dict(mark, offset=round(mark["time"] - started, 3)) for mark in self.marks]}
+        store = get_store(self.report_dir)
+        if store:
+            store.add_file("screencast_timeline", json.dumps(timeline, indent=1), "timeline", ".json")
+        else:
+            with open(os.path.join(self.report_dir, "screencast_timeline.json"), "w", encoding="utf-8") as f:
+                json.dump(timeline, f, indent=1)
+        print(f"Screencast stopped: {self.frame_count} frames, {len(self.marks)} step marks")
+
+
+def screencast_enabled():
+    """Recording is opt-in with SCREENCAST=1"""
+    return os.environ.get("SCREENCAST", "0") == "1"
+
+
+def start_recorder(driver, report_dir, **options):
+    """Starts a recorder for a report directory; a failure only disables recording"""
+    try:
+        recorder = ScreencastRecorder(driver, report_dir, **options).start()
+    except Exception as e:
+        print(f"WARNING: Screencast disabled: {str(e)}")
+        return None
+    _recorders[report_dir] = recorder
+    return recorder
+
+
+def stop_recorder(report_dir):
+    recorder = _recorders.pop(report_dir, None)
+    if recorder:
+        recorder.stop()
+
+
+def stop_all_recorders():
+    for report_dir in list(_recorders):
+        stop_recorder(report_dir)
@@ -0,0 +1,231 @@
+"""
+Table Reader Module
+This module reads Element UI tables (el-table) and walks their el-pagination
+pages. Every header and row of the current page is pulled back in a single
+execute_script call instead of one find_element round trip per cell.
+"""
+
+from selenium import webdriver # type: ignore
+from selenium.common.exceptions import TimeoutException # type: ignore
+from selenium.webdriver.support.ui import WebDriverWait # type: ignore
+import time
+
+# Finds the table (the selector in arguments[0], else the first visible
+# el-table) and the el-pagination nearest to it; every script starts with it,
+# so paging and page sizes act on the same table the rows are read from.
+# A selector that matches nothing leaves table null rather than picking another table.
+FIND_TABLE_SCRIPT = """
+var root = arguments[0] ? document.querySelector(arguments[0]) : null;
+var tables = arguments[0] ? (root ? [root] : [])
+    : Array.prototype.slice.call(document.querySelectorAll('.el-table'));
+var table = null;
+for (var i = 0; i < tables.length; i++) {
+    if (tables[i].offsetParent !== null) { table = tables[i]; break; }
+}
+var pager = null;
+for (var node = table && table.parentElement; node && !pager; node = node.parentElement) {
+    pager = node.querySelector('.el-pagination');
+}
+function activePage() {
+    var active = pager ? pager.querySelector('.el-pager li.active') : null;
+    return active ? parseInt(active.textContent, 10) : null;
+}
+function isLoading() {
+    var loading = table.querySelector('.el-loading-mask');
+    return !!(loading && loading.style.display !== 'none');
+}
+function bodyRows() {
+    return table.querySelectorAll(':scope > .el-table__body-wrapper tbody tr.el-table__row');
+}
+"""
+
+# Whether the table is rendered
+TABLE_PRESENT_SCRIPT = FIND_TABLE_SCRIPT + """
+return !!table;
+"""
+
+# Reads headers and body rows of the table in one round trip.
+# Only the main header/body wrappers are read; the fixed-column overlays
+# (.el-table__fixed*) duplicate the same cells and are skipped.
+READ_TABLE_SCRIPT = FIND_TABLE_SCRIPT + """
+if (!table) { return null; }
+function text(cell) {
+    var inner = cell.querySelector('.cell') || cell;
+    return (inner.textContent || '').replace(/\\s+/g, ' ').trim();
+}
+var headers = [];
+var headerCells = table.querySelectorAll(':scope > .el-table__header-wrapper thead tr:last-child th');
+for (var h = 0; h < headerCells.length; h++) {
+    if (headerCells[h].classList.contains('gutter')) { continue; }
+    headers.push(text(headerCells[h]));
+}
+var rows = [];
+var rowNodes = bodyRows();
+for (var r = 0; r < rowNodes.length; r++) {
+    var cells = rowNodes[r].querySelectorAll('td');
+    var row = [];
+    for (var c = 0; c < cells.length; c++) { row.push(text(cells[c])); }
+    rows.push(row);
+}
+var total = null, lastPage = true;
+if (pager) {
+    var totalNode = pager.querySelector('.el-pagination__total');
+    var match = totalNode ? totalNode.textContent.match(/\\d+/) : null;
+    total = match ? parseInt(match[0], 10) : null;
+    var next = pager.querySelector('button.btn-next');
+    lastPage = !next || next.disabled;
+}
+return {
+    headers: headers,
+    rows: rows,
+    page: activePage(),
+    total: total,
+    last_page: lastPage,
+    loading: isLoading()
+};
+"""
+
+# Clicks the "next" button of the table's pagination; returns the page number it left.
+NEXT_PAGE_SCRIPT = FIND_TABLE_SCRIPT + """
+if (!pager) { return null; }
+var next = pager.querySelector('button.btn-next');
+if (!next || next.disabled) { return null; }
+var page = activePage();
+next.click();
+return page === null ? 0 : page;
+"""
+
+# Changes the page size through the Sizes component of the table's pagination.
+# The largest offered size not above the requested one is used. Returns the
+# chosen size, whether it differs from the current one and the rows before.
+SET_PAGE_SIZE_SCRIPT = FIND_TABLE_SCRIPT + """
+var requested = arguments[1];
+var node = pager ? pager.querySelector('.el-pagination__sizes') : null;
+if (!table || !node || !node.__vue__) { return null; }
+var sizes = node.__vue__.pageSizes || [];
+var chosen = null;
+for (var i = 0; i < sizes.length; i++) {
+    if (sizes[i] <= requested && (chosen === null || sizes[i] > chosen)) { chosen = sizes[i]; }
+}
+if (chosen === null) { chosen = sizes.length ? Math.min.apply(null, sizes) : requested; }
+var current = node.__vue__.$parent ? node.__vue__.$parent.internalPageSize : null;
+var rows = bodyRows().length;
+if (current !== chosen) { node.__vue__.handleChange(chosen); }
+return {size: chosen, changed: current !== chosen, rows: rows, current: current};
+"""
+
+# Active page, loading mask and a fingerprint of the rendered rows
+PAGE_STATE_SCRIPT = FIND_TABLE_SCRIPT + """
+if (!table) { return null; }
+var rowNodes = bodyRows();
+return {
+    page: activePage(),
+    loading: isLoading(),
+    rows: rowNodes.length,
+    first: rowNodes.length ? rowNodes[0].textContent : null,
+    last: rowNodes.length ? rowNodes[rowNodes.length - 1].textContent : null
+};
+"""
+
+
+class TableReader:
+    def __init__(self, driver: webdriver.Chrome, wait: WebDriverWait, table_selector=None, poll_frequency=0.1,
+                 timeout=10):
+        self.driver = driver
+        self.wait = wait
+        self.table_selector = table_selector
+        self.poll_frequency = poll_frequency
+        self.timeout = timeout
+
+    def wait_for_table(self):
+        """Waits (with the reader's WebDriverWait) until the table is rendered; raises when it never is"""
+        try:
+            self.wait.until(lambda d: d.execute_script(TABLE_PRESENT_SCRIPT, self.table_selector))
+        except TimeoutException:
+            raise Exception(f"Table not found: {self.table_selector or 'no visible .el-table'}")
+
+    def read(self):
+        """Reads headers, rows and pagination state of the current page in one script call"""
+        self.wait_for_table()
+        page = self._wait_for(lambda d: self._settled(d.execute_script(READ_TABLE_SCRIPT, self.table_selector)))
+        return page
+
+    def read_records(self):
+        """Returns the rows of the current page as dicts keyed by header"""
+        page = self.read()
+        return [dict(zip(page["headers"], row)) for row in page["rows"]]
+
+    def iter_pages(self, page_size=None, max_pages=None):
+        """Yields every page of the table, clicking through el-pagination"""
+        if page_size:
+            self.set_page_size(page_size)
+
+        count = 0
+        while True:
+            page = self.read()
+            yield page
+            count += 1
+            if page["last_page"] or (max_pages is not None and count >= max_pages):
+                return
+            if not self.next_page():
+                return
+
+    def iter_records(self, page_size=None, max_pages=None):
+        """Yields every row of every page as a dict keyed by header"""
+        for page in self.iter_pages(page_size=page_size, max_pages=max_pages):
+            for row in page["rows"]:
+                yield dict(zip(page["headers"], row))
+
+    def next_page(self):
+        """Moves to the next page and waits for it to render; returns False on the last page"""
+        previous = self.driver.execute_script(NEXT_PAGE_SCRIPT, self.table_selector)
+        if previous is None:
+            return False
+        self._wait_for(lambda d: self._moved_from(d.execute_script(PAGE_STATE_SCRIPT, self.table_selector), previous))
+        return True
+
+    def set_page_size(self, size):
+        """Switches el-pagination to the closest available page size and waits for the reload"""
+        started = time.time()
+        self.wait_for_table()
+        before = self.driver.execute_script(PAGE_STATE_SCRIPT, self.table_selector)
+        result = self.driver.execute_script(SET_PAGE_SIZE_SCRIPT, self.table_selector, size)
+        if result is None:
+            print("WARNING: Could not change page size, pagination sizes selector not found")
+            return None
+        # The rows only change when the old or the new size cuts the list short; otherwise the reload shows the same
+        cut_short = result["current"] is None or result["rows"] >= min(result["current"], result["size"])
+        if result["changed"] and cut_short:
+            seen = {"loading": False}
+            self._wait_for(lambda d: self._reloaded(d.execute_script(PAGE_STATE_SCRIPT, self.table_selector),
+                                                    before, seen))
+        self._wait_for(lambda d: self._settled(d.execute_script(READ_TABLE_SCRIPT, self.table_selector)))
+        print(f"Page size set to {result['size']} in {time.time() - started:.2f}s")
+        return result["size"]
+
+    def _wait_for(self, condition):
+        """Polls the condition at the reader's poll frequency"""
+        fast_wait = WebDriverWait(self.driver, self.timeout, poll_frequency=self.poll_frequency)
+        return fast_wait.until(condition)
+
+    @staticmethod
+    def _settled(page):
+        """Returns the page once the table exists and is not loading"""
+        if page and not page["loading"]:
+            return page
+        return False
+
+    @staticmethod
+    def _moved_from(state, previous):
+        """True once the active page changed and the loading mask is gone"""
+        return bool(state) and state["page"] != previous and not state["loading"]
+
+    @staticmethod
+    def _reloaded(state, before, seen):
+        """True once the loading mask came and went or the rendered rows differ from before"""
+        if not state:
+            return False
+        if state["loading"]:
+            seen["loading"] = True
+            return False
+        return seen["loading"] or any(state[key] != before[key] for key in ("rows", "first", "last"))
@@ -22,10 +22,16 @@ from conftest import pytest_runtest_makereport
 from typing import Any, List, Dict
 import time
 from datetime import datetime
-import random
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from driver_factory import DriverProxy, bind_driver, create_driver
+from flow_engine import run_flow
+from report_store import archiving_enabled, close_all_stores, get_store, open_store, save_screenshot
+from screencast import screencast_enabled, start_recorder, stop_all_recorders
 
 # ===== Global Configuration =====
-driver = webdriver.Chrome()
+driver = DriverProxy()  # bound to a real driver in main()
 wait = WebDriverWait(driver, 10)
 
 # ===== Test Execution Tracking =====
@@ -79,6 +85,14 @@ Passed Steps ({len(passed_steps)}):
         if step['error_message']:
             report_content += f"  Error: {step['error_message']}\n"
     
+    # Add the step log to the run archive
+    store = get_store(report_dir)
+    if store:
+        for step in passed_steps:
+            store.add_log(step['step_name'], "passed")
+        for step in failed_steps:
+            store.add_log(step['step_name'], "failed", step['error_message'])
+    
     # Write the report to a file
     report_path = os.path.join(report_dir, "test_summary.txt")
     with open(report_path, "w", encoding="utf-8") as f:
@@ -100,8 +114,7 @@ def create_report_dir():
 
 def take_screenshot(driver, step_name, report_dir):
     """Takes and saves a screenshot with the given step name"""
-    screenshot_path = os.path.join(report_dir, f"{step_name}.png")
-    driver.save_screenshot(screenshot_path)
+    screenshot_path = save_screenshot(driver, step_name, report_dir)
     print(f"Screenshot saved: {screenshot_path}")
 
 def highlight_and_wait(driver, element, wait_time=1):
@@ -130,22 +143,6 @@ def interact_with_element(driver, element, action, step_name, report_dir, wait_t
     except Exception as e:
         raise Exception(f"Failed to {action} element: {str(e)}")
 
-def fast_key_press(driver, element, key, wait_time=0.1):
-    """Fast version of key press without screenshots and minimal delays"""
-    element.send_keys(key)
-    time.sleep(wait_time)
-
-# ===== Name Generation Functions =====
-def generate_source_name():
-    """Generates a unique source name using current timestamp"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    return f"MY-S-{timestamp}"
-
-def generate_channel_name():
-    """Generates a unique channel name using current timestamp"""
-    timestamp = datetime.now().strftime("%d%H%M%S")
-    return f"MY{timestamp}"
-
 # ===== Test Step Functions =====
 def login(report_dir):
     """Handles the login process"""
@@ -229,244 +226,27 @@ def login(report_dir):
 
 def add_new_source(report_dir):
     """Handles the process of adding a new source"""
-    try:
-        print("\n=== Starting add_new_source test ===")
-        track_step("Add New Source Process Start", "passed")
-        driver.get("https://test-admin-ipipgo.cd.xiaoxigroup.net/app-manager/promoting-short-link/customer-source")
-        print(f"Current URL: {driver.current_url}")
-        take_screenshot(driver, "07_initial_page", report_dir)
-        
-        source_name = generate_source_name()
-        print(f"Generated source name: {source_name}")
-        
-        # Step 1: Click Add New Source button
-        try:
-            print("\n--- Step 1: Clicking Add New Source Button ---")
-            add_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//span[text()='添加新来源']/..")))
-            print("Found add button")
-            interact_with_element(driver, add_button, "click", "08_add_button", report_dir)
-            time.sleep(4)
-            track_step("Click Add New Source Button", "passed")
-        except Exception as e:
-            error_msg = f"Failed to click add button: {str(e)}"
-            track_step("Click Add New Source Button", "failed", error_msg)
-            raise
-        
-        # Step 2: Wait for popup
-        try:
-            print("\n--- Step 2: Waiting for Popup ---")
-            popup = wait.until(EC.presence_of_element_located((By.XPATH, '/html/body/div[3]')))
-            print("Found popup")
-            time.sleep(2)
-            take_screenshot(driver, "09_popup", report_dir)
-            track_step("Wait for Popup", "passed")
-        except Exception as e:
-            error_msg = f"Failed to find popup: {str(e)}"
-            track_step("Wait for Popup", "failed", error_msg)
-            raise
-        
-        # Step 3: Enter source name
-        try:
-            print("\n--- Step 3: Entering Source Name ---")
-            print("Entering source name directly")
-            actions = webdriver.ActionChains(driver)
-            actions.send_keys(source_name)
-            actions.send_keys(Keys.ENTER)
-            actions.perform()
-            time.sleep(2)
-            take_screenshot(driver, "10_name_input", report_dir)
-            track_step("Enter Source Name", "passed")
-        except Exception as e:
-            error_msg = f"Failed to enter source name: {str(e)}"
-            track_step("Enter Source Name", "failed", error_msg)
-            raise
-        
-        # Step 4: Wait for success message
-        try:
-            print("\n--- Step 4: Waiting for Success Message ---")
-            quick_wait = WebDriverWait(driver, 1)
-            message_found = False
-            
-            try:
-                print("Checking for success message...")
-                success_message = quick_wait.until(
-                    EC.presence_of_element_located((By.XPATH, '/html/body/div[5]'))
-                )
-                message_found = True
-                print("Success message found")
-                take_screenshot(driver, "11_success_message", report_dir)
-                
-            except Exception as e:
-                print(f"Could not catch success message: {str(e)}")
-                try:
-                    success_message = quick_wait.until(
-                        EC.presence_of_element_located((By.CLASS_NAME, 'el-message__content'))
-                    )
-                    print("Success message found with alternative selector")
-                    message_found = True
-                    take_screenshot(driver, "11_success_message_alt", report_dir)
-                except Exception as e:
-                    print(f"Alternative selector also failed: {str(e)}")
-                    raise
-            
-            if message_found:
-                print("TEST PASSED: Success message was found and verified")
-                time.sleep(1)
-                take_screenshot(driver, "final_success", report_dir)
-                track_step("Verify Success Message", "passed")
-            else:
-                error_msg = "Could not find success message"
-                track_step("Verify Success Message", "failed", error_msg)
-                raise Exception(error_msg)
-            
-        except Exception as e:
-            print(f"Failed to verify success message: {str(e)}")
-            raise
-            
-    except Exception as e:
-        print(f"\n=== Test failed with error: {str(e)} ===")
-        take_screenshot(driver, "final_error", report_dir)
-        raise
+    track_step("Add New Source Process Start", "passed")
+    return run_flow("add_new_source", report_dir, on_step=track_step)
 
 def add_new_link(report_dir):
     """Handles the process of adding a new link"""
-    try:
-        print("\n=== Starting add_new_link test ===")
-        track_step("Add New Link Process Start", "passed")
-        driver.get("https://test-admin-ipipgo.cd.xiaoxigroup.net/app-manager/promoting-short-link/channel")
-        print(f"Current URL: {driver.current_url}")
-        take_screenshot(driver, "12_initial_page", report_dir)
-        
-        channel_name = generate_channel_name()
-        print(f"Generated channel name: {channel_name}")
-        
-        # Step 1: Click Add New Link button
-        try:
-            print("\n--- Step 1: Clicking Add New Link Button ---")
-            add_button = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="app"]/div/div[2]/section/section/div/form/button[2]/span')))
-            print("Found add button")
-            interact_with_element(driver, add_button, "click", "13_add_button", report_dir)
-            track_step("Click Add New Link Button", "passed")
-        except Exception as e:
-            error_msg = f"Failed to click add button: {str(e)}"
-            track_step("Click Add New Link Button", "failed", error_msg)
-            raise
-        
-        # Step 2: Wait for popup
-        try:
-            print("\n--- Step 2: Waiting for Popup ---")
-            popup = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="app"]/div/div[2]/section/section/div/div[2]/div/div[1]')))
-            print("Found popup")
-            take_screenshot(driver, "14_popup", report_dir)
-            track_step("Wait for Popup", "passed")
-        except Exception as e:
-            error_msg = f"Failed to find popup: {str(e)}"
-            track_step("Wait for Popup", "failed", error_msg)
-            raise
-        
-        # Step 3: Enter channel name
-        try:
-            print("\n--- Step 3: Entering Channel Name ---")
-            name_input = driver.find_element(By.XPATH, '//*[@id="app"]/div/div[2]/section/section/div/div[2]/div/div[2]/form/div[1]/div/div[1]/input')
-            print("Found name input")
-            interact_with_element(driver, name_input, "send_keys", "15_name_input", report_dir, keys=channel_name)
-            time.sleep(1)
-            track_step("Enter Channel Name", "passed")
-        except Exception as e:
-            error_msg = f"Failed to enter channel name: {str(e)}"
-            track_step("Enter Channel Name", "failed", error_msg)
-            raise
-        
-        # Step 4: Select customer source
-        try:
-            print("\n--- Step 4: Selecting Customer Source ---")
-            source_input = driver.find_element(By.XPATH, '//*[@id="app"]/div/div[2]/section/section/div/div[2]/div/div[2]/form/div[3]/div/div/div[1]/input')
-            print("Found source input")
-            interact_with_element(driver, source_input, "click", "16_source_input", report_dir)
-            time.sleep(1)
-            
-            print("Navigating to source using arrow keys...")
-            for _ in range(20):
-                fast_key_press(driver, source_input, Keys.ARROW_DOWN)
-            
-            fast_key_press(driver, source_input, Keys.ENTER)
-            time.sleep(1)
-            print("Selected source")
-            take_screenshot(driver, "17_source_selected", report_dir)
-            track_step("Select Customer Source", "passed")
-        except Exception as e:
-            error_msg = f"Failed to select source: {str(e)}"
-            track_step("Select Customer Source", "failed", error_msg)
-            raise
-        
-        # Step 5: Submit form and verify
-        try:
-            print("\n--- Step 5: Submit Form ---")
-            submit_button = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="app"]/div/div[2]/section/section/div/div[2]/div/div[3]/div/button[2]/span')))
-            print("Found submit button")
-            submit_button.click()
-            print("Clicked submit button")
-            time.sleep(1)
-            track_step("Submit Form", "passed")
-            
-            # Wait for success message
-            try:
-                quick_wait = WebDriverWait(driver, 1)
-                message_found = False
-                
-                try:
-                    print("Checking for success message...")
-                    success_message = quick_wait.until(
-                        EC.presence_of_element_located((By.XPATH, '/html/body/div[5]'))
-                    )
-                    message_found = True
-                    print("Success message found")
-                    take_screenshot(driver, "18_success_message", report_dir)
-                    
-                except Exception as e:
-                    print(f"Could not catch success message: {str(e)}")
-                    try:
-                        success_message = quick_wait.until(
-                            EC.presence_of_element_located((By.CLASS_NAME, 'el-message__content'))
-                        )
-                        print("Success message found with alternative selector")
-                        message_found = True
-                        take_screenshot(driver, "18_success_message_alt", report_dir)
-                    except Exception as e:
-                        print(f"Alternative selector also failed: {str(e)}")
-                        raise
-                
-                if message_found:
-                    print("TEST PASSED: Success message was found and verified")
-                    time.sleep(1)
-                    take_screenshot(driver, "final_success", report_dir)
-                    track_step("Verify Success Message", "passed")
-                else:
-                    error_msg = "Could not find success message"
-                    track_step("Verify Success Message", "failed", error_msg)
-                    raise Exception(error_msg)
-                
-            except Exception as e:
-                print(f"Failed to verify success message: {str(e)}")
-                raise
-            
-        except Exception as e:
-            print(f"ERROR: Failed to verify new link: {str(e)}")
-            raise
-            
-    except Exception as e:
-        print(f"\n=== Test failed with error: {str(e)} ===")
-        take_screenshot(driver, "final_error", report_dir)
-        raise
+    track_step("Add New Link Process Start", "passed")
+    return run_flow("add_new_link", report_dir, on_step=track_step)
 
 # ===== Main Test Function =====
 def main():
     """Main function to run the complete test flow"""
     global test_start_time, test_end_time
     
+    bind_driver(create_driver())
     try:
         # Create a single report directory for the entire test run
         report_dir = create_report_dir()
+        if archiving_enabled():
+            open_store(report_dir)
+        if screencast_enabled():
+            start_recorder(driver, report_dir)
         print(f"\n=== Starting test run with report directory: {report_dir} ===")
         
         # Record start time
@@ -483,6 +263,8 @@ def main():
         
         # Generate summary report
         generate_summary_report(report_dir)
+        stop_all_recorders()
+        close_all_stores()
         
         # Clean up
         driver.quit()
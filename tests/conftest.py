@@ -1,22 +1,186 @@
 import pytest # type: ignore
-from selenium import webdriver # type: ignore
-from selenium.webdriver.chrome.service import Service # type: ignore
-from selenium.webdriver.chrome.options import Options # type: ignore
+from selenium.webdriver.support.ui import WebDriverWait # type: ignore
 import os
 import time
 import base64
+from datetime import datetime
+
+from driver_factory import DriverPool, bind_driver, build_chrome_options, create_driver, unbind_driver
+from login_manager import LoginManager
+from memory_monitor import RecyclePolicy
+from profile_manager import ProfileManager
+from report_store import archiving_enabled, close_store, open_store
+from screencast import screencast_enabled, start_recorder, stop_recorder
+
+SESSION_CACHE = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".auth", "session.json")
+
+# Outcome of every flow run on this worker, used by the depends_on marker
+flow_outcomes = {}
+logged_in_sessions = set()
+
+
+def pytest_addoption(parser):
+    parser.addoption("--remote-url", default=None, help="Selenium Grid hub URL, defaults to a local Chrome")
+    parser.addoption("--user-data-dir", default=None, help="Chrome user data directory (single worker only)")
+    parser.addoption("--profile-template", action="store_true",
+                     help="start each browser from a tmpfs copy of the profile template (profile_manager.py build)")
+    parser.addoption("--headless", action="store_true", help="run Chrome headless")
+    parser.addoption("--screencast", action="store_true", help="record each test as a screencast instead of step screenshots")
+    parser.addoption("--recycle-rss-mb", type=float, default=None, help="replace a browser above this Chrome RSS")
+    parser.addoption("--recycle-heap-mb", type=float, default=None, help="replace a browser above this JS heap")
+    parser.addoption("--recycle-after", type=int, default=None, help="replace a browser after this many tests")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Flows chained with depends_on share an xdist_group, which only keeps them
+    # on one worker under --dist loadgroup, so make that the default for -n N
+    if config.pluginmanager.hasplugin("xdist") and config.getoption("dist", "no") == "load":
+        config.option.dist = "loadgroup"
+
+
+def worker_id():
+    """Returns the pytest-xdist worker id, or 'master' when not distributed"""
+    return os.environ.get("PYTEST_XDIST_WORKER", "master")
+
+
+def flow_name(item):
+    """Returns the flow a test exercises, taken from its flow marker"""
+    marker = item.get_closest_marker("flow")
+    return marker.args[0] if marker else item.name
+
+
+def flow_dependencies(item):
+    """Returns the flows named by the depends_on markers of a test"""
+    return [name for marker in item.iter_markers("depends_on") for name in marker.args]
+
+
+def pytest_collection_modifyitems(config, items):
+    """Orders dependent flows after their prerequisites and groups them for xdist"""
+    by_flow = {flow_name(item): item for item in items}
+
+    # Union the dependency chains so each chain lands on one worker
+    group_of = {name: name for name in by_flow}
+
+    def root(name):
+        while group_of[name] != name:
+            name = group_of[name]
+        return name
+
+    for item in items:
+        for dependency in flow_dependencies(item):
+            if dependency in by_flow:
+                group_of[root(flow_name(item))] = root(dependency)
+    for item in items:
+        item.add_marker(pytest.mark.xdist_group(root(flow_name(item))))
+
+    ordered, placed = [], set()
+
+    def place(item):
+        if id(item) in placed:
+            return
+        placed.add(id(item))
+        for dependency in flow_dependencies(item):
+            if dependency in by_flow:
+                place(by_flow[dependency])
+        ordered.append(item)
+
+    for item in items:
+        place(item)
+    items[:] = ordered
+
+
+def pytest_runtest_setup(item):
+    for dependency in flow_dependencies(item):
+        # Prerequisites that were not selected are assumed to exist already
+        if dependency in flow_outcomes and not flow_outcomes[dependency]:
+            pytest.skip(f"depends on {dependency}, which did not pass")
+
 
 @pytest.fixture(scope="session")
-def driver():
-    chrome_options = Options()
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument(r'--user-data-dir=C:\Users\ahmad\AppData\Local\Google\Chrome\User Data')
-    chrome_options.add_argument('--profile-directory=Default')  # Or 'Profile 1', etc.
-    service = Service('chromedriver')
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+def driver_pool(request, run_report_dir):
+    """One pool per xdist worker; the browser is reused by every test on that worker"""
+    config = request.config
+    policy = RecyclePolicy(config.getoption("--recycle-rss-mb"), config.getoption("--recycle-heap-mb"),
+                           config.getoption("--recycle-after"))
+
+    profiles = ProfileManager() if config.getoption("--profile-template") else None
+
+    def factory():
+        extra_args = []
+        if config.getoption("--user-data-dir"):
+            extra_args.append(f"--user-data-dir={config.getoption('--user-data-dir')}")
+            extra_args.append("--profile-directory=Default")
+        if profiles:
+            return profiles.create_driver(config.getoption("--remote-url"), config.getoption("--headless"))
+        options = build_chrome_options(headless=config.getoption("--headless"), extra_args=extra_args)
+        return create_driver(config.getoption("--remote-url"), options)
+
+    pool = DriverPool(1, factory, recycle_policy=policy,
+                      telemetry_path=os.path.join(run_report_dir, "memory.jsonl"),
+                      on_quit=profiles.release_driver if profiles else None)
+    yield pool
+    pool.close_all()
+    if profiles:
+        profiles.release_all()
+        print(profiles.report())
+
+
+@pytest.fixture
+def driver(driver_pool, request):
+    driver = driver_pool.acquire()
+    try:
+        driver.current_url
+    except Exception:
+        print(f"Worker {worker_id()} replacing a dead browser session")
+        logged_in_sessions.discard(driver.session_id)
+        driver_pool.discard(driver)
+        driver = driver_pool.acquire()
+    bind_driver(driver)
     yield driver
-    driver.quit()
+    unbind_driver()
+    driver_pool.release(driver, step_name=request.node.name)
+
+
+@pytest.fixture(scope="session")
+def run_report_dir(request):
+    """Report directory shared by all workers of one pytest run"""
+    workerinput = getattr(request.config, "workerinput", None)
+    run_id = workerinput["testrunuid"][:8] if workerinput else datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(os.getcwd(), "reports", f"pytest_run_{run_id}", worker_id())
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@pytest.fixture
+def report_dir(run_report_dir, request):
+    path = os.path.join(run_report_dir, request.node.name)
+    os.makedirs(path, exist_ok=True)
+    if archiving_enabled():
+        open_store(path)
+    if (request.config.getoption("--screencast") or screencast_enabled()) and "driver" in request.fixturenames:
+        start_recorder(request.getfixturevalue("driver"), path)
+    yield path
+    stop_recorder(path)
+    close_store(path)
+
+
+@pytest.fixture
+def authenticated_driver(driver, report_dir, request):
+    """A pooled driver logged in to the admin, restored from the cached session when possible"""
+    if driver.session_id in logged_in_sessions:
+        return driver
+
+    login_manager = LoginManager(driver, WebDriverWait(driver, 10))
+    if not login_manager.restore_session(SESSION_CACHE):
+        # The interactive login waits for input(), which only works on a single worker without output capture
+        if worker_id() != "master" or request.config.getoption("capture") != "no":
+            pytest.skip("No cached login session; run `pytest -m login -s` once first")
+        login_manager.login(report_dir)
+        login_manager.save_session(SESSION_CACHE)
+    logged_in_sessions.add(driver.session_id)
+    return driver
+
 
 @pytest.hookimpl(tryfirst=True, hookwrapper=True)
 def pytest_runtest_makereport(item, call):
@@ -24,7 +188,13 @@ def pytest_runtest_makereport(item, call):
     outcome = yield
     rep = outcome.get_result()
 
+    # A flow skipped in setup (e.g. because its own prerequisite failed) did not pass either,
+    # so the flows depending on it are skipped in turn
+    if rep.when == "call" or (rep.when == "setup" and not rep.passed):
+        flow_outcomes[flow_name(item)] = rep.passed
+
     # we only look at actual failing test calls, not setup/teardown
+    screenshot_path = None
     if rep.when == "call" and rep.failed:
         driver = item.funcargs.get("driver", None)
         if driver is not None:
@@ -33,10 +203,11 @@ def pytest_runtest_makereport(item, call):
             timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
             file_name = f"{item.name}_{timestamp}.png"
             screenshot_path = os.path.join(screenshot_dir, file_name)
+            # The page snapshot was already taken by the flow's final_error screenshot (see save_screenshot)
             driver.save_screenshot(screenshot_path)
 
     # Attach screenshot to pytest-html report
-    if 'pytest_html' in item.config.pluginmanager.list_name_plugin():
+    if screenshot_path and 'pytest_html' in item.config.pluginmanager.list_name_plugin():
         pytest_html = item.config.pluginmanager.getplugin('html')
         if pytest_html:
             with open(screenshot_path, "rb") as f:
@@ -48,4 +219,6 @@ def pytest_runtest_makereport(item, call):
             rep.description = f'<div><img src="data:image/png;base64,{img_base64}" alt="Screenshot" style="width: 100%; height: auto;"></div>'
 
 # To generate the report, run the following command in your terminal:
-# pytest --html=reports/report.html --self-contained-html
\ No newline at end of file
+# pytest --html=reports/report.html --self-contained-html
+# Run the flows in parallel (dependent flows stay on one worker):
+# pytest -m "e2e and not login" -n 4
@@ -0,0 +1,100 @@
+"""
+Unit tests for the fault proxy's rule matching and fault decisions: the first
+matching rule applies, CONNECT requests are only refused, tunnel turns are
+only delayed, and the summary counts requests and turns apart.
+"""
+
+import json
+
+import pytest # type: ignore
+
+from fault_proxy import FaultProxy, load_scenario
+
+RULES = [
+    {"match": "http://api.test/slow/*", "methods": ["post"], "latency_ms": 200, "jitter_ms": 100},
+    {"match": "http://api.test/*", "error_rate": 1, "error_status": 502},
+    {"match": "https://sso.test", "latency_ms": 50, "error_rate": 1},
+]
+
+
+@pytest.fixture
+def proxy():
+    proxy = FaultProxy({"name": "test", "seed": 1, "rules": RULES})
+    yield proxy
+    proxy.server.server_close()
+
+
+# ===== Rules =====
+def test_first_matching_rule(proxy):
+    assert proxy.rule_for("POST", "http://api.test/slow/save") == (0, RULES[0])
+    assert proxy.rule_for("GET", "http://api.test/slow/save") == (1, RULES[1])
+    assert proxy.rule_for("GET", "http://other.test/") == (None, None)
+
+
+def test_no_rule_no_fault(proxy):
+    assert proxy.decide("GET", "http://other.test/") == (None, 0.0, None)
+    assert proxy.summary()["requests"] == 1
+    assert proxy.events == []
+
+
+# ===== Decisions =====
+def test_delay_within_jitter(proxy):
+    for _ in range(20):
+        index, delay, error = proxy.decide("POST", "http://api.test/slow/save")
+        assert index == 0 and error is None
+        assert 200 <= delay <= 300
+
+
+def test_error_rate(proxy):
+    assert proxy.decide("GET", "http://api.test/list") == (1, 0.0, 502)
+    assert proxy.events[0]["error"] == 502
+
+
+def test_same_seed_same_faults():
+    decisions = []
+    for _ in range(2):
+        proxy = FaultProxy({"name": "test", "seed": 7, "rules": RULES})
+        decisions.append([proxy.decide("POST", "http://api.test/slow/save")[1] for _ in range(5)])
+        proxy.server.server_close()
+    assert decisions[0] == decisions[1]
+
+
+def test_connect_is_refused_not_delayed(proxy):
+    assert proxy.decide("CONNECT", "https://sso.test") == (2, 0.0, 503)
+
+
+def test_tunnel_turns_are_delayed_not_refused(proxy):
+    index, delay, error = proxy.decide("CONNECT", "https://sso.test", turn=True)
+    assert (index, delay, error) == (2, 50.0, None)
+    assert proxy.events[-1]["method"] == "TUNNEL"
+
+
+def test_summary_counts_requests_and_turns(proxy):
+    proxy.decide("CONNECT", "https://sso.test")
+    for _ in range(3):
+        proxy.decide("CONNECT", "https://sso.test", turn=True)
+    proxy.decide("POST", "http://api.test/slow/save")
+    summary = proxy.summary()
+    assert (summary["requests"], summary["tunnel_turns"]) == (2, 3)
+    sso = summary["rules"][2]
+    assert (sso["injected"], sso["errors"], sso["mean_delay_ms"]) == (4, 1, 50.0)
+
+
+# ===== Scenarios =====
+def test_load_scenario_defaults_name(tmp_path):
+    path = tmp_path / "slow_backend.json"
+    path.write_text(json.dumps({"rules": RULES}), encoding="utf-8")
+    assert load_scenario(str(path))["name"] == "slow_backend"
+
+
+@pytest.mark.parametrize("rules, message", [
+    ([], "has no rules"),
+    ([{"latency_ms": 10}], "needs \"match\""),
+    ([{"match": "*", "delay": 10}], "unknown keys \\['delay'\\]"),
+    ([{"match": "*", "error_rate": 2}], "error_rate must be between 0 and 1"),
+])
+def test_load_scenario_rejects_bad_rules(tmp_path, rules, message):
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps({"rules": rules}), encoding="utf-8")
+    with pytest.raises(Exception, match=message):
+        load_scenario(str(path))
@@ -0,0 +1,111 @@
+"""
+Unit tests for the prerequisite fixture cache: TTL expiry, re-verification
+of entities not checked recently, and the per-environment separation.
+"""
+
+import pytest # type: ignore
+
+import fixture_cache
+from fixture_cache import FixtureCache, SessionFixtures
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fixture_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return FixtureCache("https://test", path=str(tmp_path / "fixtures.sqlite"), ttl=3600, verify_interval=600)
+
+
+def test_hit_within_ttl(cache, clock):
+    cache.put("supplier", "supplier_1")
+    clock.now += 3599
+    assert cache.ensure("supplier", lambda: pytest.fail("created on a hit")) == "supplier_1"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_expired_entity_is_created_again(cache, clock):
+    cache.put("supplier", "supplier_1")
+    clock.now += 3600
+    assert cache.entries("supplier") == []
+    assert cache.ensure("supplier", lambda: "supplier_2") == "supplier_2"
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert [entry["name"] for entry in cache.entries()] == ["supplier_2"]
+
+
+def test_newest_entity_first(cache, clock):
+    cache.put("supplier", "older")
+    clock.now += 10
+    cache.put("supplier", "newer")
+    assert cache.get("supplier")["name"] == "newer"
+
+
+def test_recently_verified_entity_is_not_checked(cache, clock):
+    cache.put("supplier", "supplier_1")
+    clock.now += 600
+    assert cache.get("supplier", verify=lambda name: pytest.fail("verified again"))["name"] == "supplier_1"
+
+
+def test_verification_refreshes_entity(cache, clock):
+    checked = []
+    cache.put("supplier", "supplier_1")
+    clock.now += 601
+    assert cache.get("supplier", verify=lambda name: checked.append(name) or True)["name"] == "supplier_1"
+    clock.now += 300
+    assert cache.get("supplier", verify=lambda name: checked.append(name) or True)["name"] == "supplier_1"
+    assert checked == ["supplier_1"]
+
+
+def test_gone_entity_is_dropped(cache, clock):
+    cache.put("supplier", "alive")
+    clock.now += 1
+    cache.put("supplier", "deleted")
+    clock.now += 601
+    assert cache.get("supplier", verify=lambda name: name == "alive")["name"] == "alive"
+    assert [entry["name"] for entry in cache.entries("supplier")] == ["alive"]
+
+
+def test_failed_verification_drops_entity(cache, clock):
+    def verify(name):
+        raise Exception("page did not load")
+
+    cache.put("supplier", "supplier_1")
+    clock.now += 601
+    assert cache.get("supplier", verify=verify) is None
+    assert cache.entries("supplier") == []
+
+
+def test_environments_are_separate(cache):
+    cache.put("supplier", "supplier_1")
+    other = FixtureCache("https://staging", path=cache.path)
+    assert other.entries() == []
+    other.put("supplier", "supplier_2")
+    assert [entry["name"] for entry in cache.entries()] == ["supplier_1"]
+
+
+def test_clear_by_kind(cache):
+    cache.put("supplier", "supplier_1")
+    cache.put("server_group", "group_1")
+    cache.clear("supplier")
+    assert [entry["kind"] for entry in cache.entries()] == ["server_group"]
+
+
+def test_session_fixtures_reuse_within_process():
+    fixtures = SessionFixtures("https://test")
+    assert fixtures.ensure("supplier", lambda: "supplier_1") == "supplier_1"
+    assert fixtures.ensure("supplier", lambda: pytest.fail("created twice")) == "supplier_1"
+    assert (fixtures.hits, fixtures.misses) == (1, 1)
+    fixtures.invalidate("supplier", "supplier_1")
+    assert fixtures.ensure("supplier", lambda: "supplier_2") == "supplier_2"
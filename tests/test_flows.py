@@ -0,0 +1,73 @@
+"""
+Pytest entry points for the end-to-end flows.
+The flows themselves live in test_manager.py and Full_Flow_Test.py; each test
+runs one of them on the worker's pooled, logged-in browser, so pytest can
+select (-k, -m), rerun and parallelize (-n N) the existing scenarios.
+They are marked e2e and deselected by default, so plain `pytest` runs only the
+unit tests: pytest -m "e2e and not login" -n 4
+"""
+
+from selenium.webdriver.support.ui import WebDriverWait # type: ignore
+import pytest # type: ignore
+
+from conftest import SESSION_CACHE
+from login_manager import LoginManager
+import test_manager
+import Full_Flow_Test as full_flow
+
+pytestmark = pytest.mark.e2e
+
+
+@pytest.mark.login
+@pytest.mark.flow("login")
+def test_login(driver, report_dir):
+    """Logs in interactively (CAPTCHA) and caches the session for the other tests"""
+    login_manager = LoginManager(driver, WebDriverWait(driver, 10))
+    login_manager.login(report_dir)
+    login_manager.save_session(SESSION_CACHE)
+
+
+# ===== Supplier Management =====
+@pytest.mark.flow("add_supplier")
+def test_add_supplier(authenticated_driver, report_dir):
+    test_manager.add_supplier(report_dir)
+
+
+@pytest.mark.flow("add_server_group")
+def test_add_server_group(authenticated_driver, report_dir):
+    test_manager.add_server_group(report_dir)
+
+
+@pytest.mark.flow("add_ip")
+@pytest.mark.depends_on("add_supplier", "add_server_group")
+def test_add_ip(authenticated_driver, report_dir):
+    test_manager.add_ip(report_dir)
+
+
+# ===== Promotion Channels =====
+@pytest.mark.flow("add_new_source")
+def test_add_new_source(authenticated_driver, report_dir):
+    test_manager.add_new_source(report_dir)
+
+
+@pytest.mark.flow("add_new_link")
+@pytest.mark.depends_on("add_new_source")
+def test_add_new_link(authenticated_driver, report_dir):
+    test_manager.add_new_link(report_dir)
+
+
+# ===== Articles =====
+@pytest.mark.flow("add_article_category")
+def test_add_article_category(authenticated_driver, report_dir):
+    full_flow.add_article_category(report_dir)
+
+
+@pytest.mark.flow("create_article")
+@pytest.mark.depends_on("add_article_category")
+def test_create_article(authenticated_driver, report_dir):
+    full_flow.create_article(report_dir)
+
+
+@pytest.mark.flow("view_complaints")
+def test_view_complaints(authenticated_driver, report_dir):
+    full_flow.view_complaints(report_dir)
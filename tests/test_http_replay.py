@@ -0,0 +1,118 @@
+"""
+Unit tests for the HTTP replay scripts: turning recorded values, stored
+tokens and server-assigned IDs into placeholders, and filling them in again
+on replay.
+"""
+
+import json
+
+import pytest # type: ignore
+
+from http_replay import build_script, capture_ids, parameterize, replay, response_ids, response_value, substitute
+
+TOKEN = "eyJhbGciOiJIUzI1NiJ9.token"
+
+
+def har_entry(method, url, status=200, body=None, post=None, headers=None):
+    request = {"method": method, "url": url, "headers": [{"name": name, "value": value}
+                                                          for name, value in (headers or {}).items()]}
+    if post is not None:
+        request["postData"] = {"text": post}
+    return {"request": request, "time": 12.5,
+            "response": {"status": status, "content": {"text": json.dumps(body) if body is not None else None}}}
+
+
+class FakePool:
+    """Answers each request with the next canned (status, body) and remembers what was sent"""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.sent = []
+
+    def send(self, method, url, headers, body=None):
+        self.sent.append({"method": method, "url": url, "headers": headers, "body": body})
+        status, content = self.answers.pop(0)
+        return status, json.dumps(content), 3.0
+
+
+# ===== Parameterize =====
+def test_parameterize_values_and_tokens():
+    text = '{"name": "supplier_20240101_120000", "token": "%s"}' % TOKEN
+    assert parameterize(text, {"supplier_name": "supplier_20240101_120000"}, {"token": TOKEN}) == \
+        '{"name": "${supplier_name}", "token": "${storage:token}"}'
+
+
+def test_parameterize_url_encoded_values():
+    url = "https://api/list?name=test%20supplier&page=1"
+    assert parameterize(url, {"name": "test supplier"}) == "https://api/list?name=${name}&page=1"
+
+
+def test_parameterize_longest_value_first():
+    assert parameterize("ab_1 ab", {"short": "ab", "long": "ab_1"}) == "${long} ${short}"
+
+
+def test_parameterize_skips_short_tokens():
+    assert parameterize("lang=en", {}, {"lang": "en", "count": 3}) == "lang=en"
+    assert parameterize(None, {"name": "x"}) is None
+
+
+# ===== Server-assigned IDs =====
+def test_response_ids():
+    body = {"code": 0, "data": {"id": 1234, "list": [{"groupId": "5678", "name": "x"}], "user_id": 42,
+                                "enabled": True, "supplier_id": True}}
+    assert response_ids(body) == [("data.id", 1234), ("data.list.0.groupId", "5678")]
+
+
+def test_capture_ids_whole_values_only():
+    captured = {"1234": "${response:2:data.id}"}
+    text = '{"supplierId": 1234, "phone": "912345", "page": "1234-5"}'
+    assert capture_ids(text, captured) == '{"supplierId": ${response:2:data.id}, "phone": "912345", "page": "1234-5"}'
+
+
+def test_capture_ids_keeps_placeholders():
+    captured = {"123": "${response:1:data.id}"}
+    assert capture_ids("${supplier_123} /123", captured) == "${supplier_123} /${response:1:data.id}"
+
+
+# ===== Substitute =====
+def test_substitute_all_placeholder_kinds():
+    responses = [{"data": {"list": [{"id": 77}]}}, None]
+    text = "${name}|${storage:token}|${response:1:data.list.0.id}"
+    assert substitute(text, {"name": "n1"}, {"token": "t1"}, responses) == "n1|t1|77"
+
+
+@pytest.mark.parametrize("text", ["${missing}", "${storage:missing}", "${response:1:data.id}",
+                                  "${response:3:data}", "${response:2:data}"])
+def test_substitute_missing_value(text):
+    with pytest.raises(Exception, match="No value for placeholder"):
+        substitute(text, {}, {}, [{"data": {"name": "x"}}, None])
+
+
+def test_response_value_paths():
+    responses = [{"data": [{"id": 5}, {"id": 6}]}]
+    assert response_value(responses, "1:data.1.id") == "6"
+    assert response_value(responses, "1:data.2.id") is None
+    assert response_value(responses, "0:data") is None
+
+
+# ===== Script =====
+def test_build_script_and_replay_use_fresh_ids():
+    har = {"log": {"entries": [
+        har_entry("POST", "https://api/supplier/add", post='{"name": "sup_1"}',
+                  headers={"Authorization": TOKEN, "Cookie": "a=b", ":path": "/supplier/add"},
+                  body={"code": 0, "data": {"id": 1234}}),
+        har_entry("GET", "https://api/supplier/1234/detail", body={"code": 0}),
+    ]}}
+    script = build_script("add_supplier", har, {"name": "sup_1"}, {"local_storage": {"token": TOKEN}})
+    first, second = script["requests"]
+    assert first["headers"] == {"Authorization": "${storage:token}"}
+    assert first["body"] == '{"name": "${name}"}'
+    assert first["expect"] == {"status": 200, "code": 0}
+    assert second["url"] == "https://api/supplier/${response:1:data.id}/detail"
+
+    pool = FakePool([(200, {"code": 0, "data": {"id": 9876}}), (200, {"code": 1})])
+    results = replay(script, {"name": "sup_2"}, {"local_storage": {"token": "fresh"}, "cookies": []}, pool)
+    assert pool.sent[0]["body"] == '{"name": "sup_2"}'
+    assert pool.sent[0]["headers"] == {"Authorization": "fresh"}
+    assert pool.sent[1]["url"] == "https://api/supplier/9876/detail"
+    assert [result["problems"] for result in results] == [[], ["code 1, expected 0"]]
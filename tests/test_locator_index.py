@@ -0,0 +1,112 @@
+"""
+Unit tests for the locator fingerprint index: fingerprints survive a new
+index on the same file, are refreshed only once they are stale, and a heal
+is recorded with its replacement locator.
+"""
+
+import pytest # type: ignore
+
+import locator_index
+from locator_index import FINGERPRINT_SCRIPT, HEAL_SCRIPT, LocatorIndex
+
+PAGE = "operation/provider"
+LOCATOR = "//button[@class='add']"
+FINGERPRINT = {"tag": "button", "text": "Add", "attributes": {}, "classes": ["add"], "ancestors": [], "label": None}
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeDriver:
+    """Answers the fingerprint and heal scripts with canned results and counts the calls"""
+
+    def __init__(self, fingerprint=FINGERPRINT, match=None):
+        self.fingerprint = fingerprint
+        self.match = match
+        self.calls = []
+
+    def execute_script(self, script, *args):
+        self.calls.append(script)
+        if script == FINGERPRINT_SCRIPT:
+            return self.fingerprint
+        if script == HEAL_SCRIPT:
+            return self.match
+        raise AssertionError("unexpected script")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(locator_index.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "locators.sqlite")
+
+
+def test_remember_round_trip(path, clock):
+    LocatorIndex(path).remember(FakeDriver(), PAGE, LOCATOR, element=object())
+    index = LocatorIndex(path)
+    assert index.get(PAGE, LOCATOR) == FINGERPRINT
+    assert index.get(PAGE, "//missing") is None
+
+
+def test_remember_skips_fresh_fingerprints(path, clock):
+    index = LocatorIndex(path, refresh=3600)
+    driver = FakeDriver()
+    index.remember(driver, PAGE, LOCATOR, element=object())
+    clock.now += 3599
+    index.remember(driver, PAGE, LOCATOR, element=object())
+    assert len(driver.calls) == 1
+
+    clock.now += 1
+    changed = dict(FINGERPRINT, text="Add supplier")
+    index.remember(FakeDriver(changed), PAGE, LOCATOR, element=object())
+    assert LocatorIndex(path).get(PAGE, LOCATOR) == changed
+
+
+def test_remember_never_raises(path, clock):
+    class BrokenDriver:
+        def execute_script(self, script, *args):
+            raise Exception("stale element")
+
+    index = LocatorIndex(path)
+    index.remember(BrokenDriver(), PAGE, LOCATOR, element=object())
+    assert index.get(PAGE, LOCATOR) is None
+
+
+def test_heal_is_recorded(path, clock):
+    LocatorIndex(path).remember(FakeDriver(), PAGE, LOCATOR, element=object())
+    clock.now += 60
+    match = {"element": object(), "score": 0.9, "locator": "//*[@id='add']"}
+    assert LocatorIndex(path).heal(FakeDriver(match=match), PAGE, LOCATOR) is match
+    assert LocatorIndex(path).healed() == [
+        {"page": PAGE, "locator": LOCATOR, "healed_to": "//*[@id='add']", "healed_at": clock.now}]
+
+
+def test_no_heal_without_fingerprint_or_match(path, clock):
+    index = LocatorIndex(path)
+    driver = FakeDriver()
+    assert index.heal(driver, PAGE, LOCATOR) is None
+    assert driver.calls == []
+
+    index.remember(driver, PAGE, LOCATOR, element=object())
+    assert index.heal(driver, PAGE, LOCATOR) is None
+    assert index.healed() == []
+
+
+def test_clear_by_page(path, clock):
+    index = LocatorIndex(path)
+    index.remember(FakeDriver(), PAGE, LOCATOR, element=object())
+    index.remember(FakeDriver(), "operation/ip", LOCATOR, element=object())
+    index.clear(PAGE)
+    fresh = LocatorIndex(path)
+    assert fresh.get(PAGE, LOCATOR) is None
+    assert fresh.get("operation/ip", LOCATOR) == FINGERPRINT
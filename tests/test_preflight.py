@@ -0,0 +1,78 @@
+"""
+Unit tests for the preflight's view split and locator verdicts, which decide
+what is checked on a page and whether a run starts at all.
+"""
+
+import os
+
+import pytest # type: ignore
+
+from flow_engine import Flow, Step
+import preflight
+from preflight import is_broken, problems, script_kind, source_of, views
+
+FRAME = "//iframe[@id='editor']"
+
+
+def result(count=1, visible=True, ms=1.0, error=None):
+    return {"count": count, "visible": visible, "ms": ms, "error": error}
+
+
+# ===== Views =====
+def test_views_split_at_first_click():
+    flow = Flow("add_ip", "Add IP", "/ip", [
+        Step("wait", "//table"),
+        Step("click", "//button[@id='add']"),
+        Step("fill", "//input[@name='ip']", "{ip}"),
+        Step("click", "//button[@id='add']"),
+        Step("frame_type", "css:body", "text", frame=FRAME),
+        Step("click", "//li[1]", preflight=False),
+        Step("verify_toast", "class:el-message"),
+    ])
+    assert views(flow) == [
+        ("page", ["//table", "//button[@id='add']"]),
+        ("dialog", ["//input[@name='ip']", "//button[@id='add']", FRAME, "css:body"]),
+    ]
+
+
+def test_views_without_click_have_no_dialog():
+    flow = Flow("list", "List", "/list", [Step("wait", "//table"), Step("wait", "//table")])
+    assert views(flow) == [("page", ["//table"])]
+
+
+def test_script_kind():
+    assert [script_kind(locator) for locator in ("css:.a", "class:el-message", "//div")] == ["css", "class", "xpath"]
+
+
+# ===== Verdicts =====
+@pytest.mark.parametrize("checked, live, expected", [
+    (result(), True, []),
+    (result(count=0), True, ["missing"]),
+    (result(count=3), True, ["ambiguous (3 matches)"]),
+    (result(visible=False), True, ["hidden"]),
+    (result(visible=False), False, []),
+    (result(count=2, visible=False, ms=45.2), True, ["ambiguous (2 matches)", "hidden", "slow (45ms)"]),
+    (result(count=0, error="not a valid XPath"), True, ["invalid: not a valid XPath"]),
+])
+def test_problems(checked, live, expected):
+    assert problems(checked, live) == expected
+
+
+def test_only_missing_and_invalid_break_a_run():
+    assert is_broken(["missing"])
+    assert is_broken(["invalid: not a valid XPath"])
+    assert not is_broken(["ambiguous (2 matches)", "hidden", "slow (45ms)"])
+    assert not is_broken([])
+
+
+# ===== Sources =====
+def test_source_of_auto_mode(tmp_path):
+    directory = str(tmp_path)
+    assert source_of("add_ip", "auto", directory) == "live"
+    path = tmp_path / "add_ip.json"
+    path.write_text("{}", encoding="utf-8")
+    assert source_of("add_ip", "auto", directory) == "snapshot"
+    old = path.stat().st_mtime - preflight.SNAPSHOT_MAX_AGE - 1
+    os.utime(path, (old, old))
+    assert source_of("add_ip", "auto", directory) == "live"
+    assert source_of("add_ip", "snapshot", directory) == "snapshot"
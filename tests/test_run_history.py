@@ -0,0 +1,152 @@
+"""
+Unit tests for the run history statistics: percentile, the regularized
+incomplete beta function, Welch's t-test, the Mann-Whitney U test and the
+slowdown comparison, plus the samples the trend commands read.
+"""
+
+import math
+
+import pytest # type: ignore
+
+from run_history import RunHistory, compare, incomplete_beta, mann_whitney_u, percentile, welch_t_test
+
+
+def runs_of(*values):
+    return [{"commit": f"c{number}", "values": list(run)} for number, run in enumerate(values)]
+
+
+# ===== Percentile =====
+def test_percentile_nearest_rank():
+    values = list(range(10, 0, -1))
+    assert percentile(values, 50) == 5
+    assert percentile(values, 90) == 9
+    assert percentile(values, 95) == 10
+    assert percentile(values, 100) == 10
+    assert percentile(values, 0) == 1
+
+
+def test_percentile_of_nothing():
+    assert percentile([], 50) is None
+
+
+# ===== Incomplete Beta =====
+@pytest.mark.parametrize("a, b, x, expected", [
+    (1, 1, 0.3, 0.3),
+    (3, 1, 0.5, 0.125),
+    (4, 4, 0.5, 0.5),
+    (2, 3, 0.4, 0.5248),
+    (0.5, 0.5, 0.25, 1 / 3),
+])
+def test_incomplete_beta_known_values(a, b, x, expected):
+    assert incomplete_beta(a, b, x) == pytest.approx(expected, abs=1e-9)
+
+
+def test_incomplete_beta_bounds():
+    assert incomplete_beta(2, 5, 0) == 0.0
+    assert incomplete_beta(2, 5, -1) == 0.0
+    assert incomplete_beta(2, 5, 1) == 1.0
+
+
+def test_incomplete_beta_matches_t_table():
+    # One-sided t tail 0.5 * I_{df/(df+t^2)}(df/2, 1/2); t = 2.228 is the 2.5% point at 10 degrees of freedom
+    df, t = 10, 2.228
+    assert 0.5 * incomplete_beta(df / 2, 0.5, df / (df + t * t)) == pytest.approx(0.025, abs=1e-4)
+
+
+# ===== Welch's t-test =====
+def test_welch_detects_slowdown():
+    t, p = welch_t_test([10, 11, 9, 10, 10, 11], [20, 21, 19, 20, 22, 20])
+    assert t > 0
+    assert p < 0.001
+
+
+def test_welch_equal_means_is_not_significant():
+    t, p = welch_t_test([1, 2, 3, 4], [4, 3, 2, 1])
+    assert t == 0
+    assert p == pytest.approx(0.5)
+
+
+def test_welch_speedup_is_not_a_slowdown():
+    _, p = welch_t_test([20, 21, 19, 20], [10, 11, 9, 10])
+    assert p > 0.99
+
+
+def test_welch_needs_two_samples_each():
+    assert welch_t_test([1], [2, 3]) == (0.0, 1.0)
+
+
+def test_welch_without_variance():
+    assert welch_t_test([5, 5, 5], [6, 6, 6]) == (math.inf, 0.0)
+    assert welch_t_test([5, 5, 5], [5, 5, 5]) == (0.0, 1.0)
+
+
+# ===== Mann-Whitney U =====
+def test_mann_whitney_separated_samples():
+    # U = 9 of 9; z = (9 - 4.5 - 0.5) / sqrt(3 * 3 / 12 * 7)
+    u, p = mann_whitney_u([1, 2, 3], [4, 5, 6])
+    assert u == 9
+    assert p == pytest.approx(0.5 * math.erfc(4 / math.sqrt(5.25) / math.sqrt(2)))
+
+
+def test_mann_whitney_ties_share_ranks():
+    u, _ = mann_whitney_u([1, 2, 2], [2, 3, 4])
+    # recent ranks: 2 -> 3 (ranks 2..4 tied), 3 -> 5, 4 -> 6
+    assert u == 3 + 5 + 6 - 6
+
+
+def test_mann_whitney_all_tied():
+    assert mann_whitney_u([5, 5, 5], [5, 5, 5]) == (4.5, 1.0)
+
+
+def test_mann_whitney_empty():
+    assert mann_whitney_u([], [1, 2]) == (0.0, 1.0)
+
+
+# ===== Compare =====
+@pytest.mark.parametrize("test", ["mannwhitney", "welch"])
+def test_compare_flags_slowdown(test):
+    runs = runs_of(*[[1.0, 1.1, 0.9]] * 10, *[[2.0, 2.1, 1.9]] * 5)
+    result = compare(runs, test=test)
+    assert result["regressed"]
+    assert result["baseline_runs"] == 10
+    assert result["recent_runs"] == 5
+    assert result["change"] == pytest.approx(1.0)
+    assert result["commits"] == [f"c{number}" for number in range(10, 15)]
+
+
+def test_compare_stable_series():
+    runs = runs_of(*[[1.0, 1.1, 0.9]] * 15)
+    assert not compare(runs)["regressed"]
+
+
+def test_compare_ignores_small_changes():
+    # Significant but below min_change
+    runs = runs_of(*[[1.00, 1.01, 0.99]] * 10, *[[1.05, 1.06, 1.04]] * 5)
+    result = compare(runs)
+    assert result["p"] < 0.05
+    assert not result["regressed"]
+
+
+def test_compare_splits_short_series_in_half():
+    result = compare(runs_of([1, 1, 1], [1, 1, 1], [2, 2, 2], [2, 2, 2]))
+    assert (result["baseline_runs"], result["recent_runs"]) == (2, 2)
+
+
+def test_compare_needs_enough_samples():
+    assert compare(runs_of([1])) is None
+    assert compare(runs_of([1], [2])) is None
+
+
+# ===== Samples =====
+def test_samples_of_latest_passed_runs(tmp_path):
+    history = RunHistory(str(tmp_path / "history.sqlite"))
+    for seconds, passed, environment in ((1.0, True, "a"), (2.0, False, "a"), (3.0, True, "b"), (4.0, True, "a")):
+        history.record("add_ip", environment, {}, passed, seconds, [("step", "Save", "seconds", seconds)],
+                       commit="abc")
+    history.record("add_ip", "a", {}, True, 1.0, [("page", "/ip", "lcp_ms", 800)], commit="abc")
+
+    key = ("add_ip", "Save", "seconds")
+    assert history.samples("step") == {key: [1.0, 3.0, 4.0]}
+    assert history.samples("step", runs=2) == {key: [3.0, 4.0]}
+    assert history.samples("step", environment="a") == {key: [1.0, 4.0]}
+    assert history.samples("step", flow="add_supplier") == {}
@@ -0,0 +1,72 @@
+"""
+Unit tests for the runner's flow selection and execution plan: name and tag
+selection, dependency waves, and which flows a broken prerequisite blocks.
+"""
+
+import pytest # type: ignore
+
+from flow_engine import Flow, waves
+import runner
+
+FLOWS = {
+    "add_supplier": Flow("add_supplier", "Add Supplier", "/supplier", [], tags=("supplier",)),
+    "add_server_group": Flow("add_server_group", "Add Server Group", "/group", [], tags=("supplier",)),
+    "add_ip": Flow("add_ip", "Add IP", "/ip", [], depends_on=("add_supplier", "add_server_group"),
+                   tags=("supplier",)),
+    "add_new_source": Flow("add_new_source", "Add Source", "/source", [], tags=("promotion",)),
+    "add_new_link": Flow("add_new_link", "Add Link", "/link", [], depends_on=("add_new_source",),
+                         tags=("promotion",)),
+}
+
+
+@pytest.fixture(autouse=True)
+def flows(monkeypatch):
+    monkeypatch.setattr(runner, "FLOWS", FLOWS)
+
+
+# ===== Selection =====
+def test_select_all_by_default():
+    assert runner.select() == list(FLOWS)
+
+
+def test_select_by_pattern_and_tag_keeps_definition_order():
+    assert runner.select(["add_new_*"], ["supplier"]) == list(FLOWS)
+    assert runner.select(["add_new_link", "add_ip"]) == ["add_ip", "add_new_link"]
+    assert runner.select(tags=["promotion"]) == ["add_new_source", "add_new_link"]
+
+
+def test_select_with_dependencies():
+    assert runner.select(["add_ip"], with_dependencies=True) == ["add_supplier", "add_server_group", "add_ip"]
+
+
+def test_select_unknown_pattern():
+    with pytest.raises(Exception, match="No flow matches: add_user"):
+        runner.select(["add_ip", "add_user"])
+
+
+# ===== Waves =====
+def test_waves_order_dependencies():
+    assert waves(list(FLOWS), FLOWS) == [["add_supplier", "add_server_group", "add_new_source"],
+                                         ["add_ip", "add_new_link"]]
+
+
+def test_waves_ignore_unselected_dependencies():
+    assert waves(["add_ip", "add_new_link"], FLOWS) == [["add_ip", "add_new_link"]]
+
+
+def test_waves_circular_dependencies():
+    flows = {"a": Flow("a", "A", "/a", [], depends_on=("b",)), "b": Flow("b", "B", "/b", [], depends_on=("a",))}
+    with pytest.raises(Exception, match="Circular flow dependencies"):
+        waves(["a", "b"], flows)
+
+
+# ===== Plan =====
+def test_blocked_by_broken_prerequisite():
+    assert runner.blocked(list(FLOWS), ["add_server_group"]) == ["add_server_group", "add_ip"]
+    assert runner.blocked(list(FLOWS), []) == []
+
+
+def test_schedule_longest_first():
+    assert runner.schedule([5, 4, 3, 3, 1], 2) == 8
+    assert runner.schedule([5, 4], 0) == 9
+    assert runner.schedule([], 2) == 0
@@ -0,0 +1,125 @@
+"""
+Throttling Module
+This module applies named CPU and network throttling profiles to a browser
+through the DevTools protocol (Emulation.setCPUThrottlingRate and
+Network.emulateNetworkConditions), so the existing flows show how the admin
+pages behave for operators on weak machines or slow links. The profile of a
+run is part of its runner config in the run history, and the compare command
+lists step timings side by side per profile.
+
+    THROTTLE_PROFILE=low-end python flow_engine.py create_article
+    python throttling.py compare create_article
+"""
+
+import argparse
+import json
+import os
+import statistics
+
+# cpu: slowdown factor; network: latency in ms, throughput in bytes/s (DevTools presets for the 3G ones)
+PROFILES = {
+    "none": {"cpu": 1, "network": None},
+    "slow-cpu": {"cpu": 4, "network": None},
+    "fast-3g": {"cpu": 1, "network": {"latency": 562.5, "download": 180 * 1024, "upload": 84 * 1024}},
+    "slow-3g": {"cpu": 1, "network": {"latency": 2000, "download": 50 * 1024, "upload": 50 * 1024}},
+    "low-end": {"cpu": 6, "network": {"latency": 562.5, "download": 180 * 1024, "upload": 84 * 1024}},
+}
+
+
+def throttle_profile():
+    """Profile from THROTTLE_PROFILE, "none" when unset"""
+    name = os.environ.get("THROTTLE_PROFILE", "") or "none"
+    if name not in PROFILES:
+        raise Exception(f"Unknown THROTTLE_PROFILE: {name} (known: {', '.join(PROFILES)})")
+    return name
+
+
+def apply_profile(driver, name):
+    """Throttles the browser's CPU and network to a profile; "none" lifts any throttling"""
+    if name not in PROFILES:
+        raise Exception(f"Unknown throttling profile: {name}")
+    profile = PROFILES[name]
+    network = profile["network"] or {"latency": 0, "download": -1, "upload": -1}
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.emulateNetworkConditions", {
+            "offline": False,
+            "latency": network["latency"],
+            "downloadThroughput": network["download"],
+            "uploadThroughput": network["upload"],
+        })
+        driver.execute_cdp_cmd("Emulation.setCPUThrottlingRate", {"rate": profile["cpu"]})
+    except Exception as e:
+        # Timings labelled with a profile that was never applied would be misleading
+        raise Exception(f"Could not apply throttling profile {name}: {str(e)}")
+    if name != "none":
+        print(f"Throttling profile {name}: {describe(profile)}")
+
+
+def describe(profile):
+    cpu = f"CPU {profile['cpu']}x slower" if profile["cpu"] > 1 else "CPU unthrottled"
+    network = profile["network"]
+    if not network:
+        return f"{cpu}, network unthrottled"
+    return (f"{cpu}, {network['latency']:.0f}ms latency, {network['download'] // 1024}KB/s down, "
+            f"{network['upload'] // 1024}KB/s up")
+
+
+def profile_of(config):
+    """Throttling profile of a run history config (JSON text); runs before profiles existed are "none" """
+    return json.loads(config).get("throttling", "none")
+
+
+def compare(history, flow, kind="step", metric=None, environment=None):
+    """{(name, metric): {profile: median}} of a flow's passed runs"""
+    medians = {}
+    for (_, _, config, _, name, series_metric), runs in history.series(flow, kind, environment).items():
+        if metric and series_metric != metric:
+            continue
+        values = [value for run in runs for value in run["values"]]
+        by_profile = medians.setdefault((name, series_metric), {})
+        by_profile.setdefault(profile_of(config), []).extend(values)
+    return {key: {profile: statistics.median(values) for profile, values in profiles.items()}
+            for key, profiles in medians.items()}
+
+
+def main():
+    """Lists the profiles or compares a flow's timings across them"""
+    from run_history import HISTORY_DB, RunHistory
+
+    parser = argparse.ArgumentParser(description="CPU and network throttling profiles for the admin flows")
+    parser.add_argument("command", choices=["list", "compare"])
+    parser.add_argument("flow", nargs="?")
+    parser.add_argument("--kind", choices=["step", "page", "endpoint"], default="step")
+    parser.add_argument("--metric", default=None, help="e.g. lcp_ms for --kind page")
+    parser.add_argument("--environment", default=None)
+    parser.add_argument("--path", default=HISTORY_DB)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, profile in PROFILES.items():
+            print(f"{name:<10} {describe(profile)}")
+        return
+    if not args.flow:
+        raise SystemExit("compare needs a flow name")
+    medians = compare(RunHistory(args.path), args.flow, args.kind, args.metric, args.environment)
+    if not medians:
+        raise SystemExit(f"No recorded runs of {args.flow}")
+    profiles = [name for name in PROFILES if any(name in by_profile for by_profile in medians.values())]
+    print(f"{'':<45} {'':<16}" + "".join(f"{name:>12}" for name in profiles))
+    for (name, metric), by_profile in sorted(medians.items()):
+        baseline = by_profile.get("none")
+        cells = []
+        for profile in profiles:
+            value = by_profile.get(profile)
+            if value is None:
+                cells.append(f"{'-':>12}")
+            elif baseline and profile != "none":
+                cells.append(f"{value:>7.2f} {value / baseline:>3.1f}x")
+            else:
+                cells.append(f"{value:>12.2f}")
+        print(f"{name[:45]:<45} {metric:<16}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    main()
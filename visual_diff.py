@@ -0,0 +1,259 @@
+"""
+Visual Diff Module
+This module compares the named screenshots of a run (e.g. 09_popup, 14_popup,
+25_popup) with approved baselines. Every frame is first compared by a NumPy
+perceptual hash; only frames whose hash moved get a masked per-pixel diff and
+a highlighted diff image. Large batches are spread across a process pool, so
+the check runs after the flows instead of slowing them down.
+
+    python visual_diff.py approve reports/<run> --step popup
+    python visual_diff.py compare reports/<run>
+
+Frames and baselines are named by their path in the run, so the same step of
+two flows in a runner report (add_ip/07_initial_page and
+add_supplier/07_initial_page) is compared with its own baseline.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import argparse
+import fnmatch
+import io
+import json
+import os
+import shutil
+
+from PIL import Image # type: ignore
+import numpy as np # type: ignore
+
+from report_store import ARCHIVE_NAME, ReportArchive
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+HASHES_NAME = "hashes.json"
+MASKS_NAME = "masks.json"
+
+HASH_SIZE = 8
+HASH_SAMPLE = 32
+POOL_THRESHOLD = 8
+
+
+# ===== Perceptual Hash =====
+def dct_matrix(size):
+    """Orthonormal DCT-II basis, so a 2D DCT is two matrix products"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+DCT = dct_matrix(HASH_SAMPLE)
+
+
+def phash(image):
+    """64-bit perceptual hash of a PIL image as a hex string"""
+    small = np.asarray(image.convert("L").resize((HASH_SAMPLE, HASH_SAMPLE), Image.BILINEAR), dtype=np.float64)
+    low = (DCT @ small @ DCT.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term only tracks overall brightness
+    bits = low[1:] > np.median(low[1:])
+    return f"{int(''.join('1' if bit else '0' for bit in bits), 2):016x}"
+
+
+def hamming(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+# ===== Pixel Diff =====
+def mask_array(shape, regions):
+    """Boolean mask of the pixels to compare, with the (x, y, width, height) regions left out"""
+    mask = np.ones(shape[:2], dtype=bool)
+    for x, y, width, height in regions:
+        mask[y:y + height, x:x + width] = False
+    return mask
+
+
+def pad_to(array, height, width):
+    padded = np.zeros((height, width, 3), dtype=array.dtype)
+    padded[:array.shape[0], :array.shape[1]] = array
+    return padded
+
+
+def pixel_diff(current, baseline, regions, pixel_threshold):
+    """Changed-pixel mask of two RGB images, ignoring masked regions"""
+    current = np.asarray(current.convert("RGB"), dtype=np.int16)
+    baseline = np.asarray(baseline.convert("RGB"), dtype=np.int16)
+    height = max(current.shape[0], baseline.shape[0])
+    width = max(current.shape[1], baseline.shape[1])
+    current, baseline = pad_to(current, height, width), pad_to(baseline, height, width)
+    changed = (np.abs(current - baseline) > pixel_threshold).any(axis=2)
+    changed &= mask_array(changed.shape, regions)
+    return current.astype(np.uint8), changed
+
+
+def highlight(current, changed, regions):
+    """Current frame dimmed, changed pixels in red, their bounding box outlined, masks in grey"""
+    output = (current * 0.4 + 153).astype(np.uint8)
+    output[changed] = (255, 0, 0)
+    for x, y, width, height in regions:
+        output[y:y + height, x:x + width] = (128, 128, 128)
+    rows, cols = np.nonzero(changed)
+    if rows.size:
+        top, bottom, left, right = rows.min(), rows.max(), cols.min(), cols.max()
+        output[top:bottom + 1, [left, right]] = (255, 0, 255)
+        output[[top, bottom], left:right + 1] = (255, 0, 255)
+    return Image.fromarray(output)
+
+
+def compare_frame(job):
+    """Compares one frame with its baseline; runs in a worker process for large batches"""
+    step, png, baseline_path, baseline_hash, regions, output_dir, hash_tolerance, pixel_threshold, max_ratio = job
+    current = Image.open(io.BytesIO(png))
+    current_hash = phash(current)
+    result = {"step": step, "hash": current_hash, "baseline_hash": baseline_hash,
+              "distance": hamming(current_hash, baseline_hash), "changed_ratio": 0.0, "diff": None}
+    if result["distance"] <= hash_tolerance:
+        result["status"] = "passed"
+        return result
+
+    with Image.open(baseline_path) as baseline:
+        size_changed = baseline.size != current.size
+        current_rgb, changed = pixel_diff(current, baseline, regions, pixel_threshold)
+    result["changed_ratio"] = round(float(changed.sum()) / changed.size, 6)
+    if result["changed_ratio"] <= max_ratio and not size_changed:
+        result["status"] = "passed"
+        return result
+
+    result["status"] = "failed"
+    result["diff"] = os.path.join(output_dir, os.path.dirname(step), f"diff_{os.path.basename(step)}.png")
+    os.makedirs(os.path.dirname(result["diff"]), exist_ok=True)
+    highlight(current_rgb, changed, regions).save(result["diff"])
+    if size_changed:
+        result["error"] = f"size changed from {baseline.size} to {current.size}"
+    return result
+
+
+# ===== Frames and Baselines =====
+def frame_key(prefix, step):
+    """Frame and baseline name: the step under its flow directory, e.g. add_ip/07_initial_page"""
+    return f"{prefix}/{step}" if prefix else step
+
+
+def read_frames(run_dir, step_pattern="*"):
+    """Latest PNG of every step in a run's archives or loose screenshots, as {flow/step: bytes}"""
+    if not any(ch in step_pattern for ch in "*?["):
+        step_pattern = f"*{step_pattern}*"
+    frames = {}
+    if run_dir.endswith(".zip"):
+        archives, walk = [("", run_dir)], []
+    else:
+        archives, walk = [], os.walk(run_dir)
+    for root, dirs, files in walk:
+        dirs[:] = sorted(name for name in dirs if name != "visual_diff")
+        prefix = "" if root == run_dir else os.path.relpath(root, run_dir).replace(os.sep, "/")
+        # A flow directory with an archive keeps its screenshots in there (runner reports have one per flow)
+        if ARCHIVE_NAME in files:
+            archives.append((prefix, os.path.join(root, ARCHIVE_NAME)))
+            continue
+        for name in sorted(files):
+            if name.endswith(".png") and not name.startswith("diff_") and fnmatch.fnmatch(name[:-4], step_pattern):
+                with open(os.path.join(root, name), "rb") as f:
+                    frames[frame_key(prefix, name[:-4])] = f.read()
+    for prefix, archive_path in archives:
+        with ReportArchive(archive_path) as archive:
+            for entry in archive.find(step_pattern, kind="screenshot"):
+                frames[frame_key(prefix, entry["step"])] = archive.read(entry["name"])
+    return frames
+
+
+class VisualDiff:
+    def __init__(self, baseline_dir=BASELINE_DIR, hash_tolerance=0, pixel_threshold=16, max_ratio=0.001,
+                 workers=None):
+        self.baseline_dir = baseline_dir
+        self.hash_tolerance = hash_tolerance
+        self.pixel_threshold = pixel_threshold
+        self.max_ratio = max_ratio
+        self.workers = workers
+        self.hashes = self._load(HASHES_NAME)
+        self.masks = self._load(MASKS_NAME)
+
+    def _load(self, name):
+        path = os.path.join(self.baseline_dir, name)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def baseline_path(self, key):
+        return os.path.join(self.baseline_dir, *f"{key}.png".split("/"))
+
+    def approve(self, run_dir, step_pattern="*"):
+        """Stores the frames of a run as the new baselines together with their hashes"""
+        os.makedirs(self.baseline_dir, exist_ok=True)
+        frames = read_frames(run_dir, step_pattern)
+        for step, png in frames.items():
+            path = self.baseline_path(step)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(png)
+            self.hashes[step] = phash(Image.open(io.BytesIO(png)))
+        with open(os.path.join(self.baseline_dir, HASHES_NAME), "w", encoding="utf-8") as f:
+            json.dump(self.hashes, f, indent=1, sort_keys=True)
+        print(f"Approved {len(frames)} baselines into {self.baseline_dir}")
+        return sorted(frames)
+
+    def compare(self, run_dir, step_pattern="*"):
+        """Compares every frame of a run that has a baseline and writes the results next to it"""
+        output_dir = os.path.join(os.path.dirname(run_dir) if run_dir.endswith(".zip") else run_dir, "visual_diff")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(output_dir)
+
+        frames = read_frames(run_dir, step_pattern)
+        jobs = [(step, png, self.baseline_path(step), self.hashes[step], self.masks.get(step, []), output_dir,
+                 self.hash_tolerance, self.pixel_threshold, self.max_ratio)
+                for step, png in sorted(frames.items()) if step in self.hashes]
+        unbaselined = sorted(step for step in frames if step not in self.hashes)
+
+        if len(jobs) >= POOL_THRESHOLD and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(compare_frame, jobs, chunksize=4))
+        else:
+            results = [compare_frame(job) for job in jobs]
+
+        self.write_summary(output_dir, results, unbaselined)
+        return results
+
+    def write_summary(self, output_dir, results, unbaselined):
+        summary = {"compared_at": datetime.now().isoformat(), "results": results, "no_baseline": unbaselined}
+        with open(os.path.join(output_dir, "visual_diff.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=1)
+        failed = [result for result in results if result["status"] == "failed"]
+        print(f"\n=== Visual diff: {len(results) - len(failed)} passed, {len(failed)} failed, "
+              f"{len(unbaselined)} without baseline ===")
+        for result in failed:
+            print(f"FAILED {result['step']}: hash distance {result['distance']}, "
+                  f"{result['changed_ratio']:.2%} pixels changed -> {result['diff']}")
+
+
+def main():
+    """Approves baselines from a run or compares a run against them"""
+    parser = argparse.ArgumentParser(description="Compare run screenshots with approved baselines")
+    parser.add_argument("command", choices=["approve", "compare"])
+    parser.add_argument("run", help="report directory or report.zip of a run")
+    parser.add_argument("--step", default="*", help="step name or glob pattern")
+    parser.add_argument("--baselines", default=BASELINE_DIR)
+    parser.add_argument("--hash-tolerance", type=int, default=0, help="hash bits that may differ without a pixel diff")
+    parser.add_argument("--pixel-threshold", type=int, default=16, help="per-channel difference counted as a change")
+    parser.add_argument("--max-ratio", type=float, default=0.001, help="share of changed pixels that still passes")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    visual_diff = VisualDiff(args.baselines, args.hash_tolerance, args.pixel_threshold, args.max_ratio, args.workers)
+    if args.command == "approve":
+        visual_diff.approve(args.run, args.step)
+        return
+    results = visual_diff.compare(args.run, args.step)
+    if any(result["status"] == "failed" for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()